@@ -0,0 +1,57 @@
+"""Compares the alignment of words with diarization segments to a word by word placement, on synthetic meetings.
+
+Usage: python tests/bench_alignment.py [number_of_words] [mean_speaker_turn_in_seconds]
+"""
+import os
+
+# Set PYTHONPATH
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+import numpy as np
+
+from bench_merge import synthetic_chunks, timed
+from transcriptionservice.transcription.transcription_result import TranscriptionResult
+
+
+def synthetic_diarization(duration: float, mean_turn: float, seed: int = 0) -> dict:
+    """Returns diarization segments of 3 speakers covering duration seconds, with small gaps and overlaps"""
+    rng = np.random.default_rng(seed)
+    # Turns last at least 0.5 second, so that no segment is included in others
+    turns = np.cumsum(0.5 + rng.exponential(mean_turn - 0.5, int(duration / mean_turn * 2) + 1))
+    turns = turns[turns < duration]
+    begins = np.concatenate([[0.0], turns])
+    ends = np.concatenate([turns + rng.uniform(-0.2, 0.2, len(turns)), [duration]])
+    return {
+        "segments": [
+            {"seg_begin": b, "seg_end": e, "spk_id": f"spk{rng.integers(3)}", "seg_id": i}
+            for i, (b, e) in enumerate(zip(begins.tolist(), ends.tolist()))
+        ]
+    }
+
+
+def place_word_by_word(result: TranscriptionResult) -> np.ndarray:
+    """Places words one by one with the placement rules"""
+    seg_indices = np.empty(len(result.words), dtype=np.int64)
+    seg_index = 0
+    for i in range(len(result.words)):
+        while not result._resolveWordSegment(i, seg_index):
+            seg_index += 1
+        seg_indices[i] = seg_index
+    return seg_indices
+
+
+if __name__ == "__main__":
+    num_words = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    mean_turn = float(sys.argv[2]) if len(sys.argv) > 2 else 5.0
+    chunks = synthetic_chunks(num_words)
+    result = TranscriptionResult([(t, offset) for t, offset, _ in chunks])
+    duration = float(result.words.end[-1])
+    result.setDiarizationResult(synthetic_diarization(duration, mean_turn))
+    print(f"{len(result.words)} words, {len(result.diarizationSegments)} speaker turns, {len(result.segments)} speech segments")
+
+    seg_indices = result._alignWords()
+    assert np.array_equal(seg_indices, place_word_by_word(result))
+    loop_time = timed(lambda: place_word_by_word(result), repeat=1)
+    align_time = timed(lambda: result._alignWords())
+    print(f"word by word: {loop_time:.3f} s, searchsorted: {align_time:.4f} s ({loop_time / align_time:.0f}x)")
@@ -0,0 +1,69 @@
+"""Compares the cost of writing chunks as FLAC with the shared volume traffic it saves.
+
+Each chunk is written once by the transcription worker and read once by the STT worker, so FLAC pays off
+when the encoding and decoding time is lower than the time to transfer the saved bytes twice.
+
+Usage: python tests/bench_chunk_format.py [wave_file] [chunk_duration_in_seconds]
+"""
+import os
+import shutil
+import tempfile
+import time
+
+# Set PYTHONPATH
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+import numpy as np
+
+from bench_vad import synthetic_signal
+from transcriptionservice.transcription.utils.audio import decodeAudio, readAudio, writeFlac
+from transcriptionservice.transcription.utils.wavfile import writeWav
+
+
+def measure(chunks, folder, write, extension, sample_rate=16000):
+    """Returns the writing time, the reading time and the size of the chunks written with write"""
+    paths = [os.path.join(folder, f"chunk_{i}.{extension}") for i in range(len(chunks))]
+    start = time.perf_counter()
+    for path, chunk in zip(paths, chunks):
+        write(path, chunk, sample_rate)
+    write_time = time.perf_counter() - start
+    start = time.perf_counter()
+    for path in paths:
+        for _ in decodeAudio(path, cleanup=False):
+            pass
+    read_time = time.perf_counter() - start
+    return write_time, read_time, sum(os.path.getsize(path) for path in paths)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        signal, sample_rate = readAudio(sys.argv[1])
+    else:
+        sample_rate = 16000
+        signal, _ = synthetic_signal(600.0, 20, sample_rate)
+    chunk_samples = int((float(sys.argv[2]) if len(sys.argv) > 2 else 30.0) * sample_rate)
+    chunks = [np.asarray(signal[i : i + chunk_samples]) for i in range(0, len(signal), chunk_samples)]
+    duration = len(signal) / sample_rate
+
+    folder = tempfile.mkdtemp()
+    try:
+        formats = [("wav", "wav", writeWav)]
+        for level in [0, 5, 8]:
+            formats.append((f"flac-{level}", "flac", lambda p, s, sr, level=level: writeFlac(p, s, sr, level)))
+        results = {name: measure(chunks, folder, write, extension, sample_rate) for name, extension, write in formats}
+    finally:
+        shutil.rmtree(folder)
+
+    wav_write, wav_read, wav_size = results["wav"]
+    print(f"{len(chunks)} chunks, {duration:.0f} s of audio")
+    print(f"{'format':>8} {'MB/min':>7} {'ratio':>6} {'write (s)':>10} {'read (s)':>9} {'break-even (MB/s)':>18}")
+    for name, (write_time, read_time, size) in results.items():
+        # Bandwidth below which transferring the saved bytes twice takes longer than the extra CPU time
+        extra_time = write_time + read_time - wav_write - wav_read
+        saved = 2 * (wav_size - size) / 1e6
+        break_even = f"{saved / extra_time:.0f}" if name != "wav" and extra_time > 0 else "-"
+        print(
+            f"{name:>8} {size / 1e6 / duration * 60:>7.2f} {size / wav_size:>6.2f} "
+            f"{write_time:>10.2f} {read_time:>9.2f} {break_even:>18}"
+        )
@@ -0,0 +1,80 @@
+"""Compares the merge of chunk transcriptions with a global sort of their words, on synthetic jobs.
+
+Usage: python tests/bench_merge.py [number_of_words]
+"""
+import os
+import time
+
+# Set PYTHONPATH
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+import numpy as np
+
+from transcriptionservice.transcription.transcription_result import (
+    TranscriptionResult,
+    WordTable,
+    _mergeSortedWords,
+)
+
+
+def synthetic_chunks(num_words: int, words_per_chunk: int = 1000, overlap: float = 0.0, seed: int = 0):
+    """Returns chunk transcriptions (transcription, offset, duration) of about num_words words,
+    consecutive chunks overlapping by overlap seconds, listed in a random order"""
+    rng = np.random.default_rng(seed)
+    chunks = []
+    offset = 0.0
+    for _ in range(-(-num_words // words_per_chunk)):
+        gaps = rng.uniform(0.05, 0.4, words_per_chunk)
+        starts = np.cumsum(gaps)
+        ends = starts + rng.uniform(0.1, 0.5, words_per_chunk) * gaps
+        duration = float(ends[-1]) + 0.5
+        words = [
+            {"word": f"w{i % 5000}", "start": s, "end": e, "conf": c}
+            for i, (s, e, c) in enumerate(zip(starts.tolist(), ends.tolist(), rng.uniform(0, 1, words_per_chunk).tolist()))
+        ]
+        chunks.append(({"words": words, "language": "fr"}, offset, duration))
+        offset += duration - overlap
+    order = rng.permutation(len(chunks))
+    return [chunks[i] for i in order]
+
+
+def timed(function, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+if __name__ == "__main__":
+    num_words = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    print(
+        f"{'job':>12} {'list sort (s)':>14} {'global sort (s)':>16} {'merge (s)':>10} {'speedup':>8} "
+        f"{'whole result (s)':>17}"
+    )
+    for name, overlap in [("consecutive", 0.0), ("overlapping", 2.0)]:
+        chunks = synthetic_chunks(num_words, overlap=overlap)
+        result = TranscriptionResult(None)
+        tables = [
+            WordTable.fromJson(
+                t["words"], t["language"], offset, result.words.vocabulary, result.words.languages
+            )
+            for t, offset, _ in chunks
+        ]
+        concatenated = WordTable.concatenate(tables)
+        sorted_words = concatenated[np.argsort(concatenated.start, kind="stable")]
+        merged = _mergeSortedWords(tables)
+        assert merged.texts == sorted_words.texts and np.array_equal(merged.start, sorted_words.start)
+        # Sort of one object per word, as done before the words were stored in columns
+        objects = [(w["start"] + offset, w) for t, offset, _ in chunks for w in t["words"]]
+        list_time = timed(lambda: sorted(objects, key=lambda x: x[0]), repeat=1)
+        sort_time = timed(lambda: WordTable.concatenate(tables).sortedByStart())
+        merge_time = timed(lambda: _mergeSortedWords(tables))
+        # Without durations, chunks are merged without stitching
+        whole_time = timed(lambda: TranscriptionResult([(t, offset) for t, offset, _ in chunks]), repeat=1)
+        print(
+            f"{name:>12} {list_time:>14.4f} {sort_time:>16.4f} {merge_time:>10.4f} {sort_time / merge_time:>8.1f} "
+            f"{whole_time:>17.2f}"
+        )
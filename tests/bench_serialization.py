@@ -0,0 +1,63 @@
+"""Measures the encoding and decoding cost of a transcription result at each hop, on a synthetic meeting:
+worker -> Mongo (BSON, with each schema version), Mongo -> ingress (BSON, formating) and ingress -> client
+(JSON or msgpack, rows or compact words).
+
+Usage: python tests/bench_serialization.py [number_of_words]
+"""
+import json
+import os
+
+# Set PYTHONPATH
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+import bson
+import msgpack
+
+from bench_alignment import synthetic_diarization
+from bench_merge import synthetic_chunks, timed
+from transcriptionservice.server.formating import formatResult
+from transcriptionservice.server.mongodb import packing
+from transcriptionservice.transcription.transcription_result import TranscriptionResult
+
+
+def report(hop: str, step: str, seconds: float, size: int = None):
+    print(f"{hop:>18} {step:>50} {seconds:>8.3f} {size / 1e6 if size else float('nan'):>9.1f}")
+
+
+if __name__ == "__main__":
+    num_words = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    # Words rounded as returned by the STT
+    chunks = synthetic_chunks(num_words)
+    for transcription, _, _ in chunks:
+        for word in transcription["words"]:
+            word.update(start=round(word["start"], 2), end=round(word["end"], 2), conf=round(word["conf"], 2))
+    result = TranscriptionResult([(t, offset) for t, offset, _ in chunks])
+    result.setDiarizationResult(synthetic_diarization(float(result.words.end[-1]), 10.0))
+    print(f"{len(result.words)} words, {len(result.segments)} segments")
+    print(f"{'hop':>18} {'step':>50} {'time (s)':>8} {'size (MB)':>9}")
+
+    report("worker -> Mongo", "final_result()", timed(result.final_result, repeat=3))
+    for schema_version, compression in [(1, 0), (2, 0), (2, 1)]:
+        packing.MONGO_COMPRESSION = compression
+        name = f"schema {schema_version}" + (f", zlib {compression}" if compression else "")
+        encode = lambda: bson.encode({"result": packing.encode_result(result, schema_version)})
+        stored = encode()
+        report("worker -> Mongo", f"{name} encoding", timed(encode, repeat=3), len(stored))
+        decode = lambda: packing.decode_result(bson.decode(stored)["result"], schema_version)
+        report("Mongo -> ingress", f"{name} decoding", timed(decode, repeat=3))
+        for compact in [False, True]:
+            step = f"{name} decoding + formatResult" + (" (compact)" if compact else "")
+            report("Mongo -> ingress", step, timed(lambda: formatResult(decode(), "application/json", compact=compact), repeat=3))
+
+    stored = bson.encode({"result": result.final_result()})
+    for compact in [False, True]:
+        formated = formatResult(bson.decode(stored)["result"], "application/json", compact=compact)
+        layout = "compact" if compact else "rows"
+        for name, encode, decode in [
+            ("JSON", lambda: json.dumps(formated, ensure_ascii=False).encode("utf8"), json.loads),
+            ("msgpack", lambda: msgpack.packb(formated), msgpack.unpackb),
+        ]:
+            encoded = encode()
+            report("ingress -> client", f"{name} {layout} encoding", timed(encode, repeat=3), len(encoded))
+            report("ingress -> client", f"{name} {layout} decoding", timed(lambda: decode(encoded), repeat=3))
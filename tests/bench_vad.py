@@ -0,0 +1,61 @@
+"""Compares the speed and cut quality of the VAD methods on synthetic speech/silence signals.
+
+Usage: python tests/bench_vad.py [duration_in_seconds]
+"""
+import os
+import time
+
+# Set PYTHONPATH
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+import numpy as np
+
+from transcriptionservice.transcription.utils.audio import _vad_methods, iterVadDecisions, vadCutIndexes
+
+
+def synthetic_signal(duration: float, snr_db: float, sample_rate: int = 16000, seed: int = 0):
+    """Returns a signal alternating harmonic voiced-like bursts and background noise, with the ground truth speech mask"""
+    rng = np.random.default_rng(seed)
+    noise_level = 3000 / 10 ** (snr_db / 20)
+    parts, mask = [], []
+    length = 0
+    while length < duration * sample_rate:
+        n = int(rng.uniform(0.5, 8.0) * sample_rate)
+        t = np.arange(n) / sample_rate
+        f0 = rng.uniform(100, 250)
+        voiced = sum(np.sin(2 * np.pi * k * f0 * t) / k for k in range(1, 8))
+        parts.append(3000 * voiced * (1 + 0.8 * np.sin(2 * np.pi * 4 * t)) / 2)
+        mask.append(np.ones(n, dtype=bool))
+        n = int(rng.uniform(0.3, 2.0) * sample_rate)
+        parts.append(np.zeros(n))
+        mask.append(np.zeros(n, dtype=bool))
+        length += len(parts[-2]) + len(parts[-1])
+    signal = np.concatenate(parts)[: int(duration * sample_rate)]
+    signal += rng.normal(0, noise_level, len(signal))
+    return np.clip(signal, -32768, 32767).astype(np.int16), np.concatenate(mask)[: len(signal)]
+
+
+def evaluate(signal, mask, method, sample_rate=16000, chunk_length=0.03):
+    start = time.time()
+    decisions = np.concatenate(list(iterVadDecisions(signal, sample_rate, chunk_length=chunk_length, method=method)))
+    vad_time = time.time() - start
+    chunk_size = int(sample_rate * chunk_length)
+    truth = mask[: len(decisions) * chunk_size].reshape(-1, chunk_size).mean(axis=1) > 0.5
+    cuts = vadCutIndexes(signal, sample_rate, chunk_length=chunk_length, method=method, max_segment_duration=30)
+    # A good cut falls in a true silence
+    cuts_in_silence = np.mean(~mask[cuts]) if cuts else float("nan")
+    return vad_time, np.mean(decisions == truth), len(cuts), cuts_in_silence
+
+
+if __name__ == "__main__":
+    duration = float(sys.argv[1]) if len(sys.argv) > 1 else 600.0
+    print(f"{'SNR':>5} {'method':>8} {'time (s)':>9} {'x realtime':>11} {'frame acc':>10} {'cuts':>6} {'in silence':>11}")
+    for snr_db in [30, 20, 10]:
+        signal, mask = synthetic_signal(duration, snr_db)
+        for method in _vad_methods:
+            vad_time, accuracy, num_cuts, in_silence = evaluate(signal, mask, method)
+            print(
+                f"{snr_db:>5} {method:>8} {vad_time:>9.2f} {duration / vad_time:>11.0f} "
+                f"{accuracy:>10.3f} {num_cuts:>6} {in_silence:>11.3f}"
+            )
@@ -0,0 +1,292 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+# Set PYTHONPATH
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+import numpy as np
+import wavio
+
+# Import what to test
+from transcriptionservice.transcription.utils.audio import (
+    decodeAudio,
+    iterCutFrames,
+    iterParallelVadDecisions,
+    iterSplitAudio,
+    iterSplitFile,
+    iterVadDecisions,
+    packDecisions,
+    getChannelPaths,
+    getDuration,
+    probeChannels,
+    splitChannels,
+    splitFile,
+    transcoding,
+    unpackDecisions,
+    vadCutIndexes,
+)
+from transcriptionservice.transcription.utils.wavfile import iterWriteWav
+
+
+def synthetic_speech(duration: float, sample_rate: int = 16000, seed: int = 0) -> np.ndarray:
+    """Generates an alternation of voiced-like bursts and low noise silences"""
+    rng = np.random.default_rng(seed)
+    parts = []
+    length = 0
+    while length < duration * sample_rate:
+        n = int(rng.uniform(0.5, 8.0) * sample_rate)
+        t = np.arange(n) / sample_rate
+        parts.append(
+            3000 * np.sin(2 * np.pi * rng.uniform(100, 300) * t) * (1 + 0.5 * np.sin(2 * np.pi * 3 * t))
+            + rng.normal(0, 800, n)
+        )
+        n = int(rng.uniform(0.2, 2.0) * sample_rate)
+        parts.append(rng.normal(0, 20, n))
+        length += len(parts[-2]) + len(parts[-1])
+    return np.concatenate(parts)[: int(duration * sample_rate)].astype(np.int16)
+
+
+class TestAudio(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.sample_rate = 16000
+        self.audio = synthetic_speech(120, self.sample_rate)
+        self.file_path = os.path.join(self.folder, "audio.wav")
+        wavio.write(self.file_path, self.audio, self.sample_rate, sampwidth=2)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_split_covers_signal(self):
+        subfiles, stats = splitFile(self.file_path, max_segment_duration=20)
+        self.assertGreater(len(subfiles), 1)
+        self.assertAlmostEqual(stats["total"], len(self.audio) / self.sample_rate)
+        expected_offset = 0.0
+        for subfile_path, offset, duration in subfiles:
+            self.assertTrue(os.path.isfile(subfile_path))
+            self.assertAlmostEqual(offset, expected_offset)
+            expected_offset += duration
+        cut_indexes = vadCutIndexes(self.audio, self.sample_rate, max_segment_duration=20)
+        self.assertEqual([int(o * self.sample_rate) for _, o, _ in subfiles[1:]], cut_indexes)
+
+    def test_cut_frames(self):
+        # speech (50 frames) / silence (30 frames) / speech (50 frames) / short silence (5 frames) / speech
+        decisions = np.array([True] * 50 + [False] * 30 + [True] * 50 + [False] * 5 + [True] * 50)
+        expected = [65]
+        self.assertEqual(list(iterCutFrames([decisions], min_silence=0.6)), expected)
+        # Same result whatever the blocks
+        for num_blocks in [2, 7, len(decisions)]:
+            self.assertEqual(list(iterCutFrames(np.array_split(decisions, num_blocks), min_silence=0.6)), expected)
+        # Short silences are used when the speech segment is too long
+        self.assertEqual(list(iterCutFrames([decisions], min_silence=0.6, max_segment_duration=1.5)), [65, 132])
+
+    def test_split_is_streamed(self):
+        subfiles = iterSplitFile(self.file_path, max_segment_duration=20)
+        subfile_path, offset, _ = next(subfiles)
+        self.assertEqual(offset, 0.0)
+        self.assertTrue(os.path.isfile(subfile_path))
+        # Next subfiles are not written yet (the following one can be being written)
+        self.assertFalse(os.path.isfile(os.path.join(self.folder, "audio_2.wav")))
+        remaining = list(subfiles)
+        self.assertEqual(len(remaining) + 1, len(splitFile(self.file_path, max_segment_duration=20)[0]))
+
+    def test_split_yields_chunks_once_written(self):
+        block_size = self.sample_rate // 2
+        decisions = [np.concatenate(list(iterVadDecisions(self.audio, self.sample_rate)))]
+        for precomputed in [None, decisions]:
+            received = []
+
+            def blocks():
+                for start in range(0, len(self.audio), block_size):
+                    time.sleep(0.005)  # Decoding
+                    received.append(start + block_size)
+                    yield self.audio[start : start + block_size]
+
+            subfiles = iterSplitAudio(
+                blocks(), self.sample_rate, os.path.join(self.folder, "chunk"),
+                min_length=0, max_segment_duration=20, decisions=precomputed,
+            )
+            lags = [received[-1] / self.sample_rate - (offset + duration) for _, offset, duration in subfiles]
+            self.assertGreater(len(lags), 5)
+            # A chunk is yielded once the speech following its cut is analysed (silences are shorter than 2 seconds),
+            # and its file written while the next block is read: not after the next cut
+            self.assertLess(max(lags[:-1]), 2.5)
+
+    def test_split_blocks(self):
+        blocks = np.array_split(self.audio, 37)
+        full_path = os.path.join(self.folder, "full.wav")
+        subfiles = list(
+            iterSplitAudio(
+                iterWriteWav(iter(blocks), full_path, self.sample_rate),
+                self.sample_rate,
+                os.path.join(self.folder, "block"),
+                file_path=full_path,
+                max_segment_duration=20,
+            )
+        )
+        expected, _ = splitFile(self.file_path, max_segment_duration=20)
+        self.assertEqual([s[1:] for s in subfiles], [s[1:] for s in expected])
+        content = wavio.read(full_path)
+        self.assertEqual(content.rate, self.sample_rate)
+        np.testing.assert_array_equal(np.squeeze(content.data), self.audio)
+        chunks = [np.squeeze(wavio.read(subfile_path).data) for subfile_path, _, _ in subfiles]
+        np.testing.assert_array_equal(np.concatenate(chunks), self.audio)
+
+    @unittest.skipIf(shutil.which("ffmpeg") is None or shutil.which("ffprobe") is None, "ffmpeg is not available")
+    def test_parallel_decoding(self):
+        # Wave files are decoded in-process
+        ogg_path = os.path.join(self.folder, "audio.ogg")
+        subprocess.run(["ffmpeg", "-loglevel", "error", "-i", self.file_path, "-ar", "44100", ogg_path], check=True)
+        single = np.concatenate(list(decodeAudio(ogg_path, cleanup=False, workers=1)))
+        parallel = np.concatenate(list(decodeAudio(ogg_path, cleanup=False, workers=3, min_range_duration=30)))
+        self.assertEqual(len(single), len(self.audio))
+        self.assertEqual(len(parallel), len(self.audio))
+
+    def test_energy_vad(self):
+        cut_indexes = vadCutIndexes(self.audio, self.sample_rate, method="Energy", max_segment_duration=20)
+        self.assertGreater(len(cut_indexes), 1)
+        # Cuts fall in the low noise silences
+        for index in cut_indexes:
+            self.assertLess(np.abs(self.audio[index - 80 : index + 80]).max(), 200)
+        # Same decisions whatever the blocks, although the noise floor is adaptive
+        decisions = np.concatenate(list(iterVadDecisions(self.audio, self.sample_rate, method="Energy")))
+        blocks = np.array_split(self.audio, 53)
+        np.testing.assert_array_equal(
+            np.concatenate(list(iterVadDecisions(iter(blocks), self.sample_rate, method="Energy"))), decisions
+        )
+
+    def test_parallel_vad(self):
+        for method in ["Energy", "WebRTC"]:
+            decisions = np.concatenate(list(iterVadDecisions(self.audio, self.sample_rate, method=method)))
+            parallel = list(iterParallelVadDecisions(self.file_path, method=method, workers=3, min_range_duration=30))
+            np.testing.assert_array_equal(np.concatenate(parallel), decisions)
+        self.assertEqual(
+            splitFile(self.file_path, method="Energy", max_segment_duration=20, workers=3),
+            splitFile(self.file_path, method="Energy", max_segment_duration=20, workers=1),
+        )
+
+    def test_cached_decisions(self):
+        recorded_decisions = []
+        subfiles = list(iterSplitFile(self.file_path, max_segment_duration=20, recorded_decisions=recorded_decisions))
+        self.assertEqual(subfiles, splitFile(self.file_path, max_segment_duration=20)[0])
+        packed, num_frames = packDecisions(recorded_decisions)
+        self.assertIsInstance(packed, bytes)
+        self.assertEqual(num_frames, (len(self.audio) - 1) // 480)
+        # Other segment constraints are applied to the cached decisions
+        decisions = [unpackDecisions(packed, num_frames)]
+        for kwargs in [{"max_segment_duration": 20}, {"max_segment_duration": 10, "min_segment_duration": 5}]:
+            self.assertEqual(
+                list(iterSplitFile(self.file_path, decisions=decisions, **kwargs)),
+                splitFile(self.file_path, **kwargs)[0],
+            )
+
+    def test_skip_non_speech(self):
+        # 30 seconds of low noise in the middle of the signal
+        audio = np.concatenate([self.audio[:640000], np.zeros(480000, dtype=np.int16), self.audio[640000:]])
+        file_path = os.path.join(self.folder, "pause.wav")
+        wavio.write(file_path, audio, self.sample_rate, sampwidth=2)
+        subfiles, stats = splitFile(file_path)
+        # The pause is split between the two chunks around it, mostly made of non-speech
+        for kwargs, skipped in [({"min_speech_ratio": 0.3}, 15), ({"trim_non_speech": True}, 25)]:
+            kept = list(iterSplitFile(file_path, **kwargs))
+            self.assertLess(sum(d for _, _, d in kept), stats["total"] - skipped)
+            # Offsets are the ones of the kept samples
+            for subfile_path, offset, duration in kept:
+                samples = np.squeeze(wavio.read(subfile_path).data)
+                start = round(offset * self.sample_rate)
+                self.assertEqual(len(samples), round(duration * self.sample_rate))
+                np.testing.assert_array_equal(samples, audio[start : start + len(samples)])
+
+    def test_skip_leading_non_speech(self):
+        speech = synthetic_speech(6, self.sample_rate)
+        for name, silence in [("leading.wav", 20), ("short.wav", 3)]:
+            # Long enough to be split, or not split
+            audio = np.concatenate([np.zeros(silence * self.sample_rate, dtype=np.int16), speech])
+            file_path = os.path.join(self.folder, name)
+            wavio.write(file_path, audio, self.sample_rate, sampwidth=2)
+            kept = list(iterSplitFile(file_path, trim_non_speech=True))
+            self.assertEqual(len(kept), 1)
+            subfile_path, offset, duration = kept[0]
+            self.assertNotEqual(subfile_path, file_path)
+            self.assertGreater(offset, silence - 0.5)
+            self.assertLess(duration, 7)
+            # Mostly non-speech
+            self.assertEqual(list(iterSplitFile(file_path, min_speech_ratio=0.8)), [])
+
+    def test_overlapping_windows(self):
+        subfiles, _ = splitFile(self.file_path, max_segment_duration=20)
+        windows = list(iterSplitFile(self.file_path, max_segment_duration=20, window_duration=5, window_overlap=1))
+        self.assertGreater(len(windows), len(subfiles))
+        self.assertLessEqual(max(d for _, _, d in windows), 5)
+        self.assertEqual(windows[0][1], 0.0)
+        self.assertAlmostEqual(windows[-1][1] + windows[-1][2], len(self.audio) / self.sample_rate)
+        for (_, offset, duration), (_, next_offset, _) in zip(windows[:-1], windows[1:]):
+            self.assertGreaterEqual(round((offset + duration) * self.sample_rate), round(next_offset * self.sample_rate))
+        for subfile_path, offset, duration in windows:
+            samples = np.squeeze(wavio.read(subfile_path).data)
+            start = round(offset * self.sample_rate)
+            np.testing.assert_array_equal(samples, self.audio[start : start + len(samples)])
+
+    def test_windows_without_cut(self):
+        # Continuous voiced signal, without any pause
+        rng = np.random.default_rng(0)
+        t = np.arange(60 * self.sample_rate) / self.sample_rate
+        audio = (3000 * np.sin(2 * np.pi * 200 * t) + rng.normal(0, 800, len(t))).astype(np.int16)
+        file_path = os.path.join(self.folder, "continuous.wav")
+        wavio.write(file_path, audio, self.sample_rate, sampwidth=2)
+        self.assertEqual(list(iterSplitFile(file_path)), [(file_path, 0.0, 60.0)])
+        windows = list(iterSplitFile(file_path, window_duration=10, window_overlap=1))
+        self.assertEqual(len(windows), 7)
+        self.assertLessEqual(max(d for _, _, d in windows), 10)
+        self.assertEqual(windows[0][1], 0.0)
+        self.assertAlmostEqual(windows[-1][1] + windows[-1][2], 60.0)
+        for (_, offset, duration), (_, next_offset, _) in zip(windows[:-1], windows[1:]):
+            self.assertAlmostEqual(offset + duration - next_offset, 1.0)
+
+    @unittest.skipIf(shutil.which("ffmpeg") is None or shutil.which("ffprobe") is None, "ffmpeg is not available")
+    def test_flac_chunks(self):
+        subfiles, _ = splitFile(self.file_path, max_segment_duration=20)
+        flac_subfiles = list(iterSplitFile(self.file_path, max_segment_duration=20, audio_format="flac"))
+        self.assertEqual([s[1:] for s in flac_subfiles], [s[1:] for s in subfiles])
+        for (flac_path, _, _), (wav_path, _, _) in zip(flac_subfiles, subfiles):
+            self.assertTrue(flac_path.endswith(".flac"))
+            self.assertLess(os.path.getsize(flac_path), os.path.getsize(wav_path))
+            # Lossless
+            samples = np.concatenate(list(decodeAudio(flac_path, cleanup=False)))
+            np.testing.assert_array_equal(samples, np.squeeze(wavio.read(wav_path).data))
+        # Transcoded file
+        stereo_path = os.path.join(self.folder, "stereo.wav")
+        wavio.write(stereo_path, np.stack([self.audio, self.audio], axis=1), self.sample_rate, sampwidth=2)
+        flac_path = transcoding(stereo_path, output_file_path=os.path.join(self.folder, "stereo.flac"))
+        self.assertAlmostEqual(getDuration(flac_path), len(self.audio) / self.sample_rate, places=2)
+        # Without ffprobe, the duration is the one of the decoded signal
+        with mock.patch("transcriptionservice.transcription.utils.audio.probeDuration", return_value=None):
+            self.assertEqual(getDuration(flac_path), len(self.audio) / self.sample_rate)
+
+    @unittest.skipIf(shutil.which("ffmpeg") is None, "ffmpeg is not available")
+    def test_split_channels(self):
+        other = synthetic_speech(120, self.sample_rate, seed=1)
+        stereo_path = os.path.join(self.folder, "stereo.wav")
+        wavio.write(stereo_path, np.stack([self.audio, other], axis=1), self.sample_rate, sampwidth=2)
+        self.assertEqual(probeChannels(stereo_path), 2)
+        channel_paths = splitChannels(stereo_path, getChannelPaths(stereo_path, 2))
+        self.assertFalse(os.path.exists(stereo_path))
+        for channel_path, expected in zip(channel_paths, [self.audio, other]):
+            content = wavio.read(channel_path)
+            self.assertEqual(content.rate, self.sample_rate)
+            np.testing.assert_array_equal(np.squeeze(content.data), expected)
+
+    def test_short_file_not_split(self):
+        subfiles, _ = splitFile(self.file_path, min_length=200)
+        self.assertEqual(subfiles, [(self.file_path, 0.0, len(self.audio) / self.sample_rate)])
+
+
+if __name__ == '__main__':
+    unittest.main()
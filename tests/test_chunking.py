@@ -0,0 +1,83 @@
+import io
+import unittest
+
+# Set PYTHONPATH
+import sys, os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+# Import what to test
+from transcriptionservice.server.mongodb import chunking
+from transcriptionservice.server.mongodb.chunking import (
+    read_result_file,
+    select_fields,
+    select_window,
+    write_result_file,
+)
+from transcriptionservice.transcription.transcription_result import TranscriptionResult
+
+
+class RecordingStream(io.BytesIO):
+    """File stream recording the ranges read"""
+
+    def __init__(self, data: bytes):
+        super().__init__(data)
+        self.ranges = []
+
+    def read(self, size: int = -1) -> bytes:
+        self.ranges.append((self.tell(), size))
+        return super().read(size)
+
+
+class TestChunking(unittest.TestCase):
+
+    def setUp(self):
+        # 10 words per second, a speaker turn every 10 seconds
+        words = [{"word": f"w{i}", "start": i / 10, "end": round(i / 10 + 0.05, 2), "conf": 1.0} for i in range(600)]
+        self.result = TranscriptionResult([({"words": words}, 0.0)])
+        self.result.setDiarizationResult({"segments": [
+            {"seg_begin": 10.0 * i, "seg_end": 10.0 * (i + 1), "spk_id": f"spk{i % 2}", "seg_id": i} for i in range(6)
+        ]})
+        self.block_words = chunking.BLOCK_WORDS
+        chunking.BLOCK_WORDS = 150
+
+    def tearDown(self):
+        chunking.BLOCK_WORDS = self.block_words
+
+    def test_result_file(self):
+        for schema_version in [1, 2]:
+            stream = io.BytesIO()
+            index = write_result_file(stream, self.result, schema_version)
+            # Blocks of 2 segments
+            self.assertEqual([(b["start"], b["end"]) for b in index["blocks"]], [(0.0, 19.95), (20.0, 39.95), (40.0, 59.95)])
+            self.assertEqual(read_result_file(io.BytesIO(stream.getvalue()), index, schema_version), self.result.final_result())
+
+    def test_time_window(self):
+        stream = io.BytesIO()
+        index = write_result_file(stream, self.result, 2)
+        stream = RecordingStream(stream.getvalue())
+        result = select_window(read_result_file(stream, index, 2, 25.0, 32.0), 25.0, 32.0)
+        # Only the head and the second block are read
+        block = index["blocks"][1]
+        self.assertEqual(stream.ranges, [(0, index["head"]), (block["offset"], block["length"])])
+        self.assertEqual([s["spk_id"] for s in result["segments"]], ["spk0", "spk1"])
+        self.assertEqual([s["seg_id"] for s in result["diarization_segments"]], [2, 3])
+        self.assertEqual(result["transcription_result"], " \n".join(
+            f"{s['spk_id']}: {s['segment']}" for s in self.result.final_result()["segments"][2:4]
+        ))
+        self.assertTrue(result["raw_transcription"].startswith("w200 w201"))
+
+    def test_fields(self):
+        stream = io.BytesIO()
+        index = write_result_file(stream, self.result, 2)
+        stream = RecordingStream(stream.getvalue())
+        # Blocks are not read without segments
+        result = select_fields(read_result_file(stream, index, 2, fields=["language", "confidence"]), ["language", "confidence"])
+        self.assertEqual(stream.ranges, [(0, index["head"])])
+        self.assertEqual(result, {"language": None, "confidence": 1.0})
+        fields = ["segments.start", "segments.spk_id"]
+        result = select_fields(read_result_file(io.BytesIO(stream.getvalue()), index, 2, fields=fields), fields)
+        self.assertEqual(result["segments"][:2], [{"spk_id": "spk0", "start": 0.0}, {"spk_id": "spk1", "start": 10.0}])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import unittest
+
+# Set PYTHONPATH
+import sys, os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+# Import what to test
+from transcriptionservice.server.mongodb.db_client import RESULT_INDEXES, _result_projection
+
+
+class TestDBClient(unittest.TestCase):
+
+    def test_result_projection(self):
+        self.assertIsNone(_result_projection(None, True))
+        self.assertEqual(
+            _result_projection(["transcription_result", "segments.language"], False),
+            ["schema_version", "result_file", "result.segments.language", "result.transcription_result"],
+        )
+        # Packed words are read with the words of the segments, and segment paths do not collide with segments
+        self.assertEqual(
+            _result_projection(["segments", "segments.words"], False),
+            ["schema_version", "result_file", "result.segments", "result.words"],
+        )
+        # Windows need the bounds and texts of the segments
+        self.assertEqual(
+            _result_projection(["language"], True),
+            ["schema_version", "result_file", "result.diarization_segments", "result.language", "result.segments.end",
+             "result.segments.raw_segment", "result.segments.segment", "result.segments.spk_id", "result.segments.start"],
+        )
+
+    def test_result_indexes(self):
+        # Lookups by job id, and by hash sorted by datetime, are covered by an index
+        keys = [[field for field, _ in index] for _, index in RESULT_INDEXES]
+        self.assertIn(["job_id"], keys)
+        self.assertIn(["hash", "datetime"], keys)
+        self.assertEqual(len({name for name, _ in RESULT_INDEXES}), len(RESULT_INDEXES))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,6 +5,7 @@ import sys, os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
 
 # Import what to test
+from transcriptionservice.server.formating.formatresult import formatResult
 from transcriptionservice.server.formating.normalization import (
     cleanText,
     removeWordPunctuations,
@@ -133,6 +134,24 @@ class TestFormating(unittest.TestCase):
                 expected
             )
 
+    def test_format_result(self):
+        result = {
+            "transcription_result": "Oui ? Oui !",
+            "raw_transcription": "oui oui",
+            "segments": [{
+                "segment": "Oui ? Oui !",
+                "words": [
+                    {"word": "Oui?", "start": 0.0, "end": 0.5, "conf": 0.9},
+                    {"word": "?", "start": 0.5, "end": 0.6, "conf": 0.9},
+                    {"word": "Oui!", "start": 1.0, "end": 1.5, "conf": 0.8},
+                ],
+            }],
+        }
+        formated = formatResult(result, "application/msgpack", compact=True)
+        self.assertEqual(formated["segments"][0]["words"], {
+            "word": ["Oui", "Oui"], "start": [0.0, 1.0], "end": [0.5, 1.5], "conf": [0.9, 0.8],
+        })
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+
+# Set PYTHONPATH
+import sys, os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+import bson
+
+# Import what to test
+from transcriptionservice.server.mongodb.packing import (
+    decode_result,
+    decode_transcription,
+    encode_result,
+    encode_transcription,
+    pack_words,
+    unpack_words,
+)
+from transcriptionservice.transcription.transcription_result import TranscriptionResult
+
+
+def stored(document: dict) -> dict:
+    """Returns the document as read back from the database"""
+    return bson.decode(bson.encode({"document": document}))["document"]
+
+
+class TestPacking(unittest.TestCase):
+
+    def setUp(self):
+        words = [
+            {"word": "bonjour", "start": 0.0, "end": 0.52, "conf": 0.98},
+            {"word": "hello", "start": 0.61, "end": 1.2, "conf": 0.5},
+            {"word": "bonjour", "start": 3.335, "end": 4.0, "conf": 1.0},
+        ]
+        self.result = TranscriptionResult([({"words": words, "language": "fr"}, 10.0)])
+        self.result.setDiarizationResult({"segments": [
+            {"seg_begin": 0.0, "seg_end": 12.0, "spk_id": "spk1", "seg_id": 1},
+            {"seg_begin": 12.0, "seg_end": 14.0, "spk_id": "spk2", "seg_id": 2},
+        ]})
+
+    def test_result(self):
+        expected = self.result.final_result()
+        self.assertEqual(decode_result(stored(encode_result(self.result, 1)), 1), expected)
+        document = stored(encode_result(self.result, 2))
+        self.assertIsNone(document["segments"][0]["words"])
+        self.assertEqual(document["words"]["vocabulary"], ["bonjour", "hello"])
+        decoded = decode_result(document, 2)
+        self.assertEqual(decoded, expected)
+        # Same keys, in the same order
+        self.assertEqual(list(decoded["segments"][0]), list(expected["segments"][0]))
+
+    def test_transcription(self):
+        words, words_language = self.result.words, self.result.words_language
+        for schema_version in [1, 2]:
+            document = stored(encode_transcription(words, words_language, schema_version))
+            self.assertEqual(
+                decode_transcription(document, schema_version),
+                {"words": words.json, "words_language": ["fr", "fr", "fr"]},
+            )
+
+    def test_compression(self):
+        tables = [segment.words for segment in self.result.segments]
+        packed = stored(pack_words(tables, compression=6))
+        self.assertEqual(packed["compression"], "zlib")
+        self.assertEqual([words.json for words in unpack_words(packed)], [words.json for words in tables])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+from datetime import datetime, timedelta
+
+# Set PYTHONPATH
+import sys, os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+# Import what to test
+from transcriptionservice.server.mongodb.retention import access_time, age_histogram, select_evictions
+
+
+class TestRetention(unittest.TestCase):
+
+    def setUp(self):
+        self.now = datetime(2024, 6, 1)
+        # Accessed 0, 2, 10 and 40 days ago, 1 MB each
+        self.entries = [
+            {"_id": f"doc{days}", "last_access": self.now - timedelta(days=days), "size": 1e6}
+            for days in [10, 0, 40, 2]
+        ]
+
+    def test_access_time(self):
+        self.assertEqual(access_time(self.entries[0]), self.now - timedelta(days=10))
+        # Documents written before the last access was tracked
+        written = datetime(2024, 1, 1, 12)
+        self.assertEqual(
+            access_time({"datetime": written.isoformat()}),
+            datetime.utcfromtimestamp(written.timestamp()),
+        )
+        self.assertEqual(access_time({"last_access": None}), datetime.min)
+
+    def test_select_evictions(self):
+        self.assertEqual(select_evictions(self.entries, self.now), [])
+        self.assertEqual(select_evictions(self.entries, self.now, ttl=7), ["doc10", "doc40"])
+        # The least recently accessed are evicted first
+        self.assertEqual(select_evictions(self.entries, self.now, max_size=2.5), ["doc10", "doc40"])
+        self.assertEqual(select_evictions(self.entries, self.now, max_size=1), ["doc2", "doc10", "doc40"])
+        self.assertEqual(select_evictions(self.entries, self.now, ttl=30, max_size=3), ["doc40"])
+        # Never accessed entries are the oldest
+        entries = self.entries + [{"_id": "unknown", "size": 1}]
+        self.assertEqual(select_evictions(entries, self.now, max_size=4), ["unknown"])
+
+    def test_age_histogram(self):
+        histogram = age_histogram(self.entries, self.now, bins=[1, 7, 30])
+        self.assertEqual(
+            histogram,
+            [("< 1d", 1, 1e6), ("1-7d", 1, 1e6), ("7-30d", 1, 1e6), (">= 30d", 1, 1e6)],
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+# Set PYTHONPATH
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+import numpy as np
+import wavio
+
+# Import what to test
+from transcriptionservice.transcription.utils.audio import iterSplitFile
+from transcriptionservice.transcription.utils.scratch import ScratchArea
+
+
+class TestScratchArea(unittest.TestCase):
+
+    def setUp(self):
+        self.shared = tempfile.mkdtemp()
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.shared)
+        shutil.rmtree(self.folder)
+
+    def test_budget(self):
+        scratch = ScratchArea(self.folder, size=1)
+        file_path = os.path.join(self.shared, "chunk_0.wav")
+        placed = scratch.place(file_path, 600000)
+        self.assertEqual(placed, os.path.join(self.folder, "chunk_0.wav"))
+        with open(placed, "wb") as f:
+            f.write(bytes(600000))
+        # Over budget: fallback to the shared volume
+        self.assertEqual(scratch.place(os.path.join(self.shared, "chunk_1.wav"), 600000), os.path.join(self.shared, "chunk_1.wav"))
+        # Unknown size
+        self.assertEqual(scratch.place(os.path.join(self.shared, "chunk_2.wav"), None), os.path.join(self.shared, "chunk_2.wav"))
+        # Disabled
+        self.assertEqual(ScratchArea(None).place(file_path, 10), file_path)
+
+    def test_usage(self):
+        # Files of other tasks in the folder are not counted
+        with open(os.path.join(self.folder, "other.wav"), "wb") as f:
+            f.write(bytes(900000))
+        scratch = ScratchArea(self.folder, size=1)
+        placed = scratch.place(os.path.join(self.shared, "chunk_0.wav"), 600000)
+        self.assertEqual(os.path.dirname(placed), self.folder)
+        self.assertEqual(scratch.usage, 600000)
+        chunk_1 = os.path.join(self.shared, "chunk_1.wav")
+        self.assertEqual(scratch.place(chunk_1, 600000), chunk_1)
+        # Removed files are released
+        scratch.remove(placed)
+        self.assertEqual(scratch.usage, 0)
+        self.assertEqual(os.path.dirname(scratch.place(chunk_1, 600000)), self.folder)
+        scratch.cleanup()
+        self.assertEqual(scratch.usage, 0)
+        self.assertEqual(os.listdir(self.folder), ["other.wav"])
+
+    def test_cleanup(self):
+        file_path = os.path.join(self.shared, "audio.wav")
+        # 4 seconds of noise followed by 1 second of silence
+        pattern = np.concatenate([np.random.default_rng(0).normal(0, 3000, 64000), np.zeros(16000)])
+        wavio.write(file_path, np.tile(pattern, 12).astype(np.int16), 16000, sampwidth=2)
+        scratch = ScratchArea(self.folder, size=10)
+        scratch.track(file_path)
+        subfiles = iterSplitFile(file_path, max_segment_duration=5, scratch=scratch)
+        subfile_path, _, _ = next(subfiles)
+        self.assertEqual(os.path.dirname(subfile_path), self.folder)
+        # Failure while splitting
+        subfiles.close()
+        scratch.cleanup()
+        self.assertEqual(os.listdir(self.folder), [])
+        self.assertEqual(os.listdir(self.shared), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
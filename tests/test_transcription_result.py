@@ -0,0 +1,165 @@
+import unittest
+
+# Set PYTHONPATH
+import sys, os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+# Import what to test
+import numpy as np
+
+from transcriptionservice.transcription.transcription_result import (
+    SpeechSegment,
+    TranscriptionResult,
+    WordTable,
+    _mergeSortedWords,
+)
+
+
+def transcription(words, offset=0.0, conf=1.0):
+    """Returns a transcription of the words given as (word, start, end) in absolute time"""
+    return {
+        "words": [
+            {"word": word, "start": start - offset, "end": end - offset, "conf": conf}
+            for word, start, end in words
+        ]
+    }
+
+
+class TestTranscriptionResult(unittest.TestCase):
+
+    def test_merge(self):
+        first = [(f"w{i}", i, i + 0.5) for i in range(5)]
+        second = [(f"w{i}", i, i + 0.5) for i in range(5, 10)]
+        result = TranscriptionResult([(transcription(second, 5.0), 5.0), (transcription(first), 0.0)])
+        self.assertEqual(result.raw_transcription, " ".join(f"w{i}" for i in range(10)))
+        self.assertEqual(result.transcription_confidence, 1.0)
+
+    def test_stitch_overlapping_windows(self):
+        words = [(f"w{i}", i, i + 0.5) for i in range(18)]
+        # Windows [0, 10] and [8, 18]: words w8 and w9 are transcribed twice
+        first = transcription(words[:10] + [("trunc", 9.8, 10.0)], conf=0.9)
+        second = transcription([("w8", 8.05, 8.5)] + words[9:], 8.0, conf=0.8)
+        result = TranscriptionResult([(first, 0.0, 10.0), (second, 8.0, 10.0)], windowed=True)
+        self.assertEqual([w.word for w in result.words], [f"w{i}" for i in range(18)])
+        # The most confident version of duplicated words is kept
+        self.assertEqual(result.words[8].start, 8.0)
+        self.assertEqual(result.words[9].conf, 0.9)
+        # Consecutive chunks are not stitched
+        result = TranscriptionResult(
+            [(transcription(words[:10]), 0.0, 10.0), (transcription(words[10:], 10.0), 10.0, 8.0)], windowed=True
+        )
+        self.assertEqual(len(result.words), 18)
+
+    def test_overlapping_timestamps_not_stitched(self):
+        # Overlapping timestamps of the same speaker, e.g. given by the user
+        first = transcription([("a", 0.0, 0.5), ("b", 9.0, 9.5)])
+        second = transcription([("c", 8.0, 8.4), ("d", 9.1, 9.4)], 8.0)
+        result = TranscriptionResult([(first, 0.0, 10.0), (second, 8.0, 4.0)], ["spk1", "spk1"])
+        self.assertEqual(result.raw_transcription, "a c b d")
+        self.assertEqual(len(result.words), 4)
+
+    def test_speaker_per_chunk(self):
+        # Chunks of two channels, transcribed separately
+        left = [("hello", 0.0, 0.5), ("bye", 4.0, 4.5)]
+        right = [("hi", 1.0, 1.5), ("yes", 2.0, 2.5)]
+        transcriptions = [
+            (transcription(left[:1]), 0.0, 3.0),
+            (transcription(left[1:], 3.0), 3.0, 2.0),
+            (transcription(right, 0.5), 0.5, 4.0),
+        ]
+        result = TranscriptionResult(transcriptions, [0, 0, 1], windowed=True)
+        # Words of overlapping chunks of different speakers are all kept
+        self.assertEqual(result.raw_transcription, "hello hi yes bye")
+        self.assertEqual([(s.speaker_id, s.raw_segment) for s in result.segments], [(0, "hello"), (1, "hi yes"), (0, "bye")])
+
+    def test_word_table(self):
+        words = transcription([("a", 0, 1), ("b", 1, 2), ("a", 2, 3)])["words"]
+        table = WordTable.fromJson(words, ["fr", "en", "fr"], offset=10.0)
+        self.assertEqual(table.vocabulary.strings, ["a", "b"])
+        self.assertEqual(table[-1].json, {"word": "a", "start": 12.0, "end": 13.0, "conf": 1.0})
+        self.assertEqual(table[1:].texts, ["b", "a"])
+        self.assertEqual(table[1:].words_language, ["en", "fr"])
+        self.assertEqual(table.majority_language, "fr")
+        self.assertEqual([w.word for w in table], ["a", "b", "a"])
+        self.assertEqual(WordTable.fromJson(table.json).json, table.json)
+        # Views write in their table
+        table[0].apply_offset(-10.0)
+        self.assertEqual(table.start[0], 0.0)
+
+    def test_diarization_keeps_languages(self):
+        first = dict(transcription([("un", 0, 1), ("deux", 4, 5)]), language="fr")
+        second = dict(transcription([("one", 2, 3), ("two", 6, 7)], 2.0), language="en")
+        result = TranscriptionResult([(first, 0.0), (second, 2.0)])
+        self.assertEqual(result.words_language, ["fr", "en", "fr", "en"])
+        result.setDiarizationResult(
+            {"segments": [
+                {"seg_begin": 0.0, "seg_end": 1.5, "spk_id": "A", "seg_id": 0},
+                {"seg_begin": 1.5, "seg_end": 3.5, "spk_id": "B", "seg_id": 1},
+                {"seg_begin": 3.5, "seg_end": 7.0, "spk_id": "A", "seg_id": 2},
+            ]}
+        )
+        self.assertEqual(
+            [(s.speaker_id, s.raw_segment, s.language) for s in result.segments],
+            [("A", "un", "fr"), ("B", "one", "en"), ("A", "deux two", "fr")],
+        )
+
+    def test_merge_sorted_runs(self):
+        rng = np.random.default_rng(0)
+        for _ in range(200):
+            table = WordTable()
+            tables = []
+            for k in range(rng.integers(1, 6)):
+                starts = rng.integers(0, 10) + np.sort(rng.integers(0, 10, rng.integers(0, 10))) / 2
+                if rng.random() < 0.2:
+                    rng.shuffle(starts)
+                words = [{"word": f"{k}-{i}", "start": s, "end": s, "conf": 1.0} for i, s in enumerate(starts)]
+                tables.append(WordTable.fromJson(words, vocabulary=table.vocabulary))
+            merged = _mergeSortedWords(tables)
+            self.assertTrue(merged._sorted)
+            # Same as a stable sort, including ties
+            concatenated = WordTable.concatenate(tables)
+            self.assertEqual(merged.texts, concatenated[np.argsort(concatenated.start, kind="stable")].texts)
+        # Sortedness is kept by slices and masks, and checked once otherwise
+        self.assertTrue(merged[1:][merged[1:].conf > 0]._sorted)
+        self.assertIsNone(merged[::-1]._sorted)
+        self.assertIs(merged.sortedByStart(), merged)
+
+    def test_align_words(self):
+        rng = np.random.default_rng(0)
+        for _ in range(300):
+            starts = np.round(np.cumsum(rng.choice([0.0, 0.05, 0.25, 0.6], rng.integers(1, 40))), 2)
+            words = [(rng.choice(["a", "b.", ""]), s, s + rng.choice([0.0, 0.25, 0.4])) for s in starts.tolist()]
+            result = TranscriptionResult([(transcription(words), 0.0)])
+            turns = np.round(np.cumsum(rng.choice([0.05, 0.25, 0.5, 2.0], rng.integers(1, 10))), 2).tolist()
+            result.setDiarizationResult({"segments": [
+                # Segments are jittered, some included in others
+                {"seg_begin": b, "seg_end": e + rng.choice([0.0, 0.25, -0.25, 1.0]), "spk_id": rng.integers(3), "seg_id": i}
+                for i, (b, e) in enumerate(zip([0.0] + turns, turns + [turns[-1] + 1]))
+            ]})
+            # Same placement as word by word
+            expected = []
+            seg_index = 0
+            for i in range(len(result.words)):
+                while not result._resolveWordSegment(i, seg_index):
+                    seg_index += 1
+                expected.append(seg_index)
+            self.assertEqual(result._alignWords().tolist(), expected)
+            self.assertEqual(sum(len(s.words) for s in result.segments), len(words))
+
+    def test_segment_aggregates(self):
+        result = TranscriptionResult([(transcription([("b", 1, 2), ("a", 0.5, 3), ("c", 2, 2.5)]), 0.0)])
+        result.setNoDiarization()
+        segment = result.segments[0]
+        self.assertEqual((segment.start, segment.end, segment.duration, segment.raw_segment), (0.5, 3.0, 2.5, "a b c"))
+        # Cached values are reset when timestamps change or words are replaced
+        segment.words[0].apply_offset(-0.5)
+        self.assertEqual((segment.start, segment.end), (0.0, 2.5))
+        segment.words.applyOffset(1.0)
+        self.assertEqual((segment.start, segment.end), (1.0, 3.5))
+        segment.words = segment.words[2:]
+        self.assertEqual((segment.start, segment.end, segment.raw_segment), (3.0, 3.5, "c"))
+        self.assertEqual(SpeechSegment().json["duration"], 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+# Set PYTHONPATH
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+import numpy as np
+import wavio
+
+# Import what to test
+from transcriptionservice.transcription.utils.audio import getDuration, getTranscodedPath, transcoding
+from transcriptionservice.transcription.utils.wavfile import (
+    iterReadWav,
+    mapWav,
+    readWavHeader,
+    releaseMapped,
+    writeWav,
+)
+
+
+class TestWavFile(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def write(self, name, data, sample_rate, sampwidth=2):
+        file_path = os.path.join(self.folder, name)
+        wavio.write(file_path, data, sample_rate, sampwidth=sampwidth)
+        return file_path
+
+    def test_header(self):
+        file_path = self.write("stereo.wav", np.zeros((8000, 2), dtype=np.int16), 8000)
+        header = readWavHeader(file_path)
+        self.assertEqual(header.num_channels, 2)
+        self.assertEqual(header.sample_rate, 8000)
+        self.assertEqual(header.sampwidth, 2)
+        self.assertEqual(header.num_frames, 8000)
+        self.assertEqual(header.duration, 1.0)
+        self.assertFalse(header.isConformant())
+        self.assertTrue(header.isConvertible)
+
+        not_wav = os.path.join(self.folder, "audio.mp3")
+        with open(not_wav, "wb") as f:
+            f.write(b"ID3" + bytes(100))
+        self.assertIsNone(readWavHeader(not_wav))
+
+    def test_memory_mapping(self):
+        signal = np.arange(-16000, 16000, dtype=np.int16)
+        file_path = self.write("mono.wav", signal, 16000)
+        self.assertEqual(getDuration(file_path), 2.0)
+        samples, sample_rate = mapWav(file_path)
+        self.assertIsInstance(samples, np.memmap)
+        self.assertEqual(sample_rate, 16000)
+        np.testing.assert_array_equal(samples[100:200], signal[100:200])
+        # Released pages are read again from the file
+        releaseMapped(samples, len(samples))
+        np.testing.assert_array_equal(samples, signal)
+
+    def test_write(self):
+        signal = np.arange(-8000, 8000, dtype=np.int16)
+        file_path = os.path.join(self.folder, "chunk.wav")
+        writeWav(file_path, signal[::2], 16000)
+        self.assertTrue(readWavHeader(file_path).isConformant())
+        content = wavio.read(file_path)
+        self.assertEqual(content.rate, 16000)
+        np.testing.assert_array_equal(np.squeeze(content.data), signal[::2])
+
+    def test_conformant_used_in_place(self):
+        file_path = self.write("mono.wav", np.zeros(16000, dtype=np.int16), 16000)
+        self.assertTrue(readWavHeader(file_path).isConformant())
+        self.assertEqual(getTranscodedPath(file_path), file_path)
+        self.assertEqual(transcoding(file_path), file_path)
+        self.assertTrue(os.path.isfile(file_path))
+
+    def test_resampling(self):
+        for sample_rate in [8000, 44100, 48000]:
+            t = np.arange(sample_rate * 2) / sample_rate
+            signal = (8000 * np.sin(2 * np.pi * 440 * t)).astype(np.int16)
+            file_path = self.write(f"{sample_rate}.wav", np.stack([signal, signal], axis=1), sample_rate)
+            output = np.concatenate(list(iterReadWav(file_path, output_sr=16000, block_duration=0.3)))
+            self.assertEqual(len(output), 32000)
+            expected = 8000 * np.sin(2 * np.pi * 440 * np.arange(len(output)) / 16000)
+            # Ignore filter edges
+            self.assertLess(np.abs(output - expected)[400:-400].max(), 40)
+
+            output_path = transcoding(file_path)
+            self.assertFalse(os.path.isfile(file_path))
+            self.assertTrue(readWavHeader(output_path).isConformant())
+
+
+if __name__ == '__main__':
+    unittest.main()
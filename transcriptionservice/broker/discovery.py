@@ -1,6 +1,7 @@
 """ The discovery submodule contains methods and function to list and fetch informations relative to subtasks."""
 import json
 import os
+from typing import List
 
 import redis
 from redis.commands.search.field import NumericField, TextField
@@ -8,21 +9,25 @@ from redis.commands.search.indexDefinition import IndexDefinition, IndexType
 
 from transcriptionservice.broker.celeryapp import celery
 
-__all__ = ["Service", "list_available_services", "SERVICE_TYPES"]
+__all__ = ["Service", "list_available_services", "SERVICE_TYPES", "STT_SERVICE_TYPE"]
 
 SERVICE_DISCOVERY_DB = 0  # RedisJSON only allow json indexing on DB 0
 SERVICE_TYPES = [
     "diarization",
     "punctuation",
 ]  # If you intend to add other subservice, add their service's type here
+STT_SERVICE_TYPE = "stt"  # STT services are not resolved, they are only listed to read their info
 LANGUAGE = os.environ.get("LANGUAGE")
 
 
-def list_available_services(ensure_alive: bool = False, as_json: bool = False) -> dict:
+def list_available_services(
+    ensure_alive: bool = False, as_json: bool = False, service_types: List[str] = SERVICE_TYPES
+) -> dict:
     """Fetch available services, filter by language and sort by type
 
     Args:
         ensure_alive (bool, optional): If true, check if the registered service still exist. Defaults to False.
+        service_types (List[str], optional): Types of the listed services. Defaults to SERVICE_TYPES.
 
     Returns:
         dict: A dictionary containing types as primary key. Each type containing available service informations.
@@ -68,7 +73,7 @@ def list_available_services(ensure_alive: bool = False, as_json: bool = False) -
         print("Index successfully restored")
 
     # Listing services
-    for service_type in SERVICE_TYPES:
+    for service_type in service_types:
         services[service_type] = {}
         service_l_doc = redis_client.ft().search(service_type).docs
         # Filter and check services
@@ -179,6 +184,20 @@ class Service:
         service.add_instance(service_info, service_id)
         return service
 
+    @property
+    def audio_formats(self) -> List[str]:
+        """Audio containers the service declares it reads in its info, e.g. {"audio_formats": ["wav", "flac"]}.
+        Services which do not declare them read wave files only."""
+        info = self.info
+        if isinstance(info, str):
+            try:
+                info = json.loads(info)
+            except ValueError:
+                info = None
+        if isinstance(info, dict) and isinstance(info.get("audio_formats"), list):
+            return [str(audio_format).lower() for audio_format in info["audio_formats"]]
+        return ["wav"]
+
     def to_dict(self) -> dict:
         return {
             "service_name": self.service_name,
@@ -17,16 +17,18 @@ def formatResult(
     remove_punctuation_from_words: bool = True,
     remove_empty_words: bool = True,
     ensure_no_spaces_in_words: bool = True,
+    compact: bool = False,
 ) -> Union[dict, str]:
     """Format result using result query parameters
 
     Keyword arguments:
 
     - result (dict): The result as stored in the result database
-    - return_format (str) : Return format [application/json | text/plain | text/vtt | text/srt]
+    - return_format (str) : Return format [application/json | application/msgpack | text/plain | text/vtt | text/srt]
     - raw_return (bool) : If True, returns the raw transcription result
     - convert_numbers (bool): If True, converts the numbers to digits
     - user_sub (List[Tuple[str, str]]): A list of tuple for custom substitution in the final transcription.
+    - compact (bool): If True, the words of each segment are returned as columns (json and msgpack formats)
 
     """
 
@@ -46,18 +48,32 @@ def formatResult(
     else:
         fulltext_cleaner = lambda text: cleanText(text, language, user_sub)
 
-    if return_format == "application/json":
-        for seg in result["segments"]:
-            seg["segment"] = fulltext_cleaner(seg["segment"])
+    if return_format in ["application/json", "application/msgpack"]:
+        # Words are cleaned once, as they are often repeated
+        cleaned_words = {}
+        # Results can be partial (see the fields option)
+        for seg in result.get("segments", []):
+            if "segment" in seg:
+                seg["segment"] = fulltext_cleaner(seg["segment"])
+            if "words" not in seg:
+                continue
             if remove_punctuation_from_words:
                 for word in seg["words"]:
-                    word["word"] = removeWordPunctuations(word["word"], ensure_no_spaces_in_words=ensure_no_spaces_in_words)
+                    cleaned_word = cleaned_words.get(word["word"])
+                    if cleaned_word is None:
+                        cleaned_word = cleaned_words[word["word"]] = removeWordPunctuations(
+                            word["word"], ensure_no_spaces_in_words=ensure_no_spaces_in_words
+                        )
+                    word["word"] = cleaned_word
             elif ensure_no_spaces_in_words:
                 for word in seg["words"]:
                     assert " " not in word["word"], f"Got unexpected word containing space: {word['word']}"
             if remove_empty_words:
                 seg["words"] = [word for word in seg["words"] if word["word"]]
-        result["transcription_result"] = fulltext_cleaner(result["transcription_result"])
+            if compact:
+                seg["words"] = wordColumns(seg["words"])
+        if "transcription_result" in result:
+            result["transcription_result"] = fulltext_cleaner(result["transcription_result"])
         return result
 
     elif return_format == "text/plain":
@@ -81,3 +97,13 @@ def formatResult(
     else:
         raise Exception("Unknown return format")
 
+
+def wordColumns(words: List[dict]) -> dict:
+    """Returns words {"word", "start", "end", "conf"} as one list per field"""
+    return {
+        "word": [word["word"] for word in words],
+        "start": [word["start"] for word in words],
+        "end": [word["end"] for word in words],
+        "conf": [word["conf"] for word in words],
+    }
+
@@ -1,8 +1,10 @@
 import time
 from typing import List, Tuple
 
+import numpy as np
+
 from transcriptionservice.transcription.transcription_result import (
-    SpeechSegment, TranscriptionResult, Word)
+    SpeechSegment, TranscriptionResult, WordTable)
 
 from .normalization import cleanText, textToNum
 
@@ -12,11 +14,11 @@ END_MARKERS = [".", ";", "!", "?", ":"]
 class SubtitleItem:
     """SubTitleItem format a speech segment to subtitling item"""
 
-    def __init__(self, words: List[Tuple[Word, str]], language: str = ""):
-        self.words, self.final_words = zip(*words)
+    def __init__(self, words: WordTable, final_words: List[str], language: str = ""):
+        self.words = words
+        self.final_words = final_words
         self.language = language
-        self.start = min([w.start for w in self.words])
-        self.end = max([w.end for w in self.words])
+        self.start, self.end = words.bounds
 
     def formatUtterance(
         self, utterance: str, text_cleaner, user_sub: List[Tuple[str, str]]
@@ -118,7 +120,7 @@ class SubtitleItem:
         if return_raw:
             output += "{}\n\n".format(
                 self.formatUtterance(
-                    " ".join([w.word for w in self.words]), text_cleaner, user_sub
+                    " ".join(self.words.texts), text_cleaner, user_sub
                 )
             )
         else:
@@ -160,8 +162,6 @@ class Subtitles:
     def segmentsToSubtitleItems(
         self, segment: SpeechSegment, next_item_skip_t: float = 1.5
     ) -> List[SubtitleItem]:
-        items = []
-        current_words = []
         if segment.processed_segment is None:
             processed_words = segment.raw_segment.split(" ")
         else:
@@ -171,17 +171,17 @@ class Subtitles:
         #       Because Whisper can output punctuation marks that not (always) glued to the previous words.
         assert len(processed_words) == len(segment.words), "Processed word count mismatch"
 
-        for i, word in enumerate(segment.words[:-1]):
-            current_words.append((word, processed_words[i]))
-            if (
-                processed_words[i][-1] in END_MARKERS
-                or segment.words[i + 1].start - word.end > next_item_skip_t
-            ):
-                items.append(SubtitleItem(current_words, self.language))
-                current_words = []
-        current_words.append((segment.words[-1], processed_words[-1]))
-        items.append(SubtitleItem(current_words, self.language))
-        return items
+        # Items end at the end of sentences, and before long silences
+        words = segment.words
+        cuts = np.flatnonzero(
+            np.array([w[-1] in END_MARKERS for w in processed_words[:-1]], dtype=bool)
+            | (words.start[1:] - words.end[:-1] > next_item_skip_t)
+        ) + 1
+        bounds = [0] + cuts.tolist() + [len(words)]
+        return [
+            SubtitleItem(words[start:stop], processed_words[start:stop], self.language)
+            for start, stop in zip(bounds[:-1], bounds[1:])
+        ]
 
     def toSRT(
         self,
@@ -189,7 +189,7 @@ class Subtitles:
         text_cleaner = None,
         user_sub: List[Tuple[str, str]] = [],
     ) -> str:
-        output = ""
+        outputs = []
         i = 0
         for item in self.subtitleItems:
             r, n = item.toSRT(
@@ -198,9 +198,9 @@ class Subtitles:
                 text_cleaner=text_cleaner,
                 user_sub=user_sub,
             )
-            output += r
+            outputs.append(r)
             i += n
-        return output
+        return "".join(outputs)
 
     def toVTT(
         self,
@@ -208,11 +208,11 @@ class Subtitles:
         text_cleaner = None,
         user_sub: List[Tuple[str, str]] = [],
     ) -> str:
-        output = "WEBVTT Kind: captions; Language: {}\n\n".format(self.language)
+        outputs = ["WEBVTT Kind: captions; Language: {}\n\n".format(self.language)]
         for item in self.subtitleItems:
-            output += item.toVTT(
+            outputs.append(item.toVTT(
                 return_raw=return_raw,
                 text_cleaner=text_cleaner,
                 user_sub=user_sub,
-            )
-        return output
+            ))
+        return "".join(outputs)
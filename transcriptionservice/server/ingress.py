@@ -3,12 +3,13 @@
 import logging
 import os
 
+import msgpack
 from celery.result import AsyncResult
 from celery.result import states as task_states
 from celery import current_app
 from celery.signals import after_task_publish
 
-from flask import Flask, json, request
+from flask import Flask, Response, json, request
 
 from transcriptionservice import logger
 from transcriptionservice.broker.discovery import list_available_services
@@ -29,7 +30,7 @@ from transcriptionservice.transcription.transcription_task import (
 )
 
 AUDIO_FOLDER = "/opt/audio"
-SUPPORTED_HEADER_FORMAT = ["text/plain", "application/json", "text/vtt", "text/srt"]
+SUPPORTED_HEADER_FORMAT = ["text/plain", "application/json", "application/msgpack", "text/vtt", "text/srt"]
 
 app = Flask("__services_manager__")
 app.config["JSON_AS_ASCII"] = False
@@ -67,6 +68,14 @@ def jobstatus(jobid):
         result_id = task.get()
         return json.dumps({"state": "done", "result_id": result_id}), 201
     elif state == task_states.PENDING:
+        # The result backend may have expired or lost the task, its result is looked up in the database
+        try:
+            result_id = db_client.fetch_result_id(jobid)
+        except Exception as e:
+            logger.warning("Failed to look up the result of job {}: {}".format(jobid, str(e)))
+            result_id = None
+        if result_id is not None:
+            return json.dumps({"state": "done", "result_id": result_id}), 201
         return json.dumps({"state": "failed", "reason": f"Unknown jobid {jobid}"}), 404
     elif state == task_states.FAILURE:
         return json.dumps({"state": "failed", "reason": str(task.result)}), 500
@@ -97,15 +106,26 @@ def results(result_id):
             400,
         )
 
+    # Time window
+    try:
+        start = float(request.args["start"]) if "start" in request.args else None
+        end = float(request.args["end"]) if "end" in request.args else None
+    except ValueError:
+        return "Query parameters start and end must be numbers (in seconds)", 400
+
     # Result
-    result = db_client.fetch_result(result_id)
+    fields = request.args.get("fields")
+    if fields is not None:
+        fields = [field.strip() for field in fields.split(",") if field.strip()]
+    return_raw = request.args.get("return_raw", False) in [1, True, "true"]
+    result = db_client.fetch_result(result_id, start, end, result_fields(expected_format, return_raw, fields))
     if result is None:
         return f"No result associated with id {result_id}", 404
     logger.debug(f"Returning result fo result_id {result_id}")
 
     # Query parameters
-    return_raw = request.args.get("return_raw", False) in [1, True, "true"]
     convert_numbers = request.args.get("convert_numbers", False) in [1, True, "true"]
+    compact = request.args.get("compact", False) in [1, True, "true"]
     sub_list = request.args.getlist("wordsub", None)
     try:
         sub_list = [
@@ -118,17 +138,39 @@ def results(result_id):
         sub_list = []
 
     return (
-        formatResult(
-            result,
+        encode_result(
+            formatResult(
+                result,
+                expected_format,
+                raw_return=return_raw,
+                convert_numbers=convert_numbers,
+                user_sub=sub_list,
+                compact=compact,
+            ),
             expected_format,
-            raw_return=return_raw,
-            convert_numbers=convert_numbers,
-            user_sub=sub_list,
         ),
         200,
     )
 
 
+def result_fields(expected_format: str, return_raw: bool = False, fields: list = None) -> list:
+    """Returns the fields of a result to fetch for the format (None: all), fields being the ones requested with json"""
+    if expected_format in ["application/json", "application/msgpack"]:
+        return fields
+    if expected_format == "text/plain":
+        # The language of the first segment is used for normalization
+        return ["raw_transcription" if return_raw else "transcription_result", "segments.language"]
+    # Subtitles
+    return ["confidence", "segments", "diarization_segments"]
+
+
+def encode_result(formated_result, expected_format: str):
+    """Encodes results requested as msgpack, others are returned as is to flask"""
+    if expected_format == "application/msgpack":
+        return Response(msgpack.packb(formated_result), mimetype=expected_format)
+    return formated_result
+
+
 # @app.route("/transcribe-multi", methods=["POST"])
 # def transcription_multi():
 #     """Route for multiple audio file transcription"""
@@ -250,6 +292,7 @@ def transcription():
         return "Failed to interpret transcription config", 400
 
     # The hash depends on options (of what comes before STT)
+    audio_hash = file_hash
     file_hash = f"{file_hash} {timestamps if timestamps is not None else transcription_config.vadConfig.toJson()}".encode("utf8")
     file_hash = fileHash(file_hash)
 
@@ -269,6 +312,7 @@ def transcription():
         "transcription_config": transcription_config.toJson(),
         "service_name": config.service_name,
         "hash": file_hash,
+        "audio_hash": audio_hash,
         "keep_audio": config.keep_audio,
         "timestamps": timestamps,
     }
@@ -282,8 +326,8 @@ def transcription():
         result_id = task.get()
         state = task.status
         if state == "SUCCESS":
-            result = db_client.fetch_result(result_id)
-            return formatResult(result, expected_format), 200
+            result = db_client.fetch_result(result_id, fields=result_fields(expected_format))
+            return encode_result(formatResult(result, expected_format), expected_format), 200
         else:
             return json.dumps({"state": "failed", "reason": str(task.result)}), 400
 
@@ -348,6 +392,10 @@ if __name__ == "__main__":
     }
 
     db_client = DBClient(db_info)
+    try:
+        db_client.ensure_indexes()
+    except Exception as e:
+        logger.warning("Could not create database indexes: {}".format(str(e)))
 
     logger.info("Starting ingress")
     logger.debug(config)
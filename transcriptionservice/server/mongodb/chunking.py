@@ -0,0 +1,101 @@
+"""The chunking module stores the results too large for a document as files of blocks of segments (GridFS).
+
+A file holds the result without its segments, followed by blocks of consecutive segments encoded as by
+packing.encode_segments. The result document keeps the index of the file: the length of the head, and the time span,
+offset and length of each block, so that the segments of a time window are read without downloading the whole file.
+"""
+import os
+from typing import List, Optional
+
+import bson
+
+from transcriptionservice.server.mongodb.packing import decode_segments, encode_segments
+from transcriptionservice.transcription.transcription_result import TranscriptionResult
+
+# Results larger than this size in MB are stored as files
+MONGO_MAX_RESULT_SIZE = float(os.environ.get("MONGO_MAX_RESULT_SIZE", 15))
+# Minimum number of words of a block (segments are not split, a long segment makes a larger block)
+BLOCK_WORDS = 2000
+
+
+def write_result_file(stream, result: TranscriptionResult, schema_version: int) -> dict:
+    """Writes the result in the file stream, and returns the index of the file"""
+    head = result.final_result(include_words=False)
+    head["segments"] = None  # Keeps the order of the keys
+    data = bson.encode(head)
+    stream.write(data)
+    index = {"head": len(data), "blocks": []}
+    offset = len(data)
+    segments = result.segments
+    start = 0
+    while start < len(segments):
+        stop = start
+        num_words = 0
+        while stop < len(segments) and num_words < BLOCK_WORDS:
+            num_words += len(segments[stop].words)
+            stop += 1
+        block = segments[start:stop]
+        data = bson.encode(encode_segments(block, schema_version))
+        stream.write(data)
+        index["blocks"].append({
+            "start": min(segment.start for segment in block),
+            "end": max(segment.end for segment in block),
+            "offset": offset,
+            "length": len(data),
+        })
+        offset += len(data)
+        start = stop
+    return index
+
+
+def read_result_file(
+    stream, index: dict, schema_version: int, start: float = None, end: float = None, fields: List[str] = None
+) -> dict:
+    """Reads a result from the file stream (seekable) using its index.
+    Only the blocks overlapping [start, end] are read if set, and none if segments are not needed for fields (see select_fields).
+    """
+    result = bson.decode(stream.read(index["head"]))
+    segments = []
+    read_segments = fields is None or start is not None or end is not None or any(
+        field.split(".")[0] == "segments" for field in fields
+    )
+    read_words = fields is None or "segments" in fields or "segments.words" in fields
+    for block in index["blocks"] if read_segments else []:
+        if _overlaps(block["start"], block["end"], start, end):
+            stream.seek(block["offset"])
+            document = bson.decode(stream.read(block["length"]))
+            if not read_words:
+                document.pop("words", None)
+            segments.extend(decode_segments(document, schema_version))
+    result["segments"] = segments
+    return result
+
+
+def select_window(result: dict, start: float = None, end: float = None) -> dict:
+    """Keeps the segments of a result overlapping [start, end] (None: unbounded), and updates its transcriptions"""
+    result["segments"] = [s for s in result["segments"] if _overlaps(s["start"], s["end"], start, end)]
+    result["diarization_segments"] = [
+        s for s in result["diarization_segments"] if _overlaps(s["seg_begin"], s["seg_end"], start, end)
+    ]
+    # As TranscriptionResult.final_transcription and raw_transcription, from the segments
+    result["transcription_result"] = " \n".join(
+        (f"{s['spk_id']}: " if s["spk_id"] is not None else "") + s["segment"] for s in result["segments"]
+    ).strip()
+    result["raw_transcription"] = " ".join(s["raw_segment"] for s in result["segments"]).strip()
+    return result
+
+
+def select_fields(result: dict, fields: List[str]) -> dict:
+    """Keeps the listed fields of a result: its keys, or the keys of its segments as segments.<key>"""
+    segment_keys = [field.split(".", 1)[1] for field in fields if field.startswith("segments.")]
+    selected = {}
+    for key, value in result.items():
+        if key in fields:
+            selected[key] = value
+        elif key == "segments" and segment_keys:
+            selected[key] = [{k: v for k, v in segment.items() if k in segment_keys} for segment in value]
+    return selected
+
+
+def _overlaps(first: float, last: float, start: Optional[float], end: Optional[float]) -> bool:
+    return (start is None or last >= start) and (end is None or first <= end)
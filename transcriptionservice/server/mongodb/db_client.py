@@ -1,26 +1,76 @@
 from datetime import datetime
 from time import time
+from typing import List, Optional, Tuple
 from uuid import uuid4
 
-from pymongo import MongoClient, errors
+import bson
+from bson.raw_bson import RawBSONDocument
+from gridfs import GridFSBucket
+from gridfs.errors import NoFile
+from pymongo import ASCENDING, DESCENDING, MongoClient, errors
 
+from transcriptionservice.server.mongodb.chunking import (
+    MONGO_MAX_RESULT_SIZE, read_result_file, select_fields, select_window,
+    write_result_file)
+from transcriptionservice.server.mongodb.packing import (
+    MONGO_SCHEMA_VERSION, decode_result, decode_transcription, encode_result,
+    encode_transcription)
+from transcriptionservice.server.mongodb.retention import select_evictions
 from transcriptionservice.transcription.configs.transcriptionconfig import \
     TranscriptionConfig
-from transcriptionservice.transcription.transcription_result import \
-    TranscriptionResult
+from transcriptionservice.transcription.transcription_result import (
+    TranscriptionResult, WordTable)
 
 """ The Databases is structured as follows:
 
-A transcription service uses a database named transcriptiondb in which there are 2 collections:
+A transcription service uses a database named transcriptiondb in which there are 3 collections:
 - A collection named after the SERVICE_NAME to store raw transcription result associated with the associated running linto-stt service.
 Those transcriptions are indexed using the audio file hashcode before transcoding and contain the transcription datetime and words information.
 - A collection named "results" to store final transcriptions (includes diarization, punctuation data and post-processing). This collection is shared by all running
 transcription services. The final transcription are indexed using a unique result_id and contains in addition to the result itself data related to 
-origin and the configurations used.
+origin and the configurations used. Results larger than MONGO_MAX_RESULT_SIZE are stored as files in the "results_files" GridFS bucket,
+the document keeping their index as "result_file" instead of "result" (see the chunking module).
+- A collection named "vad" to store the frame-level VAD decisions of audio files, bit-packed. This collection is shared by all running
+transcription services. The decisions are indexed using the audio file hashcode (before transcoding), the VAD method and mode, so that a file can
+be split again with other segment constraints without running the VAD.
 
+The results collection is indexed on "job_id" and on "hash" (with "datetime", latest first) to find the results of a job or of an
+audio file, see DBClient.ensure_indexes.
+
+Documents store their last access as "last_access" (UTC), and the hits and misses of the lookups of the words cache and of the VAD
+decisions are counted in the "cache_stats" collection, per collection. See the retention module for their eviction.
+
+Transcriptions and results are written with the schema version set by MONGO_SCHEMA_VERSION (stored as "schema_version", absent for
+version 1), and read whatever their version. See the packing module for the encoding of the words.
 """
 
 
+# Number of documents deleted per request when evicting
+EVICTION_BATCH = 1000
+
+# Secondary indexes of the results collection, as (name, keys)
+RESULT_INDEXES = [
+    ("job_id", [("job_id", ASCENDING)]),
+    ("hash_datetime", [("hash", ASCENDING), ("datetime", DESCENDING)]),
+]
+
+
+def _result_projection(fields: List[str], window: bool) -> List[str]:
+    """Returns the projection reading the fields of a result (all if None), and what selecting a time window requires"""
+    if fields is None:
+        return None
+    required = set(fields)
+    if window:
+        required.update(["segments.start", "segments.end", "segments.spk_id", "segments.segment", "segments.raw_segment"])
+        required.add("diarization_segments")
+    if "segments" in required or "segments.words" in required:
+        required.add("words")  # Packed words of the segments (schema 2)
+    if "segments" in required:
+        # Paths in a projected field collide with it
+        required = {field for field in required if not field.startswith("segments.")}
+    return ["schema_version", "result_file"] + [f"result.{field}" for field in sorted(required)]
+
+
 def mongo_error_handler(func):
     def inner_func(*args, **kwargs):
         try:
@@ -55,31 +105,135 @@ class DBClient:
         )
         self.transcriptions_collection = self.client[db_info["db_name"]][db_info["service_name"]]
         self.results_collection = self.client[db_info["db_name"]]["results"]
+        self.results_files = GridFSBucket(self.client[db_info["db_name"]], bucket_name="results_files")
+        self.vad_collection = self.client[db_info["db_name"]]["vad"]
+        self.stats_collection = self.client[db_info["db_name"]]["cache_stats"]
         self.isset = True
 
+    @property
+    def collections(self) -> dict:
+        """The collections with an eviction policy, by name"""
+        return {
+            "transcriptions": self.transcriptions_collection,
+            "results": self.results_collection,
+            "vad": self.vad_collection,
+        }
+
+    @mongo_error_handler
+    def ensure_indexes(self):
+        """Creates the secondary indexes of the results collection if they do not exist"""
+        for name, keys in RESULT_INDEXES:
+            self.results_collection.create_index(keys, name=name)
+
     @mongo_error_handler
     def fetch_transcription(self, file_hash: str) -> dict:
         """Fetch transcription result in the SERVICE_NAME collection using file_hash as id"""
-        result = self.transcriptions_collection.find_one({"_id": file_hash})
-        return result["transcription"] if result is not None else None
+        result = self._access(self.transcriptions_collection, file_hash)
+        if result is None:
+            return None
+        return decode_transcription(result["transcription"], result.get("schema_version", 1))
 
     @mongo_error_handler
-    def fetch_result(self, ressource_id: str) -> dict:
-        """Fetch final result in the results collections using result_id as id"""
-        result = self.results_collection.find_one({"_id": ressource_id})
-        return result["result"] if result is not None else None
+    def fetch_result(self, ressource_id: str, start: float = None, end: float = None, fields: List[str] = None) -> dict:
+        """Fetch final result in the results collections using result_id as id.
+        If start or end is set, only the segments overlapping [start, end] are returned (and read if stored as a file).
+        If fields is set, only these fields are read and returned: keys of the result, or of its segments as "segments.<key>"."""
+        window = start is not None or end is not None
+        result = self.results_collection.find_one_and_update(
+            {"_id": ressource_id},
+            {"$set": {"last_access": datetime.utcnow()}},
+            projection=_result_projection(fields, window),
+        )
+        if result is None:
+            return None
+        schema_version = result.get("schema_version", 1)
+        if "result_file" in result:
+            stream = self.results_files.open_download_stream(result["result_file"]["file_id"])
+            try:
+                final_result = read_result_file(stream, result["result_file"], schema_version, start, end, fields)
+            finally:
+                stream.close()
+        else:
+            final_result = decode_result(result.get("result", {}), schema_version)
+        if window:
+            final_result = select_window(final_result, start, end)
+        if fields is not None:
+            final_result = select_fields(final_result, fields)
+        return final_result
+
+    def _access(self, collection, key: str) -> dict:
+        """Returns a cached document, updating its last access, and counts the lookup as a hit or a miss"""
+        result = collection.find_one_and_update({"_id": key}, {"$set": {"last_access": datetime.utcnow()}})
+        self.stats_collection.update_one(
+            {"_id": collection.name}, {"$inc": {"hits" if result is not None else "misses": 1}}, upsert=True
+        )
+        return result
+
+    @mongo_error_handler
+    def fetch_result_id(self, job_id: str) -> Optional[str]:
+        """Returns the result_id of the latest result of a job, None if there is none"""
+        result = self.results_collection.find_one(
+            {"job_id": job_id}, {"_id": 1}, sort=[("datetime", DESCENDING)]
+        )
+        return result["_id"] if result is not None else None
+
+    @mongo_error_handler
+    def fetch_results_info(self, file_hash: str, service_name: str = None) -> List[dict]:
+        """Returns the results of a transcription hash (see push_result), latest first, as
+        {"result_id", "job_id", "service_name", "datetime", "config"}, optionally of a service only"""
+        query = {"hash": file_hash}
+        if service_name is not None:
+            query["service_name"] = service_name
+        cursor = self.results_collection.find(
+            query,
+            {"job_id": 1, "service_name": 1, "datetime": 1, "config": 1},
+            sort=[("datetime", DESCENDING)],
+        )
+        return [
+            {
+                "result_id": result["_id"],
+                "job_id": result.get("job_id"),
+                "service_name": result.get("service_name"),
+                "datetime": result.get("datetime"),
+                "config": result.get("config"),
+            }
+            for result in cursor
+        ]
+
+    @mongo_error_handler
+    def fetch_vad_decisions(self, vad_hash: str) -> dict:
+        """Fetch bit-packed VAD decisions in the vad collection using vad_hash as id"""
+        result = self._access(self.vad_collection, vad_hash)
+        return result["vad"] if result is not None else None
 
     @mongo_error_handler
-    def push_transcription(self, file_hash: str, words: list, words_language: list):
+    def push_transcription(self, file_hash: str, words: WordTable, words_language: list):
         """Insert transcription result in the SERVICE_NAME collection using file_hash as id"""
         self.transcriptions_collection.find_one_and_update(
             {"_id": file_hash},
             {
                 "$set": {
                     "datetime": datetime.fromtimestamp(time()).isoformat(),
-                    "transcription": {
-                        "words": [w.json for w in words],
-                        "words_language": words_language,
+                    "last_access": datetime.utcnow(),
+                    "schema_version": MONGO_SCHEMA_VERSION,
+                    "transcription": encode_transcription(words, words_language),
+                }
+            },
+            upsert=True,
+        )
+
+    @mongo_error_handler
+    def push_vad_decisions(self, vad_hash: str, decisions: bytes, num_frames: int):
+        """Insert bit-packed VAD decisions in the vad collection using vad_hash as id"""
+        self.vad_collection.find_one_and_update(
+            {"_id": vad_hash},
+            {
+                "$set": {
+                    "datetime": datetime.fromtimestamp(time()).isoformat(),
+                    "last_access": datetime.utcnow(),
+                    "vad": {
+                        "decisions": decisions,
+                        "num_frames": num_frames,
                     },
                 }
             },
@@ -98,23 +252,100 @@ class DBClient:
     ) -> str:
         """Insert final result in the results collection and returns a result_id"""
         ressource_id = str(uuid4())
-        self.results_collection.find_one_and_update(
-            {"_id": ressource_id},
-            {
-                "$set": {
-                    "hash": file_hash,
-                    "job_id": job_id,
-                    "origin": origin,
-                    "service_name": service_name,
-                    "datetime": datetime.fromtimestamp(time()).isoformat(),
-                    "config": config.toJson(),
-                    "result": result.final_result(),
-                }
-            },
-            upsert=True,
-        )
+        document = {
+            "hash": file_hash,
+            "job_id": job_id,
+            "origin": origin,
+            "service_name": service_name,
+            "datetime": datetime.fromtimestamp(time()).isoformat(),
+            "last_access": datetime.utcnow(),
+            "config": config.toJson(),
+            "schema_version": MONGO_SCHEMA_VERSION,
+        }
+        # Encoded once, to check its size
+        final_result = RawBSONDocument(bson.encode(encode_result(result)))
+        if len(final_result.raw) <= MONGO_MAX_RESULT_SIZE * 1e6:
+            document["result"] = final_result
+        else:
+            document["result_file"] = self._push_result_file(ressource_id, result)
+        try:
+            self.results_collection.find_one_and_update(
+                {"_id": ressource_id}, {"$set": document}, upsert=True
+            )
+        except Exception:
+            if "result_file" in document:
+                self.results_files.delete(document["result_file"]["file_id"])
+            raise
         return ressource_id
 
+    def _push_result_file(self, ressource_id: str, result: TranscriptionResult) -> dict:
+        """Writes the result as a file of blocks of segments and returns its index"""
+        stream = self.results_files.open_upload_stream(ressource_id)
+        try:
+            index = write_result_file(stream, result, MONGO_SCHEMA_VERSION)
+        except Exception:
+            stream.abort()
+            raise
+        stream.close()
+        index["file_id"] = stream._id
+        return index
+
+    @mongo_error_handler
+    def access_entries(self, name: str) -> List[dict]:
+        """Returns the documents of a collection as {"_id", "last_access", "datetime", "size"},
+        the size in bytes including the file of a result (requires MongoDB 4.4)"""
+        size = {"$bsonSize": "$$ROOT"}
+        if name == "results":
+            file_size = {"$add": ["$result_file.head", {"$sum": "$result_file.blocks.length"}]}
+            size = {"$add": [size, {"$ifNull": [file_size, 0]}]}
+        return list(
+            self.collections[name].aggregate(
+                [{"$project": {"last_access": 1, "datetime": 1, "size": size, "file_id": "$result_file.file_id"}}]
+            )
+        )
+
+    @mongo_error_handler
+    def evict(self, name: str, ttl: float = 0, max_size: float = 0, dry_run: bool = False) -> Tuple[int, int]:
+        """Evicts the documents of a collection not accessed for ttl days, and the least recently accessed ones
+        above max_size MB (see the retention module). Returns the number and the size of the documents evicted"""
+        entries = self.access_entries(name)
+        evicted = set(select_evictions(entries, datetime.utcnow(), ttl, max_size))
+        entries = [entry for entry in entries if entry["_id"] in evicted]
+        if not dry_run:
+            ids = [entry["_id"] for entry in entries]
+            for i in range(0, len(ids), EVICTION_BATCH):
+                self.collections[name].delete_many({"_id": {"$in": ids[i : i + EVICTION_BATCH]}})
+            # Files are deleted once their documents are, a result is never left without its file
+            for entry in entries:
+                if entry.get("file_id") is not None:
+                    try:
+                        self.results_files.delete(entry["file_id"])
+                    except NoFile:
+                        pass
+        return len(entries), sum(entry["size"] for entry in entries)
+
+    @mongo_error_handler
+    def cache_stats(self) -> dict:
+        """Returns the hits and misses of the cache lookups, by collection name"""
+        return {stats.pop("_id"): stats for stats in self.stats_collection.find()}
+
+    @mongo_error_handler
+    def collection_stats(self, name: str) -> dict:
+        """Returns the collStats of a collection"""
+        return self.results_collection.database.command("collStats", self.collections[name].name)
+
+    @mongo_error_handler
+    def compact(self) -> List[str]:
+        """Releases the disk space freed by evictions (blocks the collections while running).
+        Returns the names of the collections compacted, the ones not created yet (e.g. without result file) are skipped"""
+        database = self.results_collection.database
+        names = [collection.name for collection in self.collections.values()]
+        existing = set(database.list_collection_names())
+        compacted = [name for name in names + ["results_files.files", "results_files.chunks"] if name in existing]
+        for name in compacted:
+            database.command("compact", name)
+        return compacted
+
     def close(self):
         """Close client connexion"""
         if self.isset:
@@ -0,0 +1,137 @@
+"""The packing module encodes the words of the documents stored in the database as packed arrays.
+
+Documents of schema version 1 store each word as a {"word", "start", "end", "conf"} sub-document.
+Documents of schema version 2 store the words of a document as one block:
+- "vocabulary": the distinct words, and "word_ids": the index of each word in it (int32),
+- "start", "end": the timings in milliseconds (int32),
+- "conf": the confidences (float32, read back rounded to 6 decimals),
+- "counts": the number of words of each segment (int32),
+- "languages" and "language_ids": the language of each word, if any.
+Arrays are little-endian bytes, compressed with zlib if "compression" is set.
+"""
+import os
+import zlib
+from typing import List
+
+import numpy as np
+
+from transcriptionservice.transcription.transcription_result import (
+    SpeechSegment, TranscriptionResult, Vocabulary, WordTable)
+
+# Schema version of the documents written (1: word sub-documents, 2: packed words), both are read
+MONGO_SCHEMA_VERSION = int(os.environ.get("MONGO_SCHEMA_VERSION", 1))
+# zlib compression level of the packed words (0: disabled)
+MONGO_COMPRESSION = int(os.environ.get("MONGO_COMPRESSION", 0))
+
+_array_types = {
+    "word_ids": "<i4",
+    "start": "<i4",
+    "end": "<i4",
+    "conf": "<f4",
+    "counts": "<i4",
+    "language_ids": "<i4",
+}
+
+
+def pack_words(tables: List[WordTable], compression: int = None) -> dict:
+    """Packs the words of tables sharing their vocabularies as one block"""
+    compression = MONGO_COMPRESSION if compression is None else compression
+    words = WordTable.concatenate(tables)
+    # Only the words used are stored, with their indexes in the stored vocabulary
+    used, word_ids = np.unique(words.word_ids, return_inverse=True)
+    packed = {
+        "vocabulary": [words.vocabulary.strings[i] for i in used.tolist()],
+        "word_ids": word_ids,
+        "start": np.round(words.start * 1000),
+        "end": np.round(words.end * 1000),
+        "conf": words.conf,
+        "counts": [len(table) for table in tables],
+    }
+    if words.language_ids is not None:
+        used, language_ids = np.unique(words.language_ids, return_inverse=True)
+        packed["languages"] = [words.languages.strings[i] for i in used.tolist()]
+        packed["language_ids"] = language_ids
+    for key, dtype in _array_types.items():
+        if key in packed:
+            data = np.asarray(packed[key]).astype(dtype).tobytes()
+            packed[key] = zlib.compress(data, compression) if compression else data
+    packed["compression"] = "zlib" if compression else None
+    return packed
+
+
+def unpack_words(packed: dict) -> List[WordTable]:
+    """Returns the tables packed by pack_words"""
+    arrays = {}
+    for key, dtype in _array_types.items():
+        if key in packed:
+            data = zlib.decompress(packed[key]) if packed["compression"] == "zlib" else packed[key]
+            arrays[key] = np.frombuffer(data, dtype=dtype)
+    vocabulary = Vocabulary()
+    vocabulary.internAll(packed["vocabulary"])
+    languages = Vocabulary()
+    if "languages" in packed:
+        languages.internAll(packed["languages"])
+    words = WordTable(
+        vocabulary,
+        languages,
+        arrays["word_ids"].astype(np.int32),
+        arrays["start"] / 1000,
+        arrays["end"] / 1000,
+        np.round(arrays["conf"].astype(np.float64), 6),
+        arrays["language_ids"].astype(np.int32) if "language_ids" in arrays else None,
+    )
+    bounds = np.concatenate([[0], np.cumsum(arrays["counts"])]).tolist()
+    return [words[start:stop] for start, stop in zip(bounds[:-1], bounds[1:])]
+
+
+def encode_transcription(words: WordTable, words_language: list, schema_version: int = None) -> dict:
+    """Returns the transcription to store, words_language being the languages of the words"""
+    if (MONGO_SCHEMA_VERSION if schema_version is None else schema_version) < 2:
+        return {"words": words.json, "words_language": words_language}
+    return {"words": pack_words([words])}
+
+
+def decode_transcription(transcription: dict, schema_version: int) -> dict:
+    """Returns a stored transcription as {"words", "words_language"}"""
+    if schema_version < 2:
+        return transcription
+    words, = unpack_words(transcription["words"])
+    return {"words": words.json, "words_language": words.words_language}
+
+
+def encode_segments(segments: List[SpeechSegment], schema_version: int = None) -> dict:
+    """Returns the segments to store as {"segments"}, and the packed words of the segments as "words" with schema 2"""
+    if (MONGO_SCHEMA_VERSION if schema_version is None else schema_version) < 2:
+        return {"segments": [segment.json for segment in segments]}
+    # The words of the segments are packed together, directly from their tables
+    return {
+        "segments": [segment.toJson(include_words=False) for segment in segments],
+        "words": pack_words([segment.words for segment in segments]),
+    }
+
+
+def decode_segments(document: dict, schema_version: int) -> List[dict]:
+    """Returns the segments stored by encode_segments as dicts (with "words": None if the packed words were not read)"""
+    if schema_version < 2 or "words" not in document:
+        return document["segments"]
+    tables = unpack_words(document.pop("words"))
+    # Segments were stored with "words": None, to keep the order of their keys
+    for segment, words in zip(document["segments"], tables):
+        segment["words"] = words.json
+    return document["segments"]
+
+
+def encode_result(result: TranscriptionResult, schema_version: int = None) -> dict:
+    """Returns the final result to store"""
+    if (MONGO_SCHEMA_VERSION if schema_version is None else schema_version) < 2:
+        return result.final_result()
+    final_result = result.final_result(include_words=False)
+    final_result["words"] = pack_words([segment.words for segment in result.segments])
+    return final_result
+
+
+def decode_result(final_result: dict, schema_version: int) -> dict:
+    """Returns a stored final result as returned by TranscriptionResult.final_result()"""
+    if schema_version >= 2 and "segments" in final_result:
+        decode_segments(final_result, schema_version)
+    return final_result
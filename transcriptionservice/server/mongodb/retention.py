@@ -0,0 +1,61 @@
+"""The retention module selects the documents to evict from the collections used as caches, and summarizes their ages.
+
+Documents store their last access as "last_access" (set when written and when read). Documents written before it was
+tracked are aged from their "datetime". Two policies apply, each disabled if set to 0:
+- TTL: documents not accessed for more than a number of days are evicted,
+- size-bounded LRU: the least recently accessed documents are evicted until the collection fits in a size.
+The words cache of the service and the VAD decisions share the MONGO_CACHE_* policies, the results use MONGO_RESULTS_*.
+"""
+import os
+from datetime import datetime, timedelta
+from typing import List, Tuple
+
+# Days after which cached transcriptions and VAD decisions not accessed are evicted (0: never)
+MONGO_CACHE_TTL = float(os.environ.get("MONGO_CACHE_TTL", 0))
+# Size in MB of cached transcriptions, and of VAD decisions, above which the least recently accessed are evicted (0: unbounded)
+MONGO_CACHE_MAX_SIZE = float(os.environ.get("MONGO_CACHE_MAX_SIZE", 0))
+# Days after which results not accessed are evicted (0: never)
+MONGO_RESULTS_TTL = float(os.environ.get("MONGO_RESULTS_TTL", 0))
+# Size in MB of results (including their files) above which the least recently accessed are evicted (0: unbounded)
+MONGO_RESULTS_MAX_SIZE = float(os.environ.get("MONGO_RESULTS_MAX_SIZE", 0))
+
+# Upper bounds in days of the age histograms
+AGE_BINS = [1, 7, 30, 90, 365]
+
+
+def access_time(entry: dict) -> datetime:
+    """Returns the last access of a document (see DBClient.access_entries), its writing date if not tracked"""
+    if entry.get("last_access") is not None:
+        return entry["last_access"]
+    try:
+        # Written as local time isoformat
+        return datetime.utcfromtimestamp(datetime.fromisoformat(entry["datetime"]).timestamp())
+    except (KeyError, TypeError, ValueError):
+        return datetime.min
+
+
+def select_evictions(entries: List[dict], now: datetime, ttl: float = 0, max_size: float = 0) -> List:
+    """Returns the ids of the entries ({"_id", "last_access", "datetime", "size"}) to evict,
+    ttl being in days and max_size in MB (0: disabled)"""
+    entries = sorted(entries, key=access_time, reverse=True)
+    cutoff = now - timedelta(days=ttl) if ttl else None
+    evicted = []
+    size = 0
+    for entry in entries:
+        size += entry["size"]
+        if (cutoff is not None and access_time(entry) < cutoff) or (max_size and size > max_size * 1e6):
+            evicted.append(entry["_id"])
+    return evicted
+
+
+def age_histogram(entries: List[dict], now: datetime, bins: List[float] = AGE_BINS) -> List[Tuple[str, int, int]]:
+    """Returns the number and the size of the entries per age since their last access, as (label, count, size)"""
+    labels = [f"< {bins[0]}d"] + [f"{low}-{high}d" for low, high in zip(bins[:-1], bins[1:])] + [f">= {bins[-1]}d"]
+    counts = [0] * len(labels)
+    sizes = [0] * len(labels)
+    for entry in entries:
+        age = (now - access_time(entry)).total_seconds() / 86400
+        i = sum(age >= high for high in bins)
+        counts[i] += 1
+        sizes[i] += entry["size"]
+    return list(zip(labels, counts, sizes))
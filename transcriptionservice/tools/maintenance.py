@@ -0,0 +1,88 @@
+"""Maintenance of the transcription database: reports the size, hit ratio and ages of the collections, evicts the
+documents as set by the retention policies and compacts the collections.
+
+Usage: python transcriptionservice/tools/maintenance.py {report,evict,compact} [options]
+"""
+import argparse
+import os
+import time
+from datetime import datetime
+
+from transcriptionservice.server.mongodb.db_client import DBClient
+from transcriptionservice.server.mongodb.retention import (
+    MONGO_CACHE_MAX_SIZE, MONGO_CACHE_TTL, MONGO_RESULTS_MAX_SIZE,
+    MONGO_RESULTS_TTL, age_histogram)
+
+# Policies (ttl in days, max_size in MB) by collection name
+POLICIES = {
+    "transcriptions": (MONGO_CACHE_TTL, MONGO_CACHE_MAX_SIZE),
+    "results": (MONGO_RESULTS_TTL, MONGO_RESULTS_MAX_SIZE),
+    "vad": (MONGO_CACHE_TTL, MONGO_CACHE_MAX_SIZE),
+}
+
+
+def report(db_client: DBClient):
+    cache_stats = db_client.cache_stats()
+    now = datetime.utcnow()
+    for name, collection in db_client.collections.items():
+        stats = db_client.collection_stats(name)
+        print(
+            f"{name} ({collection.name}): {stats.get('count', 0)} documents, {stats.get('size', 0) / 1e6:.1f} MB "
+            f"({stats.get('storageSize', 0) / 1e6:.1f} MB on disk, indexes {stats.get('totalIndexSize', 0) / 1e6:.1f} MB)"
+        )
+        if collection.name in cache_stats:
+            hits = cache_stats[collection.name].get("hits", 0)
+            misses = cache_stats[collection.name].get("misses", 0)
+            print(f"  hit ratio: {hits / max(hits + misses, 1):.2%} ({hits} hits, {misses} misses)")
+        ttl, max_size = POLICIES[name]
+        print(f"  policy: ttl {f'{ttl:g} days' if ttl else 'none'}, max size {f'{max_size:g} MB' if max_size else 'none'}")
+        print(f"  {'last access':>12} {'documents':>10} {'MB':>10}")
+        for label, count, size in age_histogram(db_client.access_entries(name), now):
+            print(f"  {label:>12} {count:>10} {size / 1e6:>10.1f}")
+
+
+def evict(db_client: DBClient, dry_run: bool = False):
+    for name, (ttl, max_size) in POLICIES.items():
+        if ttl or max_size:
+            count, size = db_client.evict(name, ttl, max_size, dry_run)
+            print(f"{name}: {'would evict' if dry_run else 'evicted'} {count} documents ({size / 1e6:.1f} MB)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Transcription database maintenance")
+    parser.add_argument("command", choices=["report", "evict", "compact"])
+    parser.add_argument("--dry_run", action="store_true", help="Reports the evictions without deleting documents")
+    parser.add_argument(
+        "--period",
+        type=float,
+        help="Evicts every period hours instead of once (default=0: once)",
+        default=os.environ.get("MONGO_EVICTION_PERIOD", 0),
+    )
+    args = parser.parse_args()
+
+    db_client = DBClient(
+        {
+            "db_host": os.environ.get("MONGO_HOST"),
+            "db_port": int(os.environ.get("MONGO_PORT")),
+            "service_name": os.environ.get("SERVICE_NAME"),
+            "db_name": "transcriptiondb",
+        }
+    )
+    try:
+        if args.command == "report":
+            report(db_client)
+        elif args.command == "compact":
+            print(f"Compacted: {', '.join(db_client.compact()) or 'none'}")
+        else:
+            while True:
+                try:
+                    evict(db_client, args.dry_run)
+                except Exception as e:
+                    if not args.period:
+                        raise
+                    print(f"Eviction failed: {e}")
+                if not args.period:
+                    break
+                time.sleep(args.period * 3600)
+    finally:
+        db_client.close()
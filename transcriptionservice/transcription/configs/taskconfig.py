@@ -110,9 +110,13 @@ class VADConfig(Config):
     ```json
     {
       "enableVAD": boolean (true),
-      "methodName": string ("WebRTC"),
+      "methodName": string ("WebRTC"), # "WebRTC" or "Energy"
       "minDuration": float (0.0)
       "maxDuration": float (1200.0),
+      "minSpeechRatio": float (0.0), # Chunks with a lower ratio of speech are not transcribed
+      "trimNonSpeech": boolean (false), # Leading and trailing non-speech of chunks are not transcribed
+      "windowDuration": float (0.0), # If set, longer chunks are split into overlapping windows of this duration
+      "windowOverlap": float (2.0),
     }
     ```
     """
@@ -122,6 +126,10 @@ class VADConfig(Config):
         "methodName": "WebRTC",
         "minDuration": 0.0,
         "maxDuration": 1200.0,
+        "minSpeechRatio": 0.0,
+        "trimNonSpeech": False,
+        "windowDuration": 0.0,
+        "windowOverlap": 2.0,
     }
 
     def __init__(self, config: Union[str, dict] = {}):
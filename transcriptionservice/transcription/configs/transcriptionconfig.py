@@ -18,7 +18,8 @@ class TranscriptionConfig(Config):
       "language": string (null),
       "diarizationConfig": object DiarizationConfig (null),
       "punctuationConfig": object PunctuationConfig (null),
-      "enablePunctuation": boolean (false)
+      "enablePunctuation": boolean (false),
+      "transcribePerChannel": boolean (false) # Channels are transcribed separately, the channel index is the speaker id
     }
     ```
     """
@@ -29,7 +30,7 @@ class TranscriptionConfig(Config):
         "diarizationConfig": DiarizationConfig(),
         "punctuationConfig": PunctuationConfig(),
         "enablePunctuation": None,  # Kept for backward compatibility
-        # "transcribePerChannel": False,
+        "transcribePerChannel": False,
     }
 
     def __init__(self, config: Union[str, dict] = {}):
@@ -52,6 +53,8 @@ class TranscriptionConfig(Config):
         if self.enablePunctuation is not None:
             self.punctuationConfig.enablePunctuation = self.enablePunctuation
 
+        self.transcribePerChannel = self.transcribePerChannel in ["true", 1, True]
+
     def __eq__(self, other):
         if isinstance(other, TranscriptionConfig):
             for key in self._keys_default.keys():
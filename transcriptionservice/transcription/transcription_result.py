@@ -1,25 +1,237 @@
 """The transcription_result module holds classes responsible for holding, merging and formating transcription results."""
 import json
 from dataclasses import dataclass, field
-from typing import Dict, List, Tuple, Union, Any
+from typing import Dict, Iterable, Iterator, List, Tuple, Union, Any
 
+import numpy as np
 
-@dataclass
-class Word:
-    """Contains word informations"""
 
-    word: str
-    start: float
-    end: float
-    conf: float
+class Vocabulary:
+    """Interned strings: each distinct string is stored once and referred to by its index"""
 
-    def apply_offset(self, offset: float):
+    __slots__ = ("strings", "_ids")
+
+    def __init__(self):
+        self.strings = []
+        self._ids = {}
+
+    def intern(self, string: str) -> int:
+        """Returns the index of the string, adding it if needed"""
+        index = self._ids.get(string)
+        if index is None:
+            index = self._ids[string] = len(self.strings)
+            self.strings.append(string)
+        return index
+
+    def internAll(self, strings: Iterable[str]) -> np.ndarray:
+        return np.fromiter((self.intern(string) for string in strings), dtype=np.int32)
+
+
+class WordTable:
+    """Columnar storage of words: one array per field, word strings and languages are interned.
+
+    Indexing with an integer returns a Word view, with a slice, a mask or an array of indexes returns a WordTable
+    (sharing the vocabularies). Tables of a TranscriptionResult share their vocabularies so that they can be concatenated.
+    Whether the words are sorted by start time is known once checked, and kept by slices and masks.
+    Bounds and text are computed once and reset by the methods changing timestamps (not when the arrays are written
+    directly, or through another table or slice sharing them).
+    """
+
+    __slots__ = (
+        "vocabulary", "languages", "word_ids", "start", "end", "conf", "language_ids", "_sorted", "_bounds", "_text"
+    )
+
+    def __init__(
+        self,
+        vocabulary: Vocabulary = None,
+        languages: Vocabulary = None,
+        word_ids: np.ndarray = None,
+        start: np.ndarray = None,
+        end: np.ndarray = None,
+        conf: np.ndarray = None,
+        language_ids: np.ndarray = None,
+    ):
+        self.vocabulary = Vocabulary() if vocabulary is None else vocabulary
+        self.languages = Vocabulary() if languages is None else languages
+        self.word_ids = np.zeros(0, dtype=np.int32) if word_ids is None else word_ids
+        self.start = np.zeros(0) if start is None else start
+        self.end = np.zeros(0) if end is None else end
+        self.conf = np.zeros(0) if conf is None else conf
+        self.language_ids = language_ids  # None without language detection
+        self._sorted = None  # Unknown
+        self._bounds = None
+        self._text = None
+
+    @classmethod
+    def fromJson(
+        cls,
+        words: List[dict],
+        languages: Union[str, List[str]] = None,
+        offset: float = 0.0,
+        vocabulary: Vocabulary = None,
+        language_vocabulary: Vocabulary = None,
+    ) -> "WordTable":
+        """Creates a table from words {"word", "start", "end", "conf"}, with their language(s) and an offset applied"""
+        table = cls(vocabulary, language_vocabulary)
+        table.word_ids = table.vocabulary.internAll(w["word"] for w in words)
+        table.start = np.fromiter((w["start"] for w in words), dtype=np.float64, count=len(words)) + offset
+        table.end = np.fromiter((w["end"] for w in words), dtype=np.float64, count=len(words)) + offset
+        table.conf = np.fromiter((w["conf"] for w in words), dtype=np.float64, count=len(words))
+        if isinstance(languages, str):
+            table.language_ids = np.full(len(words), table.languages.intern(languages), dtype=np.int32)
+        elif languages is not None:
+            table.language_ids = table.languages.internAll(languages)
+        return table
+
+    @classmethod
+    def concatenate(cls, tables: List["WordTable"]) -> "WordTable":
+        """Concatenates tables sharing their vocabularies"""
+        if not tables:
+            return cls()
+        first = tables[0]
+        return cls(
+            first.vocabulary,
+            first.languages,
+            np.concatenate([t.word_ids for t in tables]),
+            np.concatenate([t.start for t in tables]),
+            np.concatenate([t.end for t in tables]),
+            np.concatenate([t.conf for t in tables]),
+            np.concatenate([t.language_ids for t in tables]) if first.language_ids is not None else None,
+        )
+
+    def __len__(self) -> int:
+        return len(self.word_ids)
+
+    def __getitem__(self, index) -> Union["Word", "WordTable"]:
+        if isinstance(index, (int, np.integer)):
+            if index < 0:
+                index += len(self)
+            if not 0 <= index < len(self):
+                raise IndexError("word index out of range")
+            return Word(self, int(index))
+        table = WordTable(
+            self.vocabulary,
+            self.languages,
+            self.word_ids[index],
+            self.start[index],
+            self.end[index],
+            self.conf[index],
+            self.language_ids[index] if self.language_ids is not None else None,
+        )
+        # Subsequences of sorted words are sorted
+        if self._sorted and (
+            (isinstance(index, slice) and (index.step or 1) > 0)
+            or (isinstance(index, np.ndarray) and index.dtype == bool)
+        ):
+            table._sorted = True
+        return table
+
+    def __iter__(self) -> Iterator["Word"]:
+        for index in range(len(self)):
+            yield Word(self, index)
+
+    def applyOffset(self, offset: float):
         self.start += offset
         self.end += offset
+        self._bounds = None
+
+    @property
+    def is_sorted(self) -> bool:
+        """Returns True if the words are sorted by start time"""
+        if self._sorted is None:
+            self._sorted = bool(np.all(self.start[1:] >= self.start[:-1]))
+        return self._sorted
+
+    def sortedByStart(self) -> "WordTable":
+        """Returns the words sorted by start time (stable), the table itself if it already is"""
+        if self.is_sorted:
+            return self
+        table = self[np.argsort(self.start, kind="stable")]
+        table._sorted = True
+        return table
+
+    @property
+    def bounds(self) -> Tuple[float, float]:
+        """First start and last end of the words, (0.0, 0.0) without words"""
+        if self._bounds is None:
+            self._bounds = (float(self.start.min()), float(self.end.max())) if len(self) else (0.0, 0.0)
+        return self._bounds
+
+    @property
+    def text(self) -> str:
+        """Words separated by spaces"""
+        if self._text is None:
+            self._text = " ".join(self.texts).strip()
+        return self._text
+
+    @property
+    def texts(self) -> List[str]:
+        """Strings of the words"""
+        strings = self.vocabulary.strings
+        return [strings[i] for i in self.word_ids.tolist()]
+
+    @property
+    def words_language(self) -> List[str]:
+        """Language of each word, None without language detection"""
+        if self.language_ids is None:
+            return None
+        strings = self.languages.strings
+        return [strings[i] for i in self.language_ids.tolist()]
+
+    @property
+    def majority_language(self) -> str:
+        """Most frequent language of the words, None without language detection"""
+        if self.language_ids is None or not len(self.language_ids):
+            return None
+        return self.languages.strings[int(np.argmax(np.bincount(self.language_ids)))]
+
+    @property
+    def json(self) -> List[dict]:
+        return [
+            {"word": word, "start": start, "end": end, "conf": conf}
+            for word, start, end, conf in zip(self.texts, self.start.tolist(), self.end.tolist(), self.conf.tolist())
+        ]
+
+
+class Word:
+    """View on a word of a WordTable"""
+
+    __slots__ = ("_table", "_index")
+
+    def __init__(self, table: WordTable, index: int):
+        self._table = table
+        self._index = index
+
+    @property
+    def word(self) -> str:
+        return self._table.vocabulary.strings[self._table.word_ids[self._index]]
+
+    @property
+    def start(self) -> float:
+        return float(self._table.start[self._index])
+
+    @property
+    def end(self) -> float:
+        return float(self._table.end[self._index])
+
+    @property
+    def conf(self) -> float:
+        return float(self._table.conf[self._index])
+
+    def apply_offset(self, offset: float):
+        self._table.start[self._index] += offset
+        self._table.end[self._index] += offset
+        self._table._sorted = self._table._bounds = None
 
     @property
     def json(self) -> dict:
-        return self.__dict__
+        return {"word": self.word, "start": self.start, "end": self.end, "conf": self.conf}
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Word) and self.json == other.json
+
+    def __repr__(self) -> str:
+        return f"Word(word={self.word!r}, start={self.start}, end={self.end}, conf={self.conf})"
 
 
 @dataclass
@@ -39,7 +251,7 @@ class DiarizationSegment:
 @dataclass
 class SpeechSegment:
     speaker_id: str = None
-    words: list = field(default_factory=list)
+    words: WordTable = field(default_factory=WordTable)
     language: str = None
     processed_segment = None
 
@@ -57,15 +269,15 @@ class SpeechSegment:
 
     @property
     def raw_segment(self) -> str:
-        return " ".join([w.word for w in self.words]).strip()
+        return self.words.text
 
     @property
     def start(self) -> float:
-        return min([w.start for w in self.words]) if len(self.words) > 0 else 0.0
+        return self.words.bounds[0]
 
     @property
     def end(self) -> float:
-        return max([w.end for w in self.words]) if len(self.words) > 0 else 0.0
+        return self.words.bounds[1]
 
     @property
     def duration(self) -> float:
@@ -73,6 +285,10 @@ class SpeechSegment:
 
     @property
     def json(self) -> dict:
+        return self.toJson()
+
+    def toJson(self, include_words: bool = True) -> dict:
+        """Returns the segment as a dict, with "words": None if not include_words"""
         res = {
             "spk_id": self.speaker_id,
             "start": self.start,
@@ -82,73 +298,152 @@ class SpeechSegment:
             "segment": self.processed_segment
             if self.processed_segment is not None
             else self.raw_segment,
-            "words": [w.json for w in self.words],
+            "words": self.words.json if include_words else None,
         }
         if self.language:
             res["language"] = self.language
         return res
 
 
+def _stitchWords(
+    first: WordTable, second: WordTable, overlap_start: float, overlap_end: float
+) -> Tuple[WordTable, WordTable]:
+    """Removes the words transcribed twice in the overlap [overlap_start, overlap_end] of two consecutive chunks.
+
+    Words of both chunks with overlapping timestamps are the same word, the most confident one is kept.
+    Other words of the overlap are kept by the chunk they are the farthest from the edge of (i.e. their center is on
+    its side of the middle of the overlap), as words close to the edges of a chunk are often truncated.
+    """
+    middle = (overlap_start + overlap_end) / 2
+    first_candidates = np.flatnonzero(first.end > overlap_start).tolist()
+    second_candidates = np.flatnonzero(second.start < overlap_end).tolist()
+    keep_first = np.ones(len(first), dtype=bool)
+    keep_second = np.ones(len(second), dtype=bool)
+    paired_first = set()
+    paired_second = set()
+    for a in first_candidates:
+        a_start, a_end = first.start[a], first.end[a]
+        for b in second_candidates:
+            if b in paired_second:
+                continue
+            b_start, b_end = second.start[b], second.end[b]
+            intersection = min(a_end, b_end) - max(a_start, b_start)
+            if (intersection > 0 and intersection >= 0.5 * min(a_end - a_start, b_end - b_start)) or (
+                a_start == b_start and a_end == b_end
+            ):
+                paired_first.add(a)
+                paired_second.add(b)
+                if first.conf[a] >= second.conf[b]:
+                    keep_second[b] = False
+                else:
+                    keep_first[a] = False
+                break
+    for a in first_candidates:
+        if a not in paired_first and first.start[a] + first.end[a] >= 2 * middle:
+            keep_first[a] = False
+    for b in second_candidates:
+        if b not in paired_second and second.start[b] + second.end[b] < 2 * middle:
+            keep_second[b] = False
+    return first[keep_first], second[keep_second]
+
+
+def _mergeSortedWords(tables: List[WordTable]) -> WordTable:
+    """Merges word tables into a table sorted by start time, equal to a stable sort of their concatenation.
+
+    Tables (e.g. transcriptions of chunks) are sorted runs that barely overlap: they are concatenated in the order of
+    their first word, and only the words where consecutive runs overlap are sorted.
+    """
+    runs = sorted(
+        ((table.sortedByStart(), k) for k, table in enumerate(tables) if len(table)),
+        key=lambda run: (run[0].start[0], run[1]),
+    )
+    words = WordTable.concatenate([run for run, _ in runs] if runs else tables)
+    bounds = np.cumsum([0] + [len(run) for run, _ in runs])
+    # Spans [lo, hi[ of the words of overlapping runs
+    regions = []
+    for j in range(len(runs) - 1):
+        run, following = runs[j][0], runs[j + 1][0]
+        lo = bounds[j] + int(np.searchsorted(run.start, following.start[0], side="left"))
+        if lo == bounds[j + 1]:
+            continue
+        hi = bounds[j + 1] + int(np.searchsorted(following.start, run.start[-1], side="right"))
+        if regions and lo < regions[-1][1]:
+            regions[-1][1] = max(regions[-1][1], hi)
+        else:
+            regions.append([lo, hi])
+    if regions:
+        # Ties are ordered as in the concatenation of the tables
+        ids = np.repeat([k for _, k in runs], np.diff(bounds))
+        order = np.arange(len(words))
+        for lo, hi in regions:
+            order[lo:hi] = lo + np.lexsort((ids[lo:hi], words.start[lo:hi]))
+        start, ids = words.start[order], ids[order]
+        if not np.all((start[1:] > start[:-1]) | ((start[1:] == start[:-1]) & (ids[1:] >= ids[:-1]))):
+            # A run overlaps more than the following one
+            order = np.lexsort((np.repeat([k for _, k in runs], np.diff(bounds)), words.start))
+        words = words[order]
+    words._sorted = True
+    return words
+
+
 class TranscriptionResult:
     """Transcription result manages transcription results, post-processing and formating for transcription results."""
 
-    def __init__(self, transcriptions: List[Tuple[dict, float]], spk_ids: list = None):
-        """Initialisation accepts list of tuple (transcription, time_offset)"""
+    def __init__(self, transcriptions: List[Tuple[dict, float]], spk_ids: list = None, windowed: bool = False):
+        """Initialisation accepts list of tuple (transcription, time_offset) or (transcription, time_offset, duration).
+        windowed must be set when chunks were split into overlapping windows (see audio._windows)"""
         self.transcription_confidence = 0.0
-        self.words = []
+        self.words = WordTable()
         self.segments = []
         self.diarizationSegments = []
-        self.words_language = None
         if transcriptions:
-            self._mergeTranscription(transcriptions, spk_ids)
+            self._mergeTranscription(transcriptions, spk_ids, windowed)
 
     def _mergeTranscription(
-        self, transcriptions: List[Tuple[dict, float]], spk_ids: list = None
+        self, transcriptions: List[Tuple[dict, float]], spk_ids: list = None, windowed: bool = False
     ) -> None:
-        """Merges transcription results applying offsets"""
-        self.transcription_confidence = 0.0
-        num_words = 0
+        """Merges transcription results applying offsets.
+        When the chunks are windows and their durations are given, words of overlapping consecutive chunks of the same
+        speaker are stitched (see _stitchWords). Other overlapping chunks (e.g. given timestamps) are kept whole.
+        When spk_ids are given (one per transcription), each transcription is a speech segment of its speaker."""
         has_language_detection = None
-        for transcription, offset in transcriptions:
+        chunks = []
+        for i, (transcription, offset, *duration) in enumerate(transcriptions):
             language = transcription.get("language")
             if has_language_detection is None:
                 has_language_detection = language is not None
-                if has_language_detection:
-                    self.words_language = []
             else:
                 if has_language_detection != (language is not None):
                     raise ValueError("Language detection should be consistent")
-            for w in transcription["words"]:
-                word = Word(**w)
-                word.apply_offset(offset)
-                self.words.append(word)
-                if has_language_detection:
-                    self.words_language.append(language)
-                self.transcription_confidence += word.conf
-            num_words += len(transcription["words"])
-        if num_words:
-            self.transcription_confidence /= num_words
-        self.words.sort(key=lambda x: x.start)
+            words = WordTable.fromJson(
+                transcription["words"],
+                language,
+                offset=offset,
+                vocabulary=self.words.vocabulary,
+                language_vocabulary=self.words.languages,
+            )
+            end = offset + duration[0] if duration else None
+            same_speaker = not spk_ids or (i and spk_ids[i] == spk_ids[i - 1])
+            if windowed and chunks and same_speaker and chunks[-1][1] is not None and offset < chunks[-1][1] - 0.01:
+                chunks[-1][0], words = _stitchWords(chunks[-1][0], words, offset, chunks[-1][1])
+            chunks.append([words, end])
+        self.words = _mergeSortedWords([words for words, _ in chunks])
+        self.transcription_confidence = float(self.words.conf.mean()) if len(self.words) else 0.0
 
         if spk_ids:
-            for (transcription, offset), id in zip(transcriptions, spk_ids):
-                seg_words = []
-                language = transcription.get("language")
-                for w in transcription["words"]:
-                    word = Word(**w)
-                    word.apply_offset(offset)
-                    seg_words.append(word)
-                if seg_words:
-                    self.segments.append(SpeechSegment(id, seg_words, language))
+            for (words, _), id in zip(chunks, spk_ids):
+                if len(words):
+                    self.segments.append(SpeechSegment(id, words, words.majority_language))
             self.segments = sorted(self.segments, key=lambda seg: seg.start)
 
-    def setTranscription(self, words: List[dict], words_language: List[dict]):
-        for w in words:
-            self.words.append(Word(**w))
-        self.transcription_confidence = sum([w.conf for w in self.words]) / len(
-            self.words
-        ) if len(self.words) else 0.0
-        self.words_language = words_language
+    @property
+    def words_language(self) -> List[str]:
+        """Language of each word, None without language detection"""
+        return self.words.words_language
+
+    def setTranscription(self, words: List[dict], words_language: List[str]):
+        self.words = WordTable.fromJson(words, words_language)
+        self.transcription_confidence = float(self.words.conf.mean()) if len(self.words) else 0.0
 
     def setDiarizationResult(self, diarizationResult: Union[str, dict]):
         """Create speech segments using word and diarization data"""
@@ -174,15 +469,8 @@ class TranscriptionResult:
         if not self.diarizationSegments:
             return self.setNoDiarization()
 
-        # Sort words by start time
-        if self.words_language is None:
-            self.words.sort(key=lambda x: x.start)
-        else:
-            # Sort words and languages by start time (they should keep being aligned)
-            assert len(self.words) == len(self.words_language)
-            self.words, self.words_language = zip(*sorted(
-                zip(self.words, self.words_language), key=lambda x: x[0].start
-            ))
+        # Sort words by start time if they are not (languages are sorted along)
+        self.words = self.words.sortedByStart()
 
         # Interpolates speaker change timestamps
         # Starts the first segment at 0.0, ends the last segment at max(word.ends)
@@ -190,7 +478,7 @@ class TranscriptionResult:
         self.diarizationSegments[0].seg_begin = 0.0
         if len(self.words):
             self.diarizationSegments[-1].seg_end = max(
-                self.diarizationSegments[-1].seg_end, self.words[-1].end
+                self.diarizationSegments[-1].seg_end, float(self.words.end[-1])
             )
         for first_segment, second_segment in zip(
             self.diarizationSegments[:-1], self.diarizationSegments[1:]
@@ -203,48 +491,113 @@ class TranscriptionResult:
                 )
                 first_segment.seg_end = second_segment.seg_begin = middle_point
 
-        seg_index = 0
+        # Group consecutive words of the same diarization segment, merging consecutive segments of the same speaker
+        seg_indices = self._alignWords()
+        if not len(seg_indices):
+            return
+        bounds = (np.flatnonzero(np.diff(seg_indices)) + 1).tolist()
         previous_id = None
-        current_id = self.diarizationSegments[seg_index].spk_id
-        current_words = []
-        current_words_languages = []
-
-        # Iterate over segments and words to create speech segments
-        for i, word in enumerate(self.words):
-            while not self._resolveWordSegment(i, seg_index):
-                # Next segment
-                if seg_index + 1 < len(self.diarizationSegments):
-                    seg_index += 1
-                    next_id = self.diarizationSegments[seg_index].spk_id
-                else:
-                    break
-                if len(current_words):
-                    if current_id != previous_id: # Flush current segment
-                        self.segments.append(
-                            SpeechSegment(
-                                current_id, current_words,
-                                language=self.getMajorityLanguage(current_words_languages)
-                            )
-                        )
-                    else: # Merge with previous segment
-                        self.segments[-1].words += current_words
-                    previous_id = current_id
-                current_id = next_id
-                current_words = []
-                current_words_languages = []
-            current_words.append(word)
-            if self.words_language:
-                current_words_languages.append(self.words_language[i])
-        if len(current_words):
-            if current_id != previous_id: # Flush current segment
-                self.segments.append(
-                    SpeechSegment(
-                        current_id, current_words,
-                        language=self.getMajorityLanguage(current_words_languages)
-                    )
-                )
+        previous_start = 0
+        for start, stop in zip([0] + bounds, bounds + [len(seg_indices)]):
+            current_id = self.diarizationSegments[seg_indices[start]].spk_id
+            if current_id != previous_id: # New segment
+                words = self.words[start:stop]
+                self.segments.append(SpeechSegment(current_id, words, language=words.majority_language))
+                previous_start = start
             else: # Merge with previous segment
-                self.segments[-1].words += current_words
+                self.segments[-1].words = self.words[previous_start:stop]
+            previous_id = current_id
+
+    def _alignWords(self, precision: float = 0.25) -> np.ndarray:
+        """Returns the index of the diarization segment of each word, as placed by _resolveWordSegment.
+
+        Segments are visited in order and a word goes to the first segment, from the one of the previous word,
+        it is resolved to. A word is within (resp. outside) the segments whose end is after (resp. before)
+        it by precision, those are found with searchsorted and the placement rules only apply to the others.
+        """
+        num_words = len(self.words)
+        last = len(self.diarizationSegments) - 1
+        # The last segment accepts every word, only the end of the others matter
+        seg_ends = np.array([segment.seg_end for segment in self.diarizationSegments[:-1]], dtype=np.float64)
+        seg_begins = np.array([segment.seg_begin for segment in self.diarizationSegments[1:]], dtype=np.float64)
+        if np.any(np.diff(seg_ends) < 0) or np.any(np.diff(seg_begins) < 0):
+            # Segments included in others were not all filtered out: place words one by one
+            seg_indices = np.empty(num_words, dtype=np.int64)
+            seg_index = 0
+            for i in range(num_words):
+                while seg_index < last and not self._resolveWordSegment(i, seg_index, precision):
+                    seg_index += 1
+                seg_indices[i] = seg_index
+            return seg_indices
+
+        # Word i is within the segments from within[i] on, and outside the segments before outside[i]
+        within = np.searchsorted(seg_ends - precision, self.words.end, side="left")
+        outside = np.searchsorted(seg_ends + precision, self.words.start, side="right")
+        # The rules decide for the segments in between, which the word straddles. As segment boundaries
+        # increase, a straddling segment accepting the word is followed by segments accepting it too
+        first_segments = within
+        straddling = np.flatnonzero(outside < within)
+        first_segments[straddling] = self._resolveStraddlingWords(
+            straddling, outside[straddling], within[straddling], seg_ends, seg_begins, precision
+        )
+        # Words never go back to a previous segment
+        return np.maximum.accumulate(first_segments)
+
+    def _resolveStraddlingWords(
+        self,
+        word_indices: np.ndarray,
+        first_segments: np.ndarray,
+        stop_segments: np.ndarray,
+        seg_ends: np.ndarray,
+        next_seg_begins: np.ndarray,
+        precision: float,
+    ) -> np.ndarray:
+        """Applies the rules of _resolveWordSegment to words straddling the segments first_segments to stop_segments
+        (excluded), and returns the first of these segments each word belongs to (stop_segments if none).
+        Words are either accepted by their first segment, rejected by all, or assigned by overlap."""
+        words = self.words
+        word_starts = words.start[word_indices]
+        word_ends = words.end[word_indices]
+        # Assign first word to first segment, last word to last segment
+        accept = word_indices == 0
+        reject = ~accept & (word_indices == len(words) - 1)
+        undecided = ~(accept | reject)
+
+        # Decide based on the distance with the previous and the next words
+        gap_previous_word = np.zeros(len(word_indices))
+        gap_next_word = np.zeros(len(word_indices))
+        inner_indices = word_indices[undecided]
+        gap_previous_word[undecided] = word_starts[undecided] - words.end[inner_indices - 1]
+        gap_next_word[undecided] = words.start[inner_indices + 1] - word_ends[undecided]
+        by_gap = undecided & (np.maximum(gap_previous_word, gap_next_word) >= precision)
+        reject |= by_gap & (gap_previous_word > gap_next_word)
+        undecided &= ~by_gap
+
+        # If the previous word ends with a punctuation, cut there
+        candidates = np.flatnonzero(undecided)
+        strings = words.vocabulary.strings
+        ends_sentence = lambda word_ids: np.array(
+            [bool(strings[i]) and strings[i][-1] in ".!?" for i in word_ids.tolist()], dtype=bool
+        )
+        previous_ends_sentence = ends_sentence(words.word_ids[word_indices[candidates] - 1])
+        word_ends_sentence = ends_sentence(words.word_ids[word_indices[candidates]])
+        reject[candidates[previous_ends_sentence]] = True
+        undecided[candidates[previous_ends_sentence | word_ends_sentence]] = False
+
+        # Otherwise, look for the first segment overlapping the word more than the next one
+        segments = np.where(reject, stop_segments, first_segments)
+        pending = np.flatnonzero(undecided)
+        current = first_segments[pending]
+        while len(pending):
+            overlap_previous = seg_ends[current] - word_starts[pending]
+            overlap_next = word_ends[pending] - next_seg_begins[current]
+            found = overlap_previous > overlap_next
+            segments[pending[found]] = current[found]
+            pending, current = pending[~found], current[~found] + 1
+            exhausted = current >= stop_segments[pending]
+            segments[pending[exhausted]] = stop_segments[pending[exhausted]]
+            pending, current = pending[~exhausted], current[~exhausted]
+        return segments
 
     def _resolveWordSegment(
         self,
@@ -264,9 +617,9 @@ class TranscriptionResult:
             # Stay on current segment if it is the last one
             return True
 
-        word = self.words[word_index]
-        word_start = word.start
-        word_end = word.end
+        words = self.words
+        word_start = words.start[word_index]
+        word_end = words.end[word_index]
         current_diarization_seg = self.diarizationSegments[diarization_index]
 
         # Word completely within current segment
@@ -288,17 +641,18 @@ class TranscriptionResult:
 
         # Decide based on the distance with the previous and the next words
         # if one exceeds a certain threshold seconds
-        gap_previous_word = word_start - self.words[word_index - 1].end
-        gap_next_word = self.words[word_index + 1].start - word_end
+        gap_previous_word = word_start - words.end[word_index - 1]
+        gap_next_word = words.start[word_index + 1] - word_end
         if max(gap_previous_word, gap_next_word) >= precision:
             return gap_previous_word <= gap_next_word
 
         if word_index > 0:
             # If the previous word ends with a punctuation, cut there
-            previous_word = self.words[word_index - 1]
-            if previous_word.word and previous_word.word[-1] in ".!?":
+            previous_word = words.vocabulary.strings[words.word_ids[word_index - 1]]
+            word = words.vocabulary.strings[words.word_ids[word_index]]
+            if previous_word and previous_word[-1] in ".!?":
                 return False
-            elif word.word and word.word[-1] in ".!?":
+            elif word and word[-1] in ".!?":
                 return True
 
         # Otherwise, look at what happens with the next segment
@@ -324,7 +678,7 @@ class TranscriptionResult:
 
     def setNoDiarization(self):
         """Convert word data into a speech segment when there is no diarization"""
-        self.segments.append(SpeechSegment(None, self.words, self.getMajorityLanguage(self.words_language)))
+        self.segments.append(SpeechSegment(None, self.words, self.words.majority_language))
 
     def getMajorityLanguage(self, words_languages: List[str]) -> str:
         """Get the majority language from a list of languages"""
@@ -352,13 +706,13 @@ class TranscriptionResult:
         Returns:
             str: Transcription without any other processing
         """
-        return " ".join([w.word for w in self.words]).strip()
+        return self.words.text
     
     @property
     def language(self) -> str:
         """Return the language of the transcription: either the majoritary detected language, or the language specified in the request.
         """
-        return self.getMajorityLanguage(self.words_language)
+        return self.words.majority_language
 
     @classmethod
     def fromDict(cls, resultDict: dict):
@@ -367,7 +721,8 @@ class TranscriptionResult:
         result.transcription_confidence = resultDict["confidence"]
         for segment in resultDict["segments"]:
             seg = SpeechSegment(
-                segment["spk_id"], [Word(**w) for w in segment["words"]],
+                segment["spk_id"],
+                WordTable.fromJson(segment["words"], vocabulary=result.words.vocabulary),
                 language=segment.get("language")
             )
             seg.processed_segment = segment["segment"]
@@ -380,12 +735,13 @@ class TranscriptionResult:
 
         return result
 
-    def final_result(self) -> dict:
+    def final_result(self, include_words: bool = True) -> dict:
+        """Returns the result as a dict, with "words": None in segments if not include_words"""
         return {
             "transcription_result": self.final_transcription,
             "raw_transcription": self.raw_transcription,
             "language": self.language,
             "confidence": self.transcription_confidence,
-            "segments": [s.json for s in self.segments],
+            "segments": [s.toJson(include_words) for s in self.segments],
             "diarization_segments": [seg.json for seg in self.diarizationSegments],
         }
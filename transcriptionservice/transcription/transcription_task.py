@@ -11,11 +11,22 @@ from transcriptionservice.transcription.configs.transcriptionconfig import (
 )
 from transcriptionservice.transcription.transcription_result import TranscriptionResult
 from transcriptionservice.transcription.utils.audio import (
-    splitFile,
+    getStatDurations,
+    getTranscodedPath,
+    iterTranscodeAndSplitFile,
+    packDecisions,
     splitUsingTimestamps,
+    transcodedSize,
     transcoding,
+    getChannelPaths,
     getDuration,
+    iterSplitFile,
+    probeChannels,
+    splitChannels,
+    unpackDecisions,
+    vadAnalysisKey,
 )
+from transcriptionservice.transcription.utils.scratch import ScratchArea
 from transcriptionservice.transcription.utils.serviceresolve import (
     ResolveException,
     ServiceResolver,
@@ -46,17 +57,30 @@ def transcription_task(self, task_info: dict, file_path: str):
     - "transcription_config" : Transcription configuration
     - "result_db" : Connexion info to the result database
     - "service": Name of the transcription service
-    - "hash": Audio File Hash
+    - "hash": Audio File Hash (including the splitting options)
+    - "audio_hash": (Optionnal) Audio File Hash
     - "keep_audio": If False, the audio file is deleted after the task.
     - "timestamps" : (Optionnal) Audio spliting timestamps
     """
+    # Temporary files are tracked so that they are removed whatever happens
+    scratch = ScratchArea()
     try:
-        return transcription_task_(self, task_info, file_path)
+        return transcription_task_(self, task_info, file_path, scratch)
     except Exception as error:
         import traceback
         raise Exception(f"Task failed: {str(error)}\n\n{traceback.format_exc()}")
+    finally:
+        scratch.cleanup()
 
-def transcription_task_(self, task_info: dict, file_path: str):
+def _iterChannelSubfiles(channel_files: list, split, chunk_speakers: list):
+    """Yields the subfiles split(channel_file) of each channel file, appending the index of their channel to chunk_speakers"""
+    for channel, channel_file in enumerate(channel_files):
+        for subfile in split(channel_file):
+            chunk_speakers.append(channel)
+            yield subfile
+
+
+def transcription_task_(self, task_info: dict, file_path: str, scratch: ScratchArea):
     # Logging task
     logging.basicConfig(
         filename=f"/usr/src/app/logs/{self.request.id}.txt",
@@ -78,6 +102,16 @@ def transcription_task_(self, task_info: dict, file_path: str):
         config.diarizationConfig.isEnabled = False
         logging.debug("Disabling diarization due to timestamps information")
 
+    # Channels transcribed separately are the speakers
+    num_channels = 1
+    if config.transcribePerChannel and not task_info["timestamps"]:
+        num_channels = probeChannels(file_path) or 1
+        if num_channels > 1:
+            config.diarizationConfig.isEnabled = False
+            logging.debug(f"Disabling diarization to transcribe the {num_channels} channels separately")
+        else:
+            logging.warning("Input file has a single channel, it is not transcribed per channel")
+
     logging.info(config)
 
     # Resolve required task queues
@@ -93,6 +127,19 @@ def transcription_task_(self, task_info: dict, file_path: str):
             logging.error(str(error))
             raise ResolveException(f"Failed to resolve: {str(error)}")
 
+    # Negotiate the container of the audio files (FLAC saves shared volume bandwidth if the services read it)
+    # Chunks are read by the STT service, the transcoded file can also be read by the diarization service
+    chunk_format = resolver.resolve_audio_format([task_info["service_name"]])
+    master_readers = [task_info["service_name"]]
+    if config.diarizationConfig.isEnabled:
+        master_readers.append(config.diarizationConfig.serviceQueue)
+    # The transcoded file is kept as wave when it is returned or split in-process using timestamps
+    if chunk_format == "wav" or task_info["keep_audio"] or task_info["timestamps"]:
+        master_format = "wav"
+    else:
+        master_format = resolver.resolve_audio_format(master_readers)
+    logging.info(f"Audio files are written as {chunk_format} (chunks) and {master_format} (transcoded file)")
+
     # Task progression
     progress = TaskProgression(
         [
@@ -107,16 +154,12 @@ def transcription_task_(self, task_info: dict, file_path: str):
     self.update_state(state="STARTED", meta=progress.toDict())
 
     # Preprocessing
-    ## Transtyping
-    logging.info(f"Converting input file to wav.")
-    file_name = transcoding(file_path)
-
     task_hash = task_info["hash"] + "-" + str(config.language)
 
     # Check for available transcription
     logging.info(f"Checking for available transcription for {task_hash}")
 
-    if not task_info["timestamps"]:
+    if not task_info["timestamps"] and num_channels == 1:
         available_transcription = db_client.fetch_transcription(task_hash)
     else:
         available_transcription = None
@@ -133,14 +176,52 @@ def transcription_task_(self, task_info: dict, file_path: str):
             available_transcription = None
     self.update_state(state="STARTED", meta=progress.toDict())
 
+    ## Transtyping
+    # When splitting with VAD, the input file is decoded while being split.
+    # Otherwise, or when the whole signal is needed (diarization, keep_audio), the transcoded file is written.
+    # Temporary files are written in the scratch area when they fit
+    file_name = getTranscodedPath(file_path, audio_format=master_format)
+    if not task_info["keep_audio"]:
+        scratch.track(file_path)
+        if file_name != file_path:
+            file_name = scratch.place(file_name, transcodedSize(file_path) if scratch.folder is not None else None)
+    split_while_decoding = (
+        available_transcription is None
+        and not task_info["timestamps"]
+        and config.vadConfig.isEnabled
+        and num_channels == 1
+    )
+    write_file = config.diarizationConfig.isEnabled or task_info["keep_audio"]
+    channel_files = None
+    if num_channels > 1:
+        logging.info(f"Splitting the {num_channels} channels of the input file.")
+        channel_size = transcodedSize(file_path) if scratch.folder is not None else None
+        channel_files = [scratch.place(path, channel_size) for path in getChannelPaths(file_path, num_channels)]
+        splitChannels(file_path, channel_files, cleanup=not task_info["keep_audio"])
+        if task_info["keep_audio"]:
+            transcoding(file_path, output_file_path=file_name)
+    elif not split_while_decoding:
+        if available_transcription is None or write_file:
+            logging.info(f"Converting input file to wav.")
+            transcoding(file_path, output_file_path=file_name)
+        else:
+            os.remove(file_path)
+
     if available_transcription is None:
+        # Channel of each chunk, when transcribed per channel
+        chunk_speakers = []
         # Split using VAD
         if task_info["timestamps"]:
             logging.info(f"Split using provided timestamps ...")
             subfiles, total_duration = splitUsingTimestamps(
-                file_name, task_info["timestamps"]
+                file_name, task_info["timestamps"], scratch=scratch, audio_format=chunk_format
             )
             logging.info(f"Input file has been split into {len(subfiles)} subfiles")
+        elif channel_files and not config.vadConfig.isEnabled:
+            logging.info(f"Split in one chunk per channel (VAD disabled)")
+            subfiles = _iterChannelSubfiles(
+                channel_files, lambda path: [(path, 0.0, getDuration(path))], chunk_speakers
+            )
         elif not config.vadConfig.isEnabled:
             logging.info(f"Split in one chunk (VAD disabled)")
             total_duration = getDuration(file_name)
@@ -163,20 +244,49 @@ def transcription_task_(self, task_info: dict, file_path: str):
                     "min_length": 10,
                     # "min_silence": 0.6,
                 }
-            subfiles, stats_duration = splitFile(
-                file_name,
+            # Frame-level VAD decisions only depend on the audio and the VAD method, they are cached
+            vad_hash = None
+            decisions = None
+            recorded_decisions = None
+            if task_info.get("audio_hash") and not channel_files:
+                vad_hash = vadAnalysisKey(task_info["audio_hash"], config.vadConfig.methodName)
+                try:
+                    cached_vad = db_client.fetch_vad_decisions(vad_hash)
+                except Exception as e:
+                    logging.warning("Failed to fetch VAD decisions: {}".format(e))
+                    cached_vad = None
+                if cached_vad is not None:
+                    logging.info("VAD decisions already available")
+                    decisions = [unpackDecisions(cached_vad["decisions"], cached_vad["num_frames"])]
+                else:
+                    recorded_decisions = []
+            kwargs.update(
+                scratch=scratch,
+                audio_format=chunk_format,
                 method=config.vadConfig.methodName,
-                **kwargs,
+                min_speech_ratio=config.vadConfig.minSpeechRatio,
+                trim_non_speech=config.vadConfig.trimNonSpeech,
+                window_duration=config.vadConfig.windowDuration,
+                window_overlap=config.vadConfig.windowOverlap,
             )
-            total_duration = stats_duration["total"]
-            logging.info(f"Split in {len(subfiles)} chunks of around {config.vadConfig.minDuration} seconds ({', '.join([k+'='+str(round(v, 2)) for k,v in stats_duration.items()])})")
-
-        # Progress monitoring
-        speakers = None
-        progress.steps["preprocessing"].state = StepState.DONE
-        self.update_state(state="STARTED", meta=progress.toDict())
+            # Subfiles are yielded while the VAD is still processing the rest of the file
+            if channel_files:
+                subfiles = _iterChannelSubfiles(
+                    channel_files, lambda path: iterSplitFile(path, **kwargs), chunk_speakers
+                )
+            else:
+                subfiles = iterTranscodeAndSplitFile(
+                    file_path,
+                    write_file=write_file,
+                    output_file_path=file_name,
+                    decisions=decisions,
+                    recorded_decisions=recorded_decisions,
+                    **kwargs,
+                )
 
         # Transcription
+        # Chunks are dispatched as soon as they are available
+        speakers = None
         transJobIds = []
         progress.steps["transcription"].state = StepState.STARTED
         for subfile_path, offset, duration in subfiles:
@@ -187,6 +297,18 @@ def transcription_task_(self, task_info: dict, file_path: str):
             )
             transJobIds.append((transJobId, offset, duration, subfile_path))
 
+        if not task_info["timestamps"] and (config.vadConfig.isEnabled or channel_files):
+            stats_duration = getStatDurations([(p, o, d) for _, o, d, p in transJobIds])
+            total_duration = stats_duration["total"]
+            logging.info(f"Split in {len(transJobIds)} chunks of around {config.vadConfig.minDuration} seconds ({', '.join([k+'='+str(round(v, 2)) for k,v in stats_duration.items()])})")
+            if recorded_decisions is not None:
+                try:
+                    db_client.push_vad_decisions(vad_hash, *packDecisions(recorded_decisions))
+                except Exception as e:
+                    logging.warning("Failed to push VAD decisions to DB: {}".format(e))
+
+        # Progress monitoring
+        progress.steps["preprocessing"].state = StepState.DONE
         self.update_state(state="STARTED", meta=progress.toDict())
 
     # Diarization (In parallel)
@@ -216,17 +338,17 @@ def transcription_task_(self, task_info: dict, file_path: str):
         transcription = None
         for jobId, offset, duration, subfile_path in transJobIds:
             if failed:
-                if subfile_path != file_name and os.path.exists(subfile_path):
-                    os.remove(subfile_path)
+                if subfile_path != file_name:
+                    scratch.remove(subfile_path)
                 jobId.revoke()
                 continue
             transcription = jobId.get(disable_sync_subtasks=False)
-            if subfile_path != file_name and os.path.exists(subfile_path):
-                os.remove(subfile_path)
+            if subfile_path != file_name:
+                scratch.remove(subfile_path)
             if jobId.status != celery_states.SUCCESS:
                 failed = True
                 continue
-            transcriptions.append((transcription, offset))
+            transcriptions.append((transcription, offset, duration))
             progress.steps["transcription"].progress += duration / total_duration
             self.update_state(state="STARTED", meta=progress.toDict())
         logging.info(f"Transcription task complete")
@@ -243,15 +365,21 @@ def transcription_task_(self, task_info: dict, file_path: str):
                 transcriptions, [x["spk_id"] for x in task_info["timestamps"]]
             )
         else:
-            transcription_result = TranscriptionResult(transcriptions)
+            # Only chunks split by the VAD can be overlapping windows, to be stitched
+            windowed = config.vadConfig.isEnabled and bool(config.vadConfig.windowDuration)
+            if channel_files:
+                transcription_result = TranscriptionResult(transcriptions, chunk_speakers, windowed=windowed)
+            else:
+                transcription_result = TranscriptionResult(transcriptions, windowed=windowed)
 
-        # Save transcription in DB
-        words = transcription_result.words
-        words_language = transcription_result.words_language
-        try:
-            db_client.push_transcription(task_hash, words, words_language)
-        except Exception as e:
-            logging.warning("Failed to push transcription to DB: {}".format(e))
+        # Save transcription in DB (transcriptions per channel are not reused, as they hold the speakers)
+        if not channel_files:
+            words = transcription_result.words
+            words_language = transcription_result.words_language
+            try:
+                db_client.push_transcription(task_hash, words, words_language)
+            except Exception as e:
+                logging.warning("Failed to push transcription to DB: {}".format(e))
 
     # Diarization result
     if config.diarizationConfig.isEnabled:
@@ -262,7 +390,7 @@ def transcription_task_(self, task_info: dict, file_path: str):
         if diarJobId.status != celery_states.SUCCESS:
             raise Exception("Diarization has failed: {}".format(speakers))
         transcription_result.setDiarizationResult(speakers)
-    elif not task_info["timestamps"]:
+    elif not task_info["timestamps"] and num_channels == 1:
         transcription_result.setNoDiarization()
 
     # Punctuation
@@ -305,9 +433,9 @@ def transcription_task_(self, task_info: dict, file_path: str):
         raise Exception("Failed to process result")
 
     # Free ressource
-    if not task_info["keep_audio"]:
+    if not task_info["keep_audio"] and os.path.exists(file_name):
         try:
-            os.remove(file_name)
+            scratch.remove(file_name)
         except Exception as e:
             logging.warning("Failed to remove ressource {}".format(file_name))
     progress.steps["postprocessing"].state = StepState.DONE
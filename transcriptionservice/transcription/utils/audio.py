@@ -1,10 +1,69 @@
+import itertools
+import logging
 import os
 import subprocess
-from typing import Dict, List, Tuple
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
 import numpy as np
 import wavio
 import webrtcvad
+from billiard import Pipe, Process
+
+from transcriptionservice.transcription.utils.scratch import ScratchArea
+from transcriptionservice.transcription.utils.wavfile import (
+    WAVE_FORMAT_PCM,
+    iterReadWav,
+    iterWriteWav,
+    mapWav,
+    readWavHeader,
+    releaseMapped,
+    writeWav,
+)
+
+# Maximum number of concurrent ffmpeg processes used to decode a long input
+TRANSCODING_WORKERS = int(os.environ.get("TRANSCODING_WORKERS", 1))
+# Maximum number of processes running the VAD on a wave file
+VAD_WORKERS = int(os.environ.get("VAD_WORKERS", 1))
+# Number of threads writing the chunk files
+WRITING_WORKERS = int(os.environ.get("WRITING_WORKERS", 4))
+# Preferred container of the chunk files, used with the services declaring they read it
+CHUNK_FORMAT = os.environ.get("CHUNK_FORMAT", "wav").lower()
+
+
+def getTranscodedPath(
+    input_file_path: str, output_sr: int = 16000, output_channels: int = 1, audio_format: str = "wav"
+) -> str:
+    """Returns the path of the 16b PCM wave (or FLAC) file associated to the input file.
+    Inputs that are already 16b PCM wave files at the given sample rate and channels are used in place."""
+    header = readWavHeader(input_file_path) if os.path.isfile(input_file_path) else None
+    if header is not None and header.isConformant(output_sr, output_channels):
+        return input_file_path
+    folder = os.path.dirname(input_file_path)
+    basename = os.path.splitext(os.path.basename(input_file_path))[0]
+    if input_file_path.endswith(f".{audio_format}"):
+        basename = f"_{basename}.{audio_format}"
+    else:
+        basename = f"{basename}.{audio_format}"
+    return os.path.join(folder, basename)
+
+
+def getChannelPaths(input_file_path: str, num_channels: int) -> List[str]:
+    """Returns the paths of the 16b PCM mono wave files of the channels of the input file (see splitChannels)"""
+    basename = os.path.splitext(input_file_path)[0]
+    return [f"{basename}_channel{k}.wav" for k in range(num_channels)]
+
+
+def transcodedSize(input_file_path: str, output_sr: int = 16000, output_channels: int = 1) -> Optional[int]:
+    """Returns the estimated size in bytes of the transcoded file, None if the duration of the input is unknown"""
+    header = readWavHeader(input_file_path)
+    duration = header.duration if header is not None else probeDuration(input_file_path)
+    if duration is None:
+        return None
+    return 44 + int(duration * output_sr + 1) * output_channels * 2
 
 
 def transcoding(
@@ -12,23 +71,44 @@ def transcoding(
     output_sr: int = 16000,
     output_channels: int = 1,
     cleanup: bool = True,
+    output_file_path: str = None,
 ) -> str:
-    """Transcode the input file into 16b PCM Mono Wave file at given sample rate"""
+    """Transcode the input file into 16b PCM Mono Wave file at given sample rate.
+    The output file is written at output_file_path if set, at getTranscodedPath(input_file_path) otherwise.
+    It is encoded in FLAC if output_file_path ends with .flac."""
     # Check File
     if not os.path.isfile(input_file_path):
         raise FileNotFoundError(f"Ressource not found: {input_file_path}")
 
     # Output name
-    folder = os.path.dirname(input_file_path)
-    basename = os.path.splitext(os.path.basename(input_file_path))[0]
-    if input_file_path.endswith(".wav"):
-        basename = f"_{basename}.wav"
-    else:
-        basename = f"{basename}.wav"
-    output_file_path = os.path.join(folder, basename)
+    if getTranscodedPath(input_file_path, output_sr, output_channels) == input_file_path:
+        output_file_path = input_file_path
+    elif output_file_path is None:
+        output_file_path = getTranscodedPath(input_file_path, output_sr, output_channels)
+
+    # Already conformant wave file
+    if output_file_path == input_file_path:
+        return output_file_path
+
+    # Simple wave files are converted in-process
+    header = readWavHeader(input_file_path)
+    if header is not None and header.isConvertible and output_channels == 1:
+        for _ in iterWriteAudio(iterReadWav(input_file_path, header, output_sr), output_file_path, output_sr):
+            pass
+        if cleanup:
+            os.remove(input_file_path)
+        return output_file_path
+
+    # Long inputs are decoded by concurrent processes
+    if TRANSCODING_WORKERS > 1:
+        blocks = decodeAudio(input_file_path, output_sr, output_channels, cleanup=cleanup)
+        for _ in iterWriteAudio(blocks, output_file_path, output_sr):
+            pass
+        return output_file_path
 
     # Subprocess
-    command = f"ffmpeg -i {input_file_path} -y -acodec pcm_s16le"
+    codec = "flac" if output_file_path.endswith(".flac") else "pcm_s16le"
+    command = f"ffmpeg -i {input_file_path} -y -acodec {codec}"
     if output_channels is not None:
         command += f" -ac {output_channels}"
     command += f" -ar {output_sr} {output_file_path}"
@@ -47,14 +127,354 @@ def transcoding(
     return output_file_path
 
 
+def probeDuration(input_file_path: str) -> Optional[float]:
+    """Returns the duration of a media file in seconds using ffprobe, None if it cannot be determined"""
+    command = [
+        "ffprobe",
+        "-v",
+        "error",
+        "-show_entries",
+        "format=duration",
+        "-of",
+        "default=noprint_wrappers=1:nokey=1",
+        input_file_path,
+    ]
+    try:
+        output = subprocess.run(command, capture_output=True, check=True).stdout
+        return float(output.strip())
+    except (OSError, subprocess.CalledProcessError, ValueError):
+        return None
+
+
+def probeChannels(input_file_path: str) -> Optional[int]:
+    """Returns the number of channels of (the first audio stream of) a media file, None if it cannot be determined"""
+    header = readWavHeader(input_file_path)
+    if header is not None:
+        return header.num_channels
+    command = [
+        "ffprobe",
+        "-v",
+        "error",
+        "-select_streams",
+        "a:0",
+        "-show_entries",
+        "stream=channels",
+        "-of",
+        "default=noprint_wrappers=1:nokey=1",
+        input_file_path,
+    ]
+    try:
+        output = subprocess.run(command, capture_output=True, check=True).stdout
+        return int(output.strip())
+    except (OSError, subprocess.CalledProcessError, ValueError):
+        return None
+
+
+def _decodeCommand(
+    input_file_path: str,
+    output_sr: int,
+    output_channels: int,
+    output: str = "-",
+    start: float = None,
+    duration: float = None,
+) -> List[str]:
+    """Returns the ffmpeg command decoding (a time range of) the input file into raw 16b PCM"""
+    command = ["ffmpeg", "-nostdin", "-y"]
+    if start:
+        command += ["-ss", f"{start:.6f}"]
+    if duration is not None:
+        command += ["-t", f"{duration:.6f}"]
+    command += ["-i", input_file_path, "-vn", "-f", "s16le", "-acodec", "pcm_s16le"]
+    if output_channels is not None:
+        command += ["-ac", str(output_channels)]
+    command += ["-ar", str(output_sr), output]
+    return command
+
+
+def _decodeRanges(
+    input_file_path: str, output_sr: int, workers: int, min_range_duration: float
+) -> List[Tuple[int, Optional[int]]]:
+    """Split the input into time ranges to be decoded concurrently.
+
+    Returns:
+        List[Tuple[int, Optional[int]]]: [(start_frame, num_frames),], num_frames is None for the last range
+    """
+    if workers <= 1:
+        return [(0, None)]
+    duration = probeDuration(input_file_path)
+    if not duration:
+        return [(0, None)]
+    num_ranges = min(workers, int(duration // min_range_duration))
+    if num_ranges <= 1:
+        return [(0, None)]
+    range_frames = -(-int(duration * output_sr) // num_ranges)
+    return [(k * range_frames, range_frames) for k in range(num_ranges - 1)] + [
+        ((num_ranges - 1) * range_frames, None)
+    ]
+
+
+def _iterRawPCM(stream, channels: int, block_bytes: int) -> Iterator[np.ndarray]:
+    """Reads 16b PCM blocks from a binary stream"""
+    remainder = b""
+    while True:
+        data = stream.read(block_bytes)
+        if not data:
+            break
+        data = remainder + data
+        usable = len(data) - len(data) % (2 * channels)
+        data, remainder = data[:usable], data[usable:]
+        block = np.frombuffer(data, dtype=np.int16)
+        yield block if channels == 1 else block.reshape(-1, channels)
+
+
+def decodeAudio(
+    input_file_path: str,
+    output_sr: int = 16000,
+    output_channels: int = 1,
+    cleanup: bool = True,
+    block_duration: float = 10.0,
+    workers: int = None,
+    min_range_duration: float = 300.0,
+) -> Iterator[np.ndarray]:
+    """Decode the input file with ffmpeg and yields 16b PCM blocks at given sample rate without writing to disk.
+    Simple wave files (see WavHeader.isConvertible) are converted in-process without ffmpeg.
+
+    Long inputs are split into time ranges decoded by concurrent ffmpeg processes:
+    the first range is streamed while the following ones are decoded into temporary files, then stitched in order.
+
+    Args:
+        input_file_path (str): Input audio or video file
+        output_sr (int): Output sample rate
+        output_channels (int): Output channels. Blocks are of shape (samples,) for mono and (samples, channels) otherwise
+        cleanup (bool): If True, the input file is removed once decoded
+        block_duration (float): Duration of the yielded blocks in seconds
+        workers (int): Maximum number of concurrent ffmpeg processes (default TRANSCODING_WORKERS)
+        min_range_duration (float): Minimum duration of a time range decoded by a single process in seconds
+    """
+    # Check File
+    if not os.path.isfile(input_file_path):
+        raise FileNotFoundError(f"Ressource not found: {input_file_path}")
+
+    # Simple wave files are converted in-process
+    header = readWavHeader(input_file_path)
+    if header is not None and header.isConvertible and output_channels == 1:
+        yield from iterReadWav(input_file_path, header, output_sr, block_duration=block_duration)
+        if cleanup:
+            os.remove(input_file_path)
+        return
+
+    channels = output_channels if output_channels else 1
+    block_bytes = int(block_duration * output_sr) * channels * 2
+    ranges = _decodeRanges(
+        input_file_path,
+        output_sr,
+        TRANSCODING_WORKERS if workers is None else workers,
+        min_range_duration,
+    )
+
+    with tempfile.TemporaryDirectory() as folder:
+        decoders = []
+        try:
+            for i, (start, num_frames) in enumerate(ranges):
+                output = "-" if i == 0 else os.path.join(folder, f"{i}.pcm")
+                command = _decodeCommand(
+                    input_file_path,
+                    output_sr,
+                    output_channels,
+                    output=output,
+                    start=start / output_sr,
+                    duration=num_frames / output_sr if num_frames is not None else None,
+                )
+                # stderr is redirected to a file so that a verbose ffmpeg cannot block on a full pipe
+                stderr = tempfile.TemporaryFile()
+                process = subprocess.Popen(
+                    command,
+                    stdout=subprocess.PIPE if i == 0 else subprocess.DEVNULL,
+                    stderr=stderr,
+                )
+                decoders.append((command, process, stderr, output))
+
+            # Missing frames at the end of a range are padded if the following ranges are not empty
+            missing = 0
+            for (command, process, stderr, output), (_, num_frames) in zip(decoders, ranges):
+                if output == "-":
+                    stream = process.stdout
+                else:
+                    process.wait()
+                    stream = open(output, "rb")
+                with stream:
+                    remaining = num_frames
+                    for block in _iterRawPCM(stream, channels, block_bytes):
+                        if remaining is not None:
+                            block = block[:remaining]
+                            remaining -= len(block)
+                        if missing and len(block):
+                            yield np.zeros((missing,) + block.shape[1:], dtype=np.int16)
+                            missing = 0
+                        if len(block):
+                            yield block
+                    missing += remaining or 0
+                process.wait()
+                if process.returncode != 0:
+                    stderr.seek(0)
+                    raise Exception(
+                        f"Failed transcoding (command: {' '.join(command)}):\n{stderr.read().decode('utf-8', errors='replace')}"
+                    )
+        finally:
+            for _, process, stderr, _ in decoders:
+                if process.poll() is None:
+                    process.kill()
+                    process.wait()
+                if process.stdout is not None:
+                    process.stdout.close()
+                stderr.close()
+
+    # Cleanup
+    if cleanup:
+        os.remove(input_file_path)
+
+
+def splitChannels(
+    input_file_path: str, output_file_paths: List[str], output_sr: int = 16000, cleanup: bool = True
+) -> List[str]:
+    """Decodes each channel of the input file into its own 16b PCM mono file, in a single pass.
+
+    Args:
+        input_file_path (str): Input audio or video file with len(output_file_paths) channels
+        output_file_paths (List[str]): Paths of the files of the channels (see getChannelPaths)
+        output_sr (int): Output sample rate
+        cleanup (bool): If True, the input file is removed once decoded
+
+    Returns:
+        List[str]: output_file_paths
+    """
+    def channel(blocks, k):
+        for block in blocks:
+            yield block[:, k]
+
+    blocks = decodeAudio(input_file_path, output_sr, output_channels=len(output_file_paths), cleanup=cleanup)
+    writers = [
+        iterWriteAudio(channel(channel_blocks, k), file_path, output_sr)
+        for k, (channel_blocks, file_path) in enumerate(
+            zip(itertools.tee(blocks, len(output_file_paths)), output_file_paths)
+        )
+    ]
+    for _ in zip(*writers):
+        pass
+    # The files are completed once their writer is exhausted
+    for writer in writers:
+        for _ in writer:
+            pass
+    return output_file_paths
+
+
 def getDuration(file_path):
+    """Returns the duration of a wave file in seconds, reading only its header.
+    FLAC files are probed, or decoded if ffprobe fails."""
+    if file_path.endswith(".flac"):
+        duration = probeDuration(file_path)
+        if duration is None:
+            output_sr = 16000
+            num_samples = sum(len(block) for block in decodeAudio(file_path, output_sr=output_sr, cleanup=False, workers=1))
+            duration = num_samples / output_sr
+        return duration
+    header = readWavHeader(file_path)
+    if header is not None:
+        return header.duration
     content = wavio.read(file_path)
     num_samples = content.data.shape[0]
     return num_samples / content.rate
 
 
+def readAudio(file_path: str) -> Tuple[np.ndarray, int]:
+    """Returns the signal of a wave file and its sample rate.
+    16b PCM files are memory-mapped so that slicing the signal never loads the whole file."""
+    header = readWavHeader(file_path)
+    if header is not None and header.format_tag == WAVE_FORMAT_PCM and header.sampwidth == 2:
+        return mapWav(file_path, header)
+    content = wavio.read(file_path)
+    return np.squeeze(content.data), content.rate
+
+
+def _iterBlocks(audio: np.ndarray, block_size: int) -> Iterator[np.ndarray]:
+    """Yields consecutive views of the signal.
+    Pages of memory-mapped signals are released once the following block is requested."""
+    for start in range(0, len(audio), block_size):
+        yield audio[start : start + block_size]
+        releaseMapped(audio, start)
+
+
+_audio_formats = [
+    "wav",
+    "flac",
+]
+
+def validate_audio_format(audio_format):
+    if audio_format is None or audio_format.lower() not in _audio_formats:
+        raise ValueError(f"Invalid value of {audio_format}, not in {_audio_formats}")
+    return audio_format.lower()
+
+
+def _flacCommand(file_path: str, sample_rate: int, compression_level: int = 5) -> List[str]:
+    """Returns the ffmpeg command encoding 16b PCM mono samples read on stdin into a FLAC file"""
+    return [
+        "ffmpeg", "-loglevel", "error", "-y",
+        "-f", "s16le", "-ar", str(sample_rate), "-ac", "1", "-i", "pipe:0",
+        "-c:a", "flac", "-compression_level", str(compression_level),
+        file_path,
+    ]
+
+
+def writeFlac(file_path: str, samples: np.ndarray, sample_rate: int, compression_level: int = 5):
+    """Writes 16b PCM mono samples into a FLAC file (see tests/bench_chunk_format.py for the compression levels)"""
+    command = _flacCommand(file_path, sample_rate, compression_level)
+    process = subprocess.run(
+        command, input=np.ascontiguousarray(samples, dtype="<i2").tobytes(), capture_output=True
+    )
+    if process.returncode:
+        raise Exception(f"Failed encoding {file_path}:\n{process.stderr.decode('utf-8')}")
+
+
+def iterWriteFlac(
+    blocks: Iterable[np.ndarray], file_path: str, sample_rate: int, compression_level: int = 5
+) -> Iterator[np.ndarray]:
+    """Writes 16b PCM mono blocks into a FLAC file while passing them through (see iterWriteWav)"""
+    with tempfile.TemporaryFile() as stderr:
+        process = subprocess.Popen(
+            _flacCommand(file_path, sample_rate, compression_level), stdin=subprocess.PIPE, stderr=stderr
+        )
+        try:
+            for block in blocks:
+                process.stdin.write(np.ascontiguousarray(block, dtype="<i2").data)
+                yield block
+            process.stdin.close()
+            if process.wait():
+                stderr.seek(0)
+                raise Exception(f"Failed encoding {file_path}:\n{stderr.read().decode('utf-8')}")
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+
+
+def writeAudio(file_path: str, samples: np.ndarray, sample_rate: int):
+    """Writes 16b PCM mono samples into a wave or FLAC file, depending on the extension of file_path"""
+    if file_path.endswith(".flac"):
+        writeFlac(file_path, samples, sample_rate)
+    else:
+        writeWav(file_path, samples, sample_rate)
+
+
+def iterWriteAudio(blocks: Iterable[np.ndarray], file_path: str, sample_rate: int) -> Iterator[np.ndarray]:
+    """Writes 16b PCM blocks into a wave or FLAC file while passing them through, depending on the extension of file_path"""
+    if file_path.endswith(".flac"):
+        return iterWriteFlac(blocks, file_path, sample_rate)
+    return iterWriteWav(blocks, file_path, sample_rate)
+
+
 _vad_methods = [
-    "WebRTC"
+    "WebRTC",
+    "Energy",
 ]
 
 def validate_vad_method(method):
@@ -67,144 +487,804 @@ def validate_vad_method(method):
         raise ValueError(f"Invalid value of {method}, not in {_vad_methods}")
     return _method
 
-def vadCutIndexes(
-    audio,
-    sample_rate,
+def _webrtcClassifier(sample_rate: int, mode: int = 1) -> Callable[[np.ndarray], np.ndarray]:
+    """Returns a function computing WebRTC VAD decisions of frames given as a (num_frames, frame_size) int16 array"""
+    vad = webrtcvad.Vad()
+    vad.set_mode(mode)
+
+    def classify(frames: np.ndarray) -> np.ndarray:
+        frames = np.ascontiguousarray(frames, dtype=np.int16)
+        frames.flags.writeable = False  # webrtcvad only accepts read-only buffers
+        buffer = memoryview(frames).cast("B")
+        frame_bytes = frames.shape[1] * 2
+        return np.fromiter(
+            (
+                vad.is_speech(buffer[start : start + frame_bytes], sample_rate)
+                for start in range(0, len(buffer), frame_bytes)
+            ),
+            dtype=bool,
+            count=len(frames),
+        )
+
+    # The decisions depend on the whole past of the signal
+    classify.history = None
+    return classify
+
+
+def _rollingMin(values: np.ndarray, window: int) -> np.ndarray:
+    """Minimum over the last `window` values (including the current one) for each position from window - 1.
+    Computed in linear time with prefix and suffix minimums over blocks of size window (van Herk/Gil-Werman)."""
+    num_outputs = len(values) - window + 1
+    if num_outputs <= 0:
+        return np.zeros(0, dtype=values.dtype)
+    padded = np.concatenate([values, np.full(-len(values) % window, np.inf)]).reshape(-1, window)
+    prefix = np.minimum.accumulate(padded, axis=1).ravel()
+    suffix = np.minimum.accumulate(padded[:, ::-1], axis=1)[:, ::-1].ravel()
+    return np.minimum(suffix[:num_outputs], prefix[window - 1 : window - 1 + num_outputs])
+
+
+def _energyClassifier(
+    sample_rate: int,
+    mode: int = 1,
+    noise_window: float = 10.0,
+    chunk_length: float = 0.03,
+    min_energy_db: float = 20.0,
+    max_flatness: float = 0.5,
+    band: Tuple[float, float] = (150.0, 4000.0),
+) -> Callable[[np.ndarray], np.ndarray]:
+    """Returns a function computing energy and spectral flatness VAD decisions of frames given as a (num_frames, frame_size) int16 array.
+
+    A frame is speech if its log energy exceeds the noise floor by a margin depending on the mode (aggressiveness) and
+    its spectrum in the speech band is not flat (i.e. not noise-like). The noise floor is adaptive: it is the minimum
+    log energy over the last noise_window seconds, so that decisions only depend on a bounded history.
+    """
+    margin_db = [3.0, 4.5, 6.0, 9.0][mode]
+    window = max(1, int(round(noise_window / chunk_length)))
+    history = np.zeros(0)
+
+    # The spectrum is computed after a crude decimation (sum of neighbour samples), as only the speech band matters
+    step = max(1, int(sample_rate // (2 * band[1])))
+
+    def classify(frames: np.ndarray) -> np.ndarray:
+        nonlocal history
+        frames = frames.astype(np.float32)
+        energy_db = 10 * np.log10(np.einsum("ij,ij->i", frames, frames) / max(1, frames.shape[1]) + 1.0)
+
+        # Adaptive noise floor, the first frames use the available history only
+        padded = np.concatenate([np.full(max(0, window - 1 - len(history)), np.inf), history, energy_db])
+        noise_floor = _rollingMin(padded, window)
+        history = padded[len(padded) - (window - 1) :] if window > 1 else np.zeros(0)
+
+        # Spectral flatness in the speech band, only for frames loud enough to be speech
+        is_speech = (energy_db > min_energy_db) & (energy_db - noise_floor > margin_db)
+        candidates = frames[is_speech]
+        size = frames.shape[1] // step
+        decimated = sum(candidates[:, offset :: step][:, :size] for offset in range(step))
+        spectrum = np.fft.rfft(decimated * np.hanning(size), axis=1)
+        frequencies = np.fft.rfftfreq(size, step / sample_rate)
+        spectrum = spectrum[:, (frequencies >= band[0]) & (frequencies <= band[1])]
+        power = spectrum.real**2 + spectrum.imag**2 + 1e-3
+        flatness = np.exp(np.mean(np.log(power), axis=1)) / np.mean(power, axis=1)
+        is_speech[is_speech] = flatness < max_flatness
+        return is_speech
+
+    # Number of past frames the decisions depend on
+    classify.history = window - 1
+    return classify
+
+
+def _vadClassifier(sample_rate: int, chunk_length: float = 0.03, mode: int = 1, method: str = "WebRTC"):
+    """Returns the frame classifier of the VAD method"""
+    method = validate_vad_method(method)
+    if method == "WebRTC":
+        return _webrtcClassifier(sample_rate, mode)
+    elif method == "Energy":
+        return _energyClassifier(sample_rate, mode, chunk_length=chunk_length)
+    raise NotImplementedError(f"VAD method with {method}")
+
+
+def iterVadDecisions(
+    audio: Union[np.ndarray, Iterable[np.ndarray]],
+    sample_rate: int,
     chunk_length: float = 0.03,
     mode: int = 1,
-    min_silence: float = 0.6,
-    max_segment_duration: float = None,
     method: str = "WebRTC",
-):
-    """Apply VAD on the signal and returns cut indexes located between speech segments"""
-    min_silence_frame = min_silence / chunk_length
-    max_speech_frame = max_segment_duration / chunk_length if max_segment_duration else None
+) -> Iterator[np.ndarray]:
+    """Apply VAD on consecutive frames of the signal and yields the speech decisions (boolean array) of each block.
 
-    method = validate_vad_method(method)
+    The signal can be given as an array or as an iterable of consecutive blocks (e.g. a decoding stream).
+    Each block is framed with a single reshape. A frame is processed once at least one sample follows it
+    (i.e. the last complete frame of the signal is ignored).
+    """
+    classify = _vadClassifier(sample_rate, chunk_length=chunk_length, mode=mode, method=method)
 
-    if method == "WebRTC":
-        vad = webrtcvad.Vad()
-        vad.set_mode(mode)
-    else:
-        raise NotImplementedError(f"VAD method with {method}")
+    chunk_size = int(sample_rate * chunk_length)
+    blocks = [audio] if isinstance(audio, np.ndarray) else audio
+    rest = np.zeros(0, dtype=np.int16)
+    for block in blocks:
+        data = np.concatenate([rest, block]) if len(rest) else block
+        num_frames = max(0, (len(data) - 1) // chunk_size)
+        if num_frames:
+            yield classify(data[: num_frames * chunk_size].reshape(num_frames, chunk_size))
+        rest = data[num_frames * chunk_size :]
+
+
+
+def _iterVadRange(
+    file_path: str,
+    start_frame: int,
+    stop_frame: int,
+    history: int,
+    chunk_length: float,
+    mode: int,
+    method: str,
+    block_duration: float,
+) -> Iterator[np.ndarray]:
+    """Yields the VAD decisions of the frames [start_frame, stop_frame[ of a wave file.
+    The decisions of the history preceding start_frame are computed first, so that they match the ones of a single pass."""
+    audio, sample_rate = readAudio(file_path)
+    chunk_size = int(sample_rate * chunk_length)
+    first_frame = max(0, start_frame - history)
+    # One more sample so that the last frame of the range is processed
+    audio = audio[first_frame * chunk_size : stop_frame * chunk_size + 1]
+    skip = start_frame - first_frame
+    for decisions in iterVadDecisions(
+        _iterBlocks(audio, int(block_duration * sample_rate)),
+        sample_rate,
+        chunk_length=chunk_length,
+        mode=mode,
+        method=method,
+    ):
+        if skip:
+            decisions, skip = decisions[skip:], max(0, skip - len(decisions))
+        if len(decisions):
+            yield decisions
 
+
+def _vadRangeWorker(connection, *args):
+    """Sends the bit-packed VAD decisions of a range (see _iterVadRange)"""
+    decisions = np.concatenate([np.zeros(0, dtype=bool)] + list(_iterVadRange(*args)))
+    connection.send((np.packbits(decisions), len(decisions)))
+    connection.close()
+
+
+def iterParallelVadDecisions(
+    file_path: str,
+    chunk_length: float = 0.03,
+    mode: int = 1,
+    method: str = "WebRTC",
+    workers: int = None,
+    min_range_duration: float = 300.0,
+    block_duration: float = 10.0,
+) -> Iterator[np.ndarray]:
+    """Apply VAD on a wave file with several processes and yields the speech decisions of consecutive blocks.
+
+    The file is split into one range of at least min_range_duration seconds per process. The first range is analysed
+    in the current process and streamed, the others are analysed by child processes that memory-map the file.
+    Each range is preceded by the history its decisions depend on, so that the decisions are identical to a single
+    pass (see iterVadDecisions), and cuts are then found sequentially across the ranges (see iterCutFrames).
+    Methods which decisions depend on the whole past of the signal (WebRTC) are run in a single process.
+    """
+    workers = VAD_WORKERS if workers is None else workers
+    audio, sample_rate = readAudio(file_path)
     chunk_size = int(sample_rate * chunk_length)
-    vad_res = []
+    num_frames = max(0, (len(audio) - 1) // chunk_size)
+    del audio
+    history = _vadClassifier(sample_rate, chunk_length=chunk_length, mode=mode, method=method).history
+    if history is not None:
+        workers = min(workers, int(num_frames * chunk_length // min_range_duration))
+    else:
+        workers = 1
+
+    bounds = np.linspace(0, num_frames, max(1, workers) + 1).round().astype(int).tolist()
+    ranges = [
+        (file_path, start, stop, history or 0, chunk_length, mode, method, block_duration)
+        for start, stop in zip(bounds[:-1], bounds[1:])
+    ]
+
+    processes = []
+    try:
+        for args in ranges[1:]:
+            receiver, sender = Pipe(duplex=False)
+            process = Process(target=_vadRangeWorker, args=(sender,) + args, daemon=True)
+            process.start()
+            sender.close()
+            processes.append((process, receiver))
+        yield from _iterVadRange(*ranges[0])
+        for process, receiver in processes:
+            try:
+                packed, count = receiver.recv()
+            except EOFError:
+                raise Exception(f"VAD process failed (exit code {process.exitcode})")
+            yield np.unpackbits(packed, count=count).astype(bool)
+    finally:
+        for process, receiver in processes:
+            process.terminate()
+            process.join()
+            receiver.close()
+
+
+def vadAnalysisKey(audio_hash: str, method: str = "WebRTC", mode: int = 1, chunk_length: float = 0.03) -> str:
+    """Returns the key identifying the VAD decisions of an audio file (see packDecisions)"""
+    return f"{audio_hash}-{validate_vad_method(method)}-{mode}-{chunk_length}"
+
+
+def packDecisions(decisions: Iterable[np.ndarray]) -> Tuple[bytes, int]:
+    """Returns the consecutive blocks of VAD decisions packed into bits, and the number of decisions"""
+    decisions = np.concatenate([np.zeros(0, dtype=bool)] + [np.asarray(d, dtype=bool) for d in decisions])
+    return np.packbits(decisions).tobytes(), len(decisions)
+
 
-    # Split in chunk size and process VAD
-    for start in range(0, len(audio) - chunk_size, chunk_size):
-        buffer = (audio[start : start + chunk_size]).astype(np.int16).tobytes()
-        vad_res.append(vad.is_speech(buffer, sample_rate))
+def unpackDecisions(packed: bytes, num_frames: int) -> np.ndarray:
+    """Returns the VAD decisions packed by packDecisions"""
+    return np.unpackbits(np.frombuffer(packed, dtype=np.uint8), count=num_frames).astype(bool)
+
+def iterCutFrames(
+    decisions: Iterable[np.ndarray],
+    chunk_length: float = 0.03,
+    min_silence: float = 0.6,
+    max_segment_duration: float = None,
+    ticks: bool = False,
+) -> Iterator[Optional[int]]:
+    """Determines cut frames in the middle of silence windows from consecutive blocks of VAD decisions.
+    Silence windows which length are < min_silence are ignored, unless the current segment exceeds max_segment_duration.
+
+    Decisions are run-length encoded: only speech starts are visited, together with the start of the silence preceding them.
+    Cut frames are yielded as soon as they are final, i.e. at the start of the speech segment following a silence.
+    If ticks is True, None is also yielded after each block, so that the caller can run between blocks.
+    """
+    min_silence_frame = min_silence / chunk_length
+    max_speech_frame = max_segment_duration / chunk_length if max_segment_duration else None
 
-    # Determines cut indexes in the middle of silence windows
-    # Ignore silence windows which length are < min_silence_frame
-    was_speech = vad_res[0]
+    was_speech = None
     sil_start_i = 0
     speech_start_i = 0
     previous_candidate = None
-    cut_indexes = []
+    frame_offset = 0
+    for block in decisions:
+        if not len(block):
+            continue
+        block = np.asarray(block, dtype=bool)
+        if was_speech is None:
+            was_speech = bool(block[0])
 
-    for i, is_speech in enumerate(vad_res):
-        if is_speech and not was_speech:  # Start of speech
-            candidate = int(np.mean([sil_start_i, i]))
-            is_silence_long = (i - sil_start_i > min_silence_frame)
+        # Run boundaries
+        changes = np.flatnonzero(block != np.concatenate([[was_speech], block[:-1]]))
+        is_speech_start = block[changes]
+        speech_starts = changes[is_speech_start] + frame_offset
+        # Silence start preceding each speech start (speech and silence starts alternate)
+        silence_starts = changes[~is_speech_start] + frame_offset
+        # (the silence started in a previous block comes first)
+        sil_starts = np.concatenate([[sil_start_i], silence_starts])[np.searchsorted(silence_starts, speech_starts)]
+        candidates = (sil_starts + speech_starts) // 2
+        silence_long = speech_starts - sil_starts > min_silence_frame
+
+        for i, candidate, is_silence_long in zip(speech_starts.tolist(), candidates.tolist(), silence_long.tolist()):
             is_speech_long = (max_speech_frame and (i - speech_start_i > max_speech_frame))
             if is_silence_long or is_speech_long:
                 if is_speech_long and previous_candidate:
                     candidate = previous_candidate
-                cut_indexes.append(candidate)
+                yield candidate
                 speech_start_i = candidate
                 previous_candidate = None
             else:
                 previous_candidate = candidate
-            was_speech = True
 
-        elif not is_speech and was_speech:  # Start of silence
-            was_speech = False
-            sil_start_i = i
+        if len(silence_starts):
+            sil_start_i = int(silence_starts[-1])
+        was_speech = bool(block[-1])
+        frame_offset += len(block)
+        if ticks:
+            yield None
+
+
+def iterVadCutIndexes(
+    audio: Union[np.ndarray, Iterable[np.ndarray]],
+    sample_rate,
+    chunk_length: float = 0.03,
+    mode: int = 1,
+    min_silence: float = 0.6,
+    max_segment_duration: float = None,
+    method: str = "WebRTC",
+    min_segment_duration: float = None,
+    around_min_segment_duration: bool = False,
+    decisions: Iterable[np.ndarray] = None,
+    ticks: bool = False,
+) -> Iterator[Optional[int]]:
+    """Apply VAD on the signal and yields cut indexes located between speech segments.
 
-    # Returns cut_indexes as list
-    return (np.array(cut_indexes) * chunk_size).astype(np.int32).tolist()
+    The signal can be given as an array or as an iterable of consecutive blocks (e.g. a decoding stream).
+    Cut indexes are yielded as soon as they are final, i.e. at the start of the speech segment following a silence,
+    so that the caller can process the preceding chunk while the rest of the signal is being analysed.
+    If min_segment_duration is set, cuts creating segments shorter than min_segment_duration are dropped.
+    If decisions are given (e.g. computed by iterParallelVadDecisions), the signal is not analysed.
+    If ticks is True, None is also yielded after each block of decisions (see iterCutFrames).
+    """
+    chunk_size = int(sample_rate * chunk_length)
+    if decisions is None:
+        decisions = iterVadDecisions(audio, sample_rate, chunk_length=chunk_length, mode=mode, method=method)
+    cut_indexes = (
+        cut * chunk_size if cut is not None else None
+        for cut in iterCutFrames(
+            decisions,
+            chunk_length=chunk_length,
+            min_silence=min_silence,
+            max_segment_duration=max_segment_duration,
+            ticks=ticks,
+        )
+    )
+    if min_segment_duration:
+        cut_indexes = _mergeShortSegments(cut_indexes, min_segment_duration * sample_rate, around_min_segment_duration)
+    yield from cut_indexes
 
 
-def splitFile(
-    file_path,
+def vadCutIndexes(
+    audio,
+    sample_rate,
+    chunk_length: float = 0.03,
+    mode: int = 1,
+    min_silence: float = 0.6,
+    max_segment_duration: float = None,
+    method: str = "WebRTC",
+    min_segment_duration: float = None,
+    around_min_segment_duration: bool = False,
+) -> List[int]:
+    """Apply VAD on the signal and returns cut indexes located between speech segments (see iterVadCutIndexes)"""
+    return list(
+        iterVadCutIndexes(
+            audio,
+            sample_rate,
+            chunk_length=chunk_length,
+            mode=mode,
+            min_silence=min_silence,
+            max_segment_duration=max_segment_duration,
+            method=method,
+            min_segment_duration=min_segment_duration,
+            around_min_segment_duration=around_min_segment_duration,
+        )
+    )
+
+
+def _mergeShortSegments(
+    cut_indexes: Iterable[int],
+    min_segment_samples: float,
+    around_min_segment_duration: bool = False,
+) -> Iterator[Optional[int]]:
+    """Filters out cut indexes that would create segments shorter than min_segment_samples (ticks, None, are kept)"""
+    start = 0
+    stop_candidate = None
+    for stop in cut_indexes:
+        if stop is None:
+            yield None
+        elif stop - start > min_segment_samples:
+            if around_min_segment_duration and stop_candidate is not None:
+                yield stop_candidate
+                start = stop_candidate
+                stop_candidate = None
+                if stop - start < min_segment_samples:
+                    continue
+            yield stop
+            start = stop
+            stop_candidate = None
+        else:
+            stop_candidate = stop
+
+
+def _recorded(decisions: Iterable[np.ndarray], recorded_decisions: List[np.ndarray]) -> Iterator[np.ndarray]:
+    """Yields the blocks of decisions, appending them to recorded_decisions"""
+    for block in decisions:
+        recorded_decisions.append(block)
+        yield block
+
+
+class _SampleBuffer:
+    """Keeps the received samples of a signal until they are written into subfiles"""
+
+    def __init__(self):
+        self._blocks = []
+        self.start = 0  # Index of the first kept sample
+        self.end = 0  # Number of received samples
+
+    def append(self, block: np.ndarray):
+        self._blocks.append(block)
+        self.end += len(block)
+
+    def pop(self, stop: int) -> np.ndarray:
+        """Returns the samples from start to stop and release them"""
+        samples = []
+        while self.start < stop:
+            block = self._blocks[0]
+            n = min(len(block), stop - self.start)
+            samples.append(block[:n])
+            if n == len(block):
+                self._blocks.pop(0)
+            else:
+                self._blocks[0] = block[n:]
+            self.start += n
+        if len(samples) == 1:
+            return samples[0]
+        return np.concatenate(samples) if samples else np.zeros(0, dtype=np.int16)
+
+
+class _ChunkWriter:
+    """Writes chunks into wave or FLAC files with a pool of threads, and gives back the written chunks in order.
+    The time spent writing the chunks and their size are logged when closed, to weigh encoding against I/O."""
+
+    def __init__(
+        self, sample_rate: int, workers: int = None, scratch: ScratchArea = None, audio_format: str = "wav"
+    ):
+        self.sample_rate = sample_rate
+        self.scratch = scratch
+        self.audio_format = audio_format
+        self._executor = ThreadPoolExecutor(WRITING_WORKERS if workers is None else workers)
+        self._pending = deque()
+        self.num_chunks = 0
+        self.writing_time = 0.0
+        self.written_bytes = 0
+        self.wave_bytes = 0
+
+    def _write(self, file_path: str, samples: np.ndarray) -> Tuple[float, int]:
+        start = time.perf_counter()
+        writeAudio(file_path, samples, self.sample_rate)
+        return time.perf_counter() - start, os.path.getsize(file_path)
+
+    def write(self, basename: str, samples: np.ndarray, start: int) -> str:
+        """Schedules the writing of the chunk starting at sample start and returns its path ({basename}.{audio_format}).
+        If a scratch area is set, the chunk is written there when it fits (see ScratchArea.place)."""
+        file_path = f"{basename}.{self.audio_format}"
+        if self.scratch is not None:
+            file_path = self.scratch.place(file_path, 44 + samples.nbytes)
+        future = self._executor.submit(self._write, file_path, samples)
+        self._pending.append((future, 44 + samples.nbytes, (file_path, start / self.sample_rate, len(samples) / self.sample_rate)))
+        return file_path
+
+    def landed(self, wait: bool = False) -> Iterator[Tuple[str, float, float]]:
+        """Yields the (file_path, offset, duration) of the chunks which file is written, until a chunk is being written.
+        If wait is True, waits for all the chunks."""
+        while self._pending and (wait or self._pending[0][0].done()):
+            future, wave_bytes, chunk = self._pending.popleft()
+            writing_time, written_bytes = future.result()
+            self.num_chunks += 1
+            self.writing_time += writing_time
+            self.written_bytes += written_bytes
+            self.wave_bytes += wave_bytes
+            yield chunk
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        if self.num_chunks:
+            logging.info(
+                f"Wrote {self.num_chunks} {self.audio_format} chunks: {self.written_bytes / 1e6:.1f} MB "
+                f"({self.wave_bytes / 1e6:.1f} MB as wave) in {self.writing_time:.2f} s"
+            )
+
+
+def iterSplitAudio(
+    blocks: Iterable[np.ndarray],
+    sample_rate: int,
+    basename: str,
+    file_path: str = None,
     method: str = "WebRTC",
     min_length: float = 10,
     min_segment_duration: float = None,
     max_segment_duration: float = None,
     min_silence: float = 0.6,
     around_min_segment_duration: bool = False,
-    ) -> Tuple[List[Tuple[str, float, float]], float]:
+    decisions: Iterable[np.ndarray] = None,
+    recorded_decisions: List[np.ndarray] = None,
+    min_speech_ratio: float = 0.0,
+    trim_non_speech: bool = False,
+    trim_margin: float = 0.3,
+    window_duration: float = None,
+    window_overlap: float = 2.0,
+    scratch: ScratchArea = None,
+    audio_format: str = "wav",
+) -> Iterator[Tuple[str, float, float]]:
     """
-    Split a file into multiple subfiles using vad
-    
+    Split a signal, given as consecutive blocks, into multiple subfiles using vad.
+    Subfiles are written and yielded one by one as soon as their boundaries are known.
+    Chunks without speech can be skipped, and their leading and trailing non-speech trimmed: offsets and durations
+    of the yielded subfiles are those of the kept spans, so that they can be transcribed independently.
+    Chunks longer than window_duration (e.g. speech without pauses) are split into fixed-length overlapping windows,
+    which transcriptions are stitched when merged (see TranscriptionResult).
+
     Args:
-        file_path (str): Audiofile
+        blocks (Iterable[np.ndarray]): Consecutive blocks of the 16b PCM mono signal
+        sample_rate (int): Sample rate of the signal
+        basename (str): Subfiles are written at {basename}_{i}.{audio_format}
+        file_path (str): If set, wave file containing the whole signal once the blocks are exhausted. It is used when the signal is not split.
         method (str): VAD method [WebRTC]
         min_length (float): Minimum length of the file in seconds to apply the VAD
         min_segment_duration (float): Minimum duration of a segment in seconds
         min_silence (float): Minimum duration of silence in seconds
         around_min_segment_duration (bool): If True, segments can be kept just before they reach min_segment_duration
-    """
+        decisions (Iterable[np.ndarray]): If set, precomputed VAD decisions of the signal (see iterVadCutIndexes)
+        recorded_decisions (List[np.ndarray]): If set, the VAD decisions are appended to this list (e.g. to be cached)
+        min_speech_ratio (float): Chunks which ratio of speech frames is lower are skipped
+        trim_non_speech (bool): If True, leading and trailing non-speech of the chunks are trimmed and chunks without speech are skipped
+        trim_margin (float): Duration of non-speech kept around speech when trimming, in seconds
+        window_duration (float): If set, maximum duration of the subfiles in seconds, longer chunks are split into overlapping windows
+        window_overlap (float): Duration of the overlap between consecutive windows in seconds
+        scratch (ScratchArea): If set, scratch area where subfiles are written when they fit
+        audio_format (str): Container of the subfiles, "wav" or "flac"
 
+    Yields:
+        Tuple[str, float, float]: (subfile_path, offset, duration)
+    """
     if min_segment_duration and max_segment_duration:
         if min_segment_duration > max_segment_duration:
             raise ValueError(f"min_segment_duration ({min_segment_duration}) > max_segment_duration ({max_segment_duration})")
 
-    # TODO: factorize with splitUsingTimestamps
+    buffer = _SampleBuffer()
 
-    content = wavio.read(file_path)
-    sr = content.rate
-    audio = np.squeeze(content.data)
+    def received(blocks):
+        for block in blocks:
+            buffer.append(block)
+            yield block
 
-    # Do not split file under min_length
-    if len(audio) / sr < min_length:
-        return _with_stat_durations([(file_path, 0.0, len(audio) / sr)])
+    blocks = received(blocks)
 
-    # Get cut indexes based on vad
-    cut_indexes = vadCutIndexes(audio, sr, method=method, min_silence=min_silence, max_segment_duration=max_segment_duration)
+    precomputed = decisions is not None
+    if not precomputed:
+        decisions = iterVadDecisions(blocks, sample_rate, method=method)
+    if recorded_decisions is not None:
+        decisions = _recorded(decisions, recorded_decisions)
 
-    # TODO: use "min_segment_duration" in vadCutIndexes()
-    if min_segment_duration:
-        min_segment_samples = min_segment_duration * sr
-        new_cut_indexes = []
-        start = 0
-        stop_candidate = None
-        for stop in cut_indexes:
-            if stop - start > min_segment_samples:
-                if around_min_segment_duration and stop_candidate is not None:
-                    new_cut_indexes.append(stop_candidate)
-                    start = stop_candidate
-                    stop_candidate = None
-                    if stop - start < min_segment_samples:
-                        continue
-                new_cut_indexes.append(stop)
-                start = stop
-                stop_candidate = None
-            else:
-                stop_candidate = stop
-        cut_indexes = new_cut_indexes
+    # Decisions of the frames of the chunks not written yet
+    chunk_size = int(sample_rate * 0.03)
+    speech = _SampleBuffer()
+    filtered = bool(min_speech_ratio) or trim_non_speech
+    if filtered:
+        decisions = _recorded(decisions, speech)
 
-    # If no cut detected
-    if len(cut_indexes) == 0:
-        return _with_stat_durations([(file_path, 0.0, len(audio) / sr)])
-    basename = os.path.splitext(file_path)[0]
+    def fill(stop):
+        # With precomputed decisions, blocks are only read when their samples are needed
+        if precomputed:
+            while buffer.end < stop and next(blocks, None) is not None:
+                yield from writer.landed()
+
+    # Get cut indexes based on vad
+    cut_indexes = iterVadCutIndexes(
+        None,
+        sample_rate,
+        method=method,
+        min_silence=min_silence,
+        max_segment_duration=max_segment_duration,
+        min_segment_duration=min_segment_duration,
+        around_min_segment_duration=around_min_segment_duration,
+        decisions=decisions,
+        ticks=True,
+    )
 
     # Create subfiles
-    subfiles = []
+    # Do not split file under min_length: cuts are held until the signal is known to be long enough
+    min_length_samples = min_length * sample_rate
+    pending = []
     i = 0
-    for start, stop in zip([0] + cut_indexes, cut_indexes + [len(audio)]):
-        subfile_path = f"{basename}_{i}.wav"
-        offset = start / sr
-        wavio.write(subfile_path, audio[start:stop], sr)
-        duration = (stop - start) / sr
-        subfiles.append((subfile_path, offset, duration))
-        i += 1
+    cut = False
+    window_samples = int(window_duration * sample_rate) if window_duration else None
+    overlap_samples = int(window_overlap * sample_rate)
+    writer = _ChunkWriter(sample_rate, scratch=scratch, audio_format=audio_format)
 
-    return _with_stat_durations(subfiles)
+    def write(stops):
+        nonlocal i
+        for stop in stops:
+            start = buffer.start
+            samples = buffer.pop(stop)
+            if filtered:
+                span = _speechSpan(
+                    speech.pop(min(stop // chunk_size, speech.end)),
+                    len(samples),
+                    chunk_size,
+                    min_speech_ratio=min_speech_ratio,
+                    trim_margin=trim_margin * sample_rate if trim_non_speech else None,
+                )
+                if span is None:
+                    continue
+                samples = samples[span[0] : span[1]]
+                start += span[0]
+            for window_start, window_stop in _windows(len(samples), window_samples, overlap_samples):
+                writer.write(f"{basename}_{i}", samples[window_start:window_stop], start + window_start)
+                i += 1
 
-def _with_stat_durations(subfiles):
+    # Subfiles are yielded once written, while the next ones are being analysed: the written ones are checked
+    # between blocks of the signal (or of decisions)
+    try:
+        for stop in cut_indexes:
+            if stop is None:
+                # Cuts held until the signal is long enough
+                if pending and buffer.end >= min_length_samples:
+                    write(pending)
+                    pending = []
+                yield from writer.landed()
+                continue
+            cut = True
+            pending.append(stop)
+            yield from fill(max(stop, min_length_samples))
+            if buffer.end < min_length_samples:
+                continue
+            write(pending)
+            pending = []
+            yield from writer.landed()
+
+        yield from fill(float("inf"))
+        total = buffer.end
+        if total >= min_length_samples and cut:
+            pending.append(total)
+        elif file_path is not None and not filtered and not (window_samples and total > window_samples):
+            # If no cut detected, and the whole signal is kept in one chunk
+            yield (file_path, 0.0, total / sample_rate)
+            return
+        else:
+            pending = [total]
+        write(pending)
+        yield from writer.landed(wait=True)
+    finally:
+        writer.close()
+
+
+def _windows(num_samples: int, window_samples: int = None, overlap_samples: int = 0) -> List[Tuple[int, int]]:
+    """Returns the spans [start, stop[ of equal windows of at most window_samples samples covering num_samples samples,
+    consecutive windows overlapping by overlap_samples samples"""
+    if not window_samples or num_samples <= window_samples:
+        return [(0, num_samples)]
+    overlap_samples = min(overlap_samples, window_samples // 2)
+    num_windows = -(-(num_samples - overlap_samples) // (window_samples - overlap_samples))
+    step = -(-(num_samples - overlap_samples) // num_windows)
+    return [(k * step, min(num_samples, (k + 1) * step + overlap_samples)) for k in range(num_windows)]
+
+
+def _speechSpan(
+    decisions: np.ndarray,
+    num_samples: int,
+    chunk_size: int,
+    min_speech_ratio: float = 0.0,
+    trim_margin: int = None,
+) -> Optional[Tuple[int, int]]:
+    """Returns the span [start, stop[ of a chunk of num_samples samples to transcribe, given the VAD decisions of its frames.
+    Returns None if the chunk has no speech or a ratio of speech frames lower than min_speech_ratio.
+    If trim_margin is set, leading and trailing non-speech are trimmed, keeping trim_margin samples around speech."""
+    speech_frames = np.flatnonzero(decisions)
+    num_frames = -(-num_samples // chunk_size)
+    if not len(speech_frames) or len(speech_frames) < min_speech_ratio * num_frames:
+        return None
+    if trim_margin is None:
+        return 0, num_samples
+    start = max(0, int(speech_frames[0] * chunk_size - trim_margin))
+    stop = min(num_samples, int((speech_frames[-1] + 1) * chunk_size + trim_margin))
+    return start, stop
+
+
+def iterSplitFile(
+    file_path,
+    method: str = "WebRTC",
+    min_length: float = 10,
+    min_segment_duration: float = None,
+    max_segment_duration: float = None,
+    min_silence: float = 0.6,
+    around_min_segment_duration: bool = False,
+    block_duration: float = 10.0,
+    workers: int = None,
+    decisions: Iterable[np.ndarray] = None,
+    recorded_decisions: List[np.ndarray] = None,
+    min_speech_ratio: float = 0.0,
+    trim_non_speech: bool = False,
+    window_duration: float = None,
+    window_overlap: float = 2.0,
+    scratch: ScratchArea = None,
+    audio_format: str = "wav",
+    ) -> Iterator[Tuple[str, float, float]]:
+    """
+    Split a wave file into multiple subfiles using vad (see iterSplitAudio).
+    Subfiles are written and yielded one by one as soon as their boundaries are known.
+    The file is memory-mapped and processed by blocks of block_duration seconds.
+    If workers > 1 (default VAD_WORKERS), the VAD runs in several processes (see iterParallelVadDecisions).
+
+    Yields:
+        Tuple[str, float, float]: (subfile_path, offset, duration)
+    """
+    # TODO: factorize with splitUsingTimestamps
+
+    workers = VAD_WORKERS if workers is None else workers
+    if decisions is None and workers > 1:
+        decisions = iterParallelVadDecisions(file_path, method=method, workers=workers, block_duration=block_duration)
+    audio, sr = readAudio(file_path)
+    yield from iterSplitAudio(
+        _iterBlocks(audio, int(block_duration * sr)),
+        sr,
+        os.path.splitext(file_path)[0],
+        file_path=file_path,
+        method=method,
+        min_length=min_length,
+        min_segment_duration=min_segment_duration,
+        max_segment_duration=max_segment_duration,
+        min_silence=min_silence,
+        around_min_segment_duration=around_min_segment_duration,
+        decisions=decisions,
+        recorded_decisions=recorded_decisions,
+        min_speech_ratio=min_speech_ratio,
+        trim_non_speech=trim_non_speech,
+        window_duration=window_duration,
+        window_overlap=window_overlap,
+        scratch=scratch,
+        audio_format=audio_format,
+    )
+
+
+def iterTranscodeAndSplitFile(
+    input_file_path: str,
+    write_file: bool = False,
+    output_sr: int = 16000,
+    cleanup: bool = True,
+    output_file_path: str = None,
+    **kwargs,
+) -> Iterator[Tuple[str, float, float]]:
+    """
+    Decode the input file and split it using vad in a single pass (see iterSplitAudio).
+    The decoded signal is streamed from ffmpeg (or read in-process for simple wave files) to the VAD,
+    only subfiles are written on disk.
+
+    Args:
+        input_file_path (str): Input audio or video file
+        write_file (bool): If True, the whole transcoded signal is also written at output_file_path (in FLAC if it ends with .flac)
+        output_sr (int): Sample rate of the subfiles
+        cleanup (bool): If True, the input file is removed once decoded
+        output_file_path (str): Path of the transcoded file (default: getTranscodedPath(input_file_path))
+
+    Yields:
+        Tuple[str, float, float]: (subfile_path, offset, duration)
+    """
+    # Already conformant wave files are read in place
+    if getTranscodedPath(input_file_path, output_sr) == input_file_path:
+        yield from iterSplitFile(input_file_path, **kwargs)
+        return
+    if output_file_path is None:
+        output_file_path = getTranscodedPath(input_file_path, output_sr)
+    blocks = decodeAudio(input_file_path, output_sr=output_sr, output_channels=1, cleanup=cleanup)
+    if write_file:
+        blocks = iterWriteAudio(blocks, output_file_path, output_sr)
+    yield from iterSplitAudio(
+        blocks,
+        output_sr,
+        os.path.splitext(output_file_path)[0],
+        file_path=output_file_path if write_file else None,
+        **kwargs,
+    )
+
+
+def splitFile(
+    file_path,
+    method: str = "WebRTC",
+    min_length: float = 10,
+    min_segment_duration: float = None,
+    max_segment_duration: float = None,
+    min_silence: float = 0.6,
+    around_min_segment_duration: bool = False,
+    workers: int = None,
+    ) -> Tuple[List[Tuple[str, float, float]], Dict[str, float]]:
+    """
+    Split a file into multiple subfiles using vad (see iterSplitFile)
+
+    Returns:
+        Tuple[List[Tuple[str, float, float]], Dict[str, float]]: ([(subfile_name, offset, duration),], duration_statistics)
+    """
+    return _with_stat_durations(
+        list(
+            iterSplitFile(
+                file_path,
+                method=method,
+                min_length=min_length,
+                min_segment_duration=min_segment_duration,
+                max_segment_duration=max_segment_duration,
+                min_silence=min_silence,
+                around_min_segment_duration=around_min_segment_duration,
+                workers=workers,
+            )
+        )
+    )
+
+def getStatDurations(subfiles: List[Tuple[str, float, float]]) -> Dict[str, float]:
+    """Returns total, mean, min and max durations of the subfiles"""
     total_duration = 0.0
     min_duration = float("inf")
     max_duration = 0.0
@@ -212,41 +1292,51 @@ def _with_stat_durations(subfiles):
         total_duration += duration
         min_duration = min(min_duration, duration)
         max_duration = max(max_duration, duration)
-    return subfiles, {
+    if not subfiles:
+        min_duration = 0.0
+    return {
         "total": total_duration,
-        "mean": total_duration / len(subfiles),
+        "mean": total_duration / len(subfiles) if subfiles else 0.0,
         "min": min_duration,
         "max": max_duration,
     }
 
+def _with_stat_durations(subfiles):
+    return subfiles, getStatDurations(subfiles)
+
 def splitUsingTimestamps(
-    file_path: str, timestamps: List[Dict]
+    file_path: str, timestamps: List[Dict], scratch: ScratchArea = None, audio_format: str = "wav"
 ) -> Tuple[List[Tuple[str, float, float]], float]:
     """Split using a list of timestamps
 
     Args:
         file_path (str): Audiofile
         timestamps (List[Dict]): A list of timesample {"start": float, "end": float, "id": any}
+        scratch (ScratchArea): If set, scratch area where subfiles are written when they fit
+        audio_format (str): Container of the subfiles, "wav" or "flac"
 
     Returns:
-        Tuple[List[Tuple[str, float, float]], float]: ([(subfile_name, start, stop),], total_duration)
+        Tuple[List[Tuple[str, float, float]], float]: ([(subfile_name, offset, duration),], total_duration)
     """
     timestamps = sorted(timestamps, key=lambda x: x["start"])
-    content = wavio.read(file_path)
-    sr = content.rate
-    audio = np.squeeze(content.data)
+    audio, sr = readAudio(file_path)
     basename = os.path.splitext(file_path)[0]
     # Create subfiles
     subfiles = []
     total_duration = 0.0
-    for i, seg in enumerate(timestamps):
-        subfile_path = f"{basename}_{i}.wav"
-        offset = seg["start"]
-        start = int(seg["start"] * sr)
-        stop = int(seg["end"] * sr)
-        wavio.write(subfile_path, audio[start:stop], sr)
-        duration = (seg["end"] - seg["start"]) / sr
-        subfiles.append((subfile_path, offset, duration))
-        total_duration += duration
+    writer = _ChunkWriter(sr, scratch=scratch, audio_format=audio_format)
+    try:
+        for i, seg in enumerate(timestamps):
+            offset = seg["start"]
+            start = int(seg["start"] * sr)
+            stop = int(seg["end"] * sr)
+            subfile_path = writer.write(f"{basename}_{i}", audio[start:stop], start)
+            duration = seg["end"] - seg["start"]
+            subfiles.append((subfile_path, offset, duration))
+            total_duration += duration
+        for _ in writer.landed(wait=True):
+            pass
+    finally:
+        writer.close()
 
     return subfiles, total_duration
@@ -0,0 +1,66 @@
+"""The scratch module places the temporary files of a task (transcoded audio, chunks) in a fast scratch folder."""
+import logging
+import os
+import shutil
+from typing import Dict, List, Optional
+
+# Folder for temporary files, e.g. a tmpfs shared by the workers of a node (disabled if not set)
+SCRATCH_FOLDER = os.environ.get("SCRATCH_FOLDER") or None
+# Maximum size of the files of a task in the scratch folder in MB (0: limited by the free space)
+SCRATCH_SIZE = float(os.environ.get("SCRATCH_SIZE", 0))
+
+
+class ScratchArea:
+    """ScratchArea decides where the temporary files of a task are written and keeps track of them.
+
+    A file is written in the scratch folder when it fits in the size budget of the area, otherwise at its original place
+    (i.e. on the shared volume). The budget applies to the files placed by the area (i.e. per task): their sizes are
+    counted when they are placed, and released when they are removed by remove() or cleanup().
+    Tracked files are removed by cleanup(), e.g. when the task fails.
+    """
+
+    def __init__(self, folder: str = None, size: float = None):
+        self.folder = SCRATCH_FOLDER if folder is None else folder
+        self.budget = (SCRATCH_SIZE if size is None else size) * 1e6
+        self.files: List[str] = []
+        # Sizes of the files placed in the scratch folder, and their total in bytes
+        self.placed: Dict[str, int] = {}
+        self.usage = 0
+        if self.folder is not None:
+            os.makedirs(self.folder, exist_ok=True)
+
+    def fits(self, size: Optional[int]) -> bool:
+        """Returns True if a file of size bytes can be written in the scratch folder"""
+        if self.folder is None or size is None:
+            return False
+        if shutil.disk_usage(self.folder).free < size:
+            return False
+        return not self.budget or self.usage + size <= self.budget
+
+    def place(self, file_path: str, size: Optional[int]) -> str:
+        """Returns where the file of size bytes (None if unknown) meant to be at file_path is to be written, and tracks it"""
+        if self.fits(size):
+            file_path = os.path.join(self.folder, os.path.basename(file_path))
+            self.usage += size - self.placed.get(file_path, 0)
+            self.placed[file_path] = size
+        self.files.append(file_path)
+        return file_path
+
+    def track(self, file_path: str):
+        """Tracks a temporary file written outside the scratch area"""
+        self.files.append(file_path)
+
+    def remove(self, file_path: str):
+        """Removes a file if it still exists, releasing its size if it was placed in the scratch folder"""
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        self.usage -= self.placed.pop(file_path, 0)
+
+    def cleanup(self):
+        """Removes the tracked files that still exist"""
+        for file_path in self.files:
+            try:
+                self.remove(file_path)
+            except Exception as e:
+                logging.warning("Failed to remove temporary file {}: {}".format(file_path, e))
+        self.files = []
@@ -2,9 +2,13 @@
 
 import logging
 import os
+from typing import List
 
 from transcriptionservice.broker.discovery import (SERVICE_TYPES,
+                                                   STT_SERVICE_TYPE,
                                                    list_available_services)
+from transcriptionservice.transcription.utils.audio import (CHUNK_FORMAT,
+                                                             validate_audio_format)
 
 
 class ResolveException(Exception):
@@ -95,7 +99,9 @@ class ServiceResolver:
     """The ServiceResolver class is used to fetch available services and resolve service configuration from transcrition requests."""
 
     def __init__(self):
-        self.subservices_list = list_available_services(ensure_alive=True)
+        self.subservices_list = list_available_services(
+            ensure_alive=True, service_types=SERVICE_TYPES + [STT_SERVICE_TYPE]
+        )
         self.service_policy = ServicePolicy.from_env()
         self.default_services = {}
         if self.service_policy == ServicePolicy.DEFAULT:
@@ -145,6 +151,31 @@ class ServiceResolver:
 
         task_config.setService(resolving_service.service_name, resolving_service.queue_name)
 
+    def resolve_audio_format(self, queue_names: List[str], audio_format: str = CHUNK_FORMAT) -> str:
+        """Negotiate the container of the audio files read by the services consuming the given queues.
+
+        Args:
+            queue_names (List[str]): Queues of the services reading the files
+            audio_format (str, optional): Preferred container. Defaults to CHUNK_FORMAT.
+
+        Returns:
+            str: audio_format if all the services registered on the queues declare they read it, "wav" otherwise.
+        """
+        audio_format = validate_audio_format(audio_format)
+        if audio_format == "wav":
+            return audio_format
+        for queue_name in queue_names:
+            services = [
+                service
+                for services in self.subservices_list.values()
+                for service in services.values()
+                if service.queue_name == queue_name
+            ]
+            if not services or any(audio_format not in service.audio_formats for service in services):
+                logging.debug(f"Service on {queue_name} does not declare it reads {audio_format} files")
+                return "wav"
+        return audio_format
+
     def _resolve_any(self, service_type: str) -> "Service":
         """Pick any of compatible running intance of the service_type
 
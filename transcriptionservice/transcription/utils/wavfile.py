@@ -0,0 +1,314 @@
+""" The wavfile module reads and writes wave files without external tools: RIFF header parsing, streamed writing and in-process conversion of simple PCM inputs."""
+import math
+import mmap
+import struct
+from dataclasses import dataclass
+from typing import Iterable, Iterator, Optional, Tuple
+
+import numpy as np
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_ALAW = 0x0006
+WAVE_FORMAT_MULAW = 0x0007
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+@dataclass
+class WavHeader:
+    """Contains the RIFF header informations of a wave file"""
+
+    format_tag: int
+    num_channels: int
+    sample_rate: int
+    sampwidth: int
+    data_offset: int
+    num_frames: int
+
+    @property
+    def duration(self) -> float:
+        return self.num_frames / self.sample_rate
+
+    def isConformant(self, sample_rate: int = 16000, num_channels: int = 1) -> bool:
+        """Returns True if the file is already 16b PCM with the given sample rate and channels"""
+        return (
+            self.format_tag == WAVE_FORMAT_PCM
+            and self.sampwidth == 2
+            and self.sample_rate == sample_rate
+            and self.num_channels == num_channels
+        )
+
+    @property
+    def isConvertible(self) -> bool:
+        """Returns True if the file can be converted in-process (see iterReadWav)"""
+        return (self.format_tag, self.sampwidth) in [
+            (WAVE_FORMAT_PCM, 1),
+            (WAVE_FORMAT_PCM, 2),
+            (WAVE_FORMAT_ALAW, 1),
+            (WAVE_FORMAT_MULAW, 1),
+        ]
+
+
+def readWavHeader(file_path: str) -> Optional[WavHeader]:
+    """Parse the RIFF header of a wave file.
+
+    Returns:
+        Optional[WavHeader]: The header informations or None if the file is not a supported wave file
+    """
+    with open(file_path, "rb") as f:
+        riff = f.read(12)
+        if len(riff) < 12 or riff[:4] != b"RIFF" or riff[8:12] != b"WAVE":
+            return None
+        fmt = None
+        while True:
+            chunk_header = f.read(8)
+            if len(chunk_header) < 8:
+                return None
+            chunk_id, chunk_size = struct.unpack("<4sI", chunk_header)
+            if chunk_id == b"fmt ":
+                data = f.read(chunk_size)
+                if len(data) < 16:
+                    return None
+                format_tag, num_channels, sample_rate, _, _, bits = struct.unpack("<HHIIHH", data[:16])
+                if format_tag == WAVE_FORMAT_EXTENSIBLE and len(data) >= 26:
+                    # Sub format GUID starts with the actual format tag
+                    format_tag = struct.unpack("<H", data[24:26])[0]
+                fmt = (format_tag, num_channels, sample_rate, (bits + 7) // 8)
+            elif chunk_id == b"data":
+                if fmt is None or not fmt[1] or not fmt[2] or not fmt[3]:
+                    return None
+                data_offset = f.tell()
+                available = f.seek(0, 2) - data_offset
+                # Streamed files may have an unset data size
+                if chunk_size == 0 or chunk_size > available:
+                    chunk_size = available
+                format_tag, num_channels, sample_rate, sampwidth = fmt
+                return WavHeader(
+                    format_tag,
+                    num_channels,
+                    sample_rate,
+                    sampwidth,
+                    data_offset,
+                    chunk_size // (num_channels * sampwidth),
+                )
+            if chunk_id != b"fmt ":
+                f.seek(chunk_size, 1)
+            # Chunks are word aligned
+            if chunk_size % 2:
+                f.seek(1, 1)
+
+
+def mapWav(file_path: str, header: WavHeader = None) -> Tuple[np.ndarray, int]:
+    """Maps the samples of a 16b PCM wave file in memory without reading them.
+
+    Returns:
+        Tuple[np.ndarray, int]: (samples, sample_rate). Samples are a read-only np.memmap of shape (frames,) for mono
+        and (frames, channels) otherwise.
+    """
+    if header is None:
+        header = readWavHeader(file_path)
+    if header is None or header.format_tag != WAVE_FORMAT_PCM or header.sampwidth != 2:
+        raise ValueError(f"Not a 16b PCM wave file: {file_path}")
+    shape = (header.num_frames,) if header.num_channels == 1 else (header.num_frames, header.num_channels)
+    if not header.num_frames:
+        return np.zeros(shape, dtype=np.int16), header.sample_rate
+    samples = np.memmap(file_path, dtype="<i2", mode="r", offset=header.data_offset, shape=shape)
+    return samples, header.sample_rate
+
+
+def releaseMapped(samples: np.ndarray, stop: int):
+    """Releases the memory pages of the frames [0, stop) of a memory-mapped signal (see mapWav).
+    Released pages are read again from the file if accessed later, so that the resident memory
+    does not grow with the length of the file when it is processed sequentially."""
+    mapping = getattr(samples, "_mmap", None)
+    if mapping is None or not hasattr(mapping, "madvise") or not hasattr(mmap, "MADV_DONTNEED"):
+        return
+    frame_bytes = samples.itemsize * (1 if samples.ndim == 1 else samples.shape[1])
+    # Samples start at offset % ALLOCATIONGRANULARITY in the mapping
+    length = samples.offset % mmap.ALLOCATIONGRANULARITY + stop * frame_bytes
+    length -= length % mmap.PAGESIZE
+    if length > 0:
+        mapping.madvise(mmap.MADV_DONTNEED, 0, length)
+
+
+def wavHeaderBytes(num_frames: int, sample_rate: int, num_channels: int = 1, sampwidth: int = 2) -> bytes:
+    """Returns the 44 bytes RIFF header of a PCM wave file"""
+    data_size = num_frames * num_channels * sampwidth
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF",
+        36 + data_size,
+        b"WAVE",
+        b"fmt ",
+        16,
+        WAVE_FORMAT_PCM,
+        num_channels,
+        sample_rate,
+        sample_rate * num_channels * sampwidth,
+        num_channels * sampwidth,
+        sampwidth * 8,
+        b"data",
+        data_size,
+    )
+
+
+def writeWav(file_path: str, samples: np.ndarray, sample_rate: int):
+    """Writes a 16b PCM signal into a wave file.
+    The header is computed from the shape of the signal and the samples are written from their buffer."""
+    samples = np.ascontiguousarray(samples, dtype="<i2")
+    num_channels = 1 if samples.ndim == 1 else samples.shape[1]
+    with open(file_path, "wb") as f:
+        f.write(wavHeaderBytes(len(samples), sample_rate, num_channels))
+        f.write(memoryview(samples).cast("B"))
+
+
+def iterWriteWav(blocks: Iterable[np.ndarray], file_path: str, sample_rate: int) -> Iterator[np.ndarray]:
+    """Writes 16b PCM blocks into a wave file while passing them through.
+    The header is completed when the blocks are exhausted."""
+    num_frames = 0
+    num_channels = 1
+    with open(file_path, "wb") as f:
+        f.write(wavHeaderBytes(0, sample_rate))
+        for block in blocks:
+            num_channels = 1 if block.ndim == 1 else block.shape[1]
+            f.write(np.ascontiguousarray(block, dtype="<i2").data)
+            num_frames += len(block)
+            yield block
+        f.seek(0)
+        f.write(wavHeaderBytes(num_frames, sample_rate, num_channels))
+
+
+def _mulawTable() -> np.ndarray:
+    """G.711 mu-law to 16b PCM decoding table"""
+    u = ~np.arange(256, dtype=np.int32) & 0xFF
+    magnitude = (((u & 0x0F) << 3) + 0x84) << ((u & 0x70) >> 4)
+    return np.where(u & 0x80, 0x84 - magnitude, magnitude - 0x84).astype(np.int16)
+
+
+def _alawTable() -> np.ndarray:
+    """G.711 a-law to 16b PCM decoding table"""
+    a = np.arange(256, dtype=np.int32) ^ 0x55
+    exponent = (a & 0x70) >> 4
+    mantissa = (a & 0x0F) << 4
+    magnitude = np.where(
+        exponent == 0, mantissa + 8, (mantissa + 0x108) << np.maximum(exponent - 1, 0)
+    )
+    return np.where(a & 0x80, magnitude, -magnitude).astype(np.int16)
+
+
+def _toFloatMono(samples: np.ndarray, header: WavHeader) -> np.ndarray:
+    """Decode raw samples of shape (frames * channels,) into a float mono signal in the 16b range"""
+    if header.format_tag == WAVE_FORMAT_MULAW:
+        samples = _mulawTable()[samples]
+    elif header.format_tag == WAVE_FORMAT_ALAW:
+        samples = _alawTable()[samples]
+    elif header.sampwidth == 1:
+        # 8b PCM is unsigned
+        samples = (samples.astype(np.int16) - 128) << 8
+    samples = samples.reshape(-1, header.num_channels)
+    if header.num_channels == 1:
+        return samples[:, 0].astype(np.float64)
+    return samples.mean(axis=1)
+
+
+class _Resampler:
+    """Vectorized polyphase resampler by a rational factor up / down.
+
+    y[j] = sum_m x[m] * h[j * down - m * up + center], with h a Kaiser windowed-sinc low-pass filter.
+    Outputs sharing the same filter phase are computed at once as a product between a strided view of the signal and the phase filter.
+    """
+
+    def __init__(self, up: int, down: int, half_zero_crossings: int = 10, beta: float = 5.0):
+        self.up = up
+        self.down = down
+        max_rate = max(up, down)
+        half_len = half_zero_crossings * max_rate
+        t = np.arange(-half_len, half_len + 1) / max_rate
+        h = np.sinc(t) * np.kaiser(2 * half_len + 1, beta)
+        h *= up / h.sum()
+        self.center = half_len
+        self.taps = -(-len(h) // up)
+        phases = np.zeros(self.taps * up)
+        phases[: len(h)] = h
+        # phases[r, t] = h[t * up + r], reversed to be applied on increasing signal indexes
+        self.phases = phases.reshape(self.taps, up).T[:, ::-1].copy()
+
+    def inputIndex(self, j: int) -> int:
+        """Index of the last input sample contributing to output j"""
+        return (j * self.down + self.center) // self.up
+
+    def outputLength(self, num_frames: int) -> int:
+        return -((-num_frames * self.up) // self.down)
+
+    def inputSupport(self, out_start: int, out_stop: int) -> Tuple[int, int]:
+        """Range of input samples contributing to outputs [out_start, out_stop)"""
+        return self.inputIndex(out_start) - self.taps + 1, self.inputIndex(out_stop - 1) + 1
+
+    def __call__(self, signal: np.ndarray, out_start: int, out_stop: int) -> np.ndarray:
+        """Computes the outputs [out_start, out_stop) from the signal covering exactly inputSupport(out_start, out_stop)"""
+        in_start, _ = self.inputSupport(out_start, out_stop)
+        # Read-only view of the sliding windows of the signal (as sliding_window_view, available since NumPy 1.20)
+        windows = np.lib.stride_tricks.as_strided(
+            signal,
+            shape=(len(signal) - self.taps + 1, self.taps),
+            strides=(signal.strides[0], signal.strides[0]),
+            writeable=False,
+        )
+        output = np.empty(out_stop - out_start)
+        for j in range(out_start, min(out_start + self.up, out_stop)):
+            r = (j * self.down + self.center) % self.up
+            count = len(range(j, out_stop, self.up))
+            first = self.inputIndex(j) - self.taps + 1 - in_start
+            rows = windows[first : first + (count - 1) * self.down + 1 : self.down]
+            output[j - out_start :: self.up] = rows @ self.phases[r]
+        return output
+
+
+def iterReadWav(
+    file_path: str,
+    header: WavHeader = None,
+    output_sr: int = 16000,
+    block_duration: float = 10.0,
+) -> Iterator[np.ndarray]:
+    """Reads a convertible wave file (see WavHeader.isConvertible) and yields 16b PCM mono blocks at the given sample rate.
+    Channels are averaged and the signal is resampled with a vectorized polyphase filter.
+    """
+    if header is None:
+        header = readWavHeader(file_path)
+    if header is None or not header.isConvertible:
+        raise ValueError(f"Unsupported wave file: {file_path}")
+
+    dtype = np.uint8 if header.sampwidth == 1 else np.dtype("<i2")
+    raw = np.memmap(
+        file_path,
+        dtype=dtype,
+        mode="r",
+        offset=header.data_offset,
+        shape=(header.num_frames * header.num_channels,),
+    )
+    channels = header.num_channels
+
+    gcd = math.gcd(output_sr, header.sample_rate)
+    up, down = output_sr // gcd, header.sample_rate // gcd
+    block_size = int(block_duration * output_sr)
+
+    if up == down:
+        for start in range(0, header.num_frames, block_size):
+            stop = min(start + block_size, header.num_frames)
+            samples = raw[start * channels : stop * channels]
+            if header.isConformant(output_sr, 1):
+                yield np.asarray(samples, dtype=np.int16)
+            else:
+                yield np.clip(np.round(_toFloatMono(samples, header)), -32768, 32767).astype(np.int16)
+        return
+
+    resampler = _Resampler(up, down)
+    for out_start in range(0, resampler.outputLength(header.num_frames), block_size):
+        out_stop = min(out_start + block_size, resampler.outputLength(header.num_frames))
+        # Input support of the output block, zero padded outside of the signal
+        in_start, in_stop = resampler.inputSupport(out_start, out_stop)
+        first, last = max(in_start, 0), min(in_stop, header.num_frames)
+        signal = np.zeros(in_stop - in_start)
+        if first < last:
+            signal[first - in_start : last - in_start] = _toFloatMono(raw[first * channels : last * channels], header)
+        block = resampler(signal, out_start, out_stop)
+        yield np.clip(np.round(block), -32768, 32767).astype(np.int16)